@@ -18,27 +18,158 @@
 #
 
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List
 
 from cmk.base.cee.plugins.bakery.bakery_api.v1 import (
+    DebStep,
     FileGenerator,
     OS,
     Plugin,
+    PluginConfig,
+    RpmStep,
+    Scriptlet,
+    ScriptletGenerator,
+    SystemBinary,
+    SystemConfig,
     register
 )
 
+from cmk_addons.plugins.nut.lib.metrics import CONSUMED_VARIABLES
+
+COLLECTOR_NAME = "cmk-nut-collector"
+
 
 def get_nut_files(conf: Dict[str, Any]) -> FileGenerator:
     '''To deploy or not deploy our plugin'''
     if conf.get("deploy") == "no":
         return
+    if "collector_interval" in conf:
+        # The collector is the Python plugin started in collector mode
+        yield SystemBinary(
+            base_os=OS.LINUX,
+            source=Path("plugins/nut.py"),
+            target=Path(COLLECTOR_NAME),
+        )
+        yield SystemConfig(
+            base_os=OS.LINUX,
+            lines=list(_get_collector_unit_lines()),
+            target=Path(f"systemd/system/{COLLECTOR_NAME}.service"),
+            include_header=True,
+        )
+    python = conf.get("implementation") == "python"
     yield Plugin(
         base_os=OS.LINUX,
-        source=Path("nut.sh"),
+        source=Path("nut.py" if python else "nut.sh"),
+        interval=conf.get("cache_interval"),
+    )
+    if conf.get("targets"):
+        # Read by nut.sh, nut.py and the collector
+        yield PluginConfig(
+            base_os=OS.LINUX,
+            lines=list(_get_nut_targets_lines(conf)),
+            target=Path("nut_targets.cfg"),
+            include_header=True,
+        )
+    # nut.sh reads the timeout, the budget and piggyback from nut.cfg
+    shell_options = "timeout" in conf or "budget" in conf or conf.get("piggyback")
+    if not python and "collector_interval" not in conf and not shell_options:
+        return
+    yield PluginConfig(
+        base_os=OS.LINUX,
+        lines=list(_get_nut_config_lines(conf)),
+        target=Path("nut.cfg"),
+        include_header=True,
     )
 
 
+def _get_nut_config_lines(conf: Dict[str, Any]) -> Iterable[str]:
+    '''Render the configuration file of the Python plugin'''
+    yield "[nut]"
+    for key in (
+        # The timeout and the budget are also read by nut.sh
+        "timeout",
+        "budget",
+        "cache_interval",
+        "collector_interval",
+        "delta_refresh",
+        "inventory_interval",
+        "sample_interval",
+        "sample_window",
+    ):
+        if key in conf:
+            yield f"{key} = {conf[key]}"
+    variables = _get_allowed_variables(conf)
+    if variables:
+        yield f"variables = {' '.join(variables)}"
+    if conf.get("piggyback"):
+        # Also read by nut.sh
+        yield "piggyback = yes"
+
+
+def _format_target(host: str, port: int) -> str:
+    '''A upsd server as written in upsmon.conf, host[:port]'''
+    if ":" in host:
+        host = f"[{host}]"
+    return host if port == 3493 else f"{host}:{port}"
+
+
+def _get_nut_targets_lines(conf: Dict[str, Any]) -> Iterable[str]:
+    '''Render the list of upsd servers, one "host[:port] [timeout]" per line'''
+    for target in conf["targets"]:
+        line = _format_target(target["host"], target.get("port", 3493))
+        if "timeout" in target:
+            line += f" {target['timeout']}"
+        yield line
+    if conf.get("upsmon_targets"):
+        yield "@upsmon"
+
+
+def _get_allowed_variables(conf: Dict[str, Any]) -> List[str]:
+    '''The allow-list of variables for the agent plugin, empty for all variables'''
+    choice, value = conf.get("variables", ("all", None))
+    if choice == "consumed":
+        return sorted(CONSUMED_VARIABLES)
+    if choice == "custom":
+        return list(value)
+    return []
+
+
+def _get_collector_unit_lines() -> Iterable[str]:
+    '''Render the systemd unit of the collector'''
+    yield "[Unit]"
+    yield "Description=Checkmk Network UPS Tools collector"
+    yield "After=network-online.target"
+    yield ""
+    yield "[Service]"
+    yield "Environment=MK_CONFDIR=/etc/check_mk MK_VARDIR=/var/lib/check_mk_agent"
+    yield f"ExecStart=/usr/bin/{COLLECTOR_NAME} --collector"
+    yield "Restart=always"
+    yield "RestartSec=10"
+    yield ""
+    yield "[Install]"
+    yield "WantedBy=multi-user.target"
+
+
+def get_nut_scriptlets(conf: Dict[str, Any]) -> ScriptletGenerator:
+    '''Enable the collector after installation and stop it before removal'''
+    if conf.get("deploy") == "no" or "collector_interval" not in conf:
+        return
+    start = [
+        "systemctl daemon-reload",
+        f"systemctl enable {COLLECTOR_NAME}.service",
+        f"systemctl restart {COLLECTOR_NAME}.service",
+    ]
+    stop = [
+        f"systemctl disable --now {COLLECTOR_NAME}.service || true",
+    ]
+    yield Scriptlet(step=DebStep.POSTINST, lines=start)
+    yield Scriptlet(step=DebStep.PRERM, lines=stop)
+    yield Scriptlet(step=RpmStep.POST, lines=start)
+    yield Scriptlet(step=RpmStep.PREUN, lines=stop)
+
+
 register.bakery_plugin(
     name="nut",
     files_function=get_nut_files,
+    scriptlets_function=get_nut_scriptlets,
 )
@@ -0,0 +1,1228 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Checkmk agent plugin for Network UPS Tools.
+
+Alternative to nut.sh which talks to upsd directly over its TCP protocol
+instead of forking upsc. One connection is opened per upsd server, the UPS
+list is fetched with LIST UPS and all LIST VAR requests are pipelined over
+the same connection. The output is identical to the one of nut.sh.
+
+All upsd servers are queried concurrently. Each server has to answer within
+the per-host timeout and the whole run is bounded by an overall budget, both
+configurable in $MK_CONFDIR/nut.cfg:
+
+    [nut]
+    timeout = 5
+    budget = 45
+    cache_interval = 300
+
+Servers which fail or do not answer in time are listed in the nut_errors
+section instead of delaying the others. The nut_agent_stats section reports
+the connect and response time, the number of UPSes and variables, the bytes
+received and the error of every server. Their UPSes, as known from the last
+successful run, are listed with a collector.error line instead of their
+variables, and so are UPSes for which upsd reports an error. This lets the
+check tell temporarily unreachable UPSes apart from removed ones.
+
+The upsd servers are read from $MK_CONFDIR/nut_targets.cfg if it exists, one
+per line with an optional timeout overriding the one of nut.cfg:
+
+    ups1.example.com
+    10.0.0.5:3494 2.5
+    @upsmon
+
+The line @upsmon adds the servers of the MONITOR lines of upsmon.conf.
+Without the file, the servers are discovered from upsmon.conf on every run
+and localhost is always added, just like nut.sh does.
+
+Every UPS block carries the time the data was collected as collector.time.
+When the plugin runs as cached plugin (placed in a plugins/<interval>
+directory of the agent), cache_interval should be set to that interval. It is
+then reported as collector.interval, which lets the check tell outdated
+snapshots apart.
+
+Started with --collector, the plugin runs as a long-lived collector instead.
+It keeps one session per upsd server open, refreshes all variables every
+collector_interval seconds and atomically replaces $MK_VARDIR/nut.snapshot.
+While that snapshot is fresh, the agent plugin (this one or nut.sh) just
+prints it.
+
+With delta_refresh set, static variables (driver parameters, versions, IDs,
+delays, nominal values, ...) are moved to the nut_static section. That
+section is only sent when a static variable changed or delta_refresh seconds
+have passed, and is persisted by Checkmk in between. The last sent values are
+kept in $MK_VARDIR/nut.static.json. Snapshots of the collector always contain
+all static variables.
+
+With variables set to a whitespace separated list of variable names (shell
+style wildcards allowed), only these variables are sent:
+
+    variables = battery.charge battery.runtime input.* ups.status
+
+With inventory_interval set, the variables describing the device (vendor,
+model, serial number, firmware, driver, battery dates) are sent in the
+nut_inventory section for the HW/SW inventory. Like nut_static, it is only
+sent when something changed or inventory_interval seconds have passed.
+
+With sample_interval set, the collector also samples input.voltage,
+input.frequency, ups.load and ups.status every sample_interval seconds with
+GET VAR requests. The samples of the last sample_window seconds are kept in a
+ring buffer and summarized in the nut_samples section of every snapshot:
+minimum, maximum and average of the values, the number of status changes and
+the time on battery. This catches short brownouts and transfers to battery
+between two agent runs. sample_window should match the check interval.
+
+With piggyback set to yes, the data of every UPS is sent as piggyback data
+of its own host, named after the UPS label with all characters other than
+letters, digits, dots, dashes and underscores replaced by underscores
+(ups@nas:3494 becomes ups_nas_3494). Checkmk then checks every UPS on its
+own host, which spreads the checks over the helpers and allows rules and
+contacts per UPS. Errors of upsd servers stay with the host of the plugin.
+
+The upsd client and the rendering of the sections are generated from
+plugins/nut/lib/upsd.py, which the special agent of the site imports.
+Change them there and copy them over with python3 -m tests.sync_upsd.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+import argparse
+import collections
+import configparser
+import fnmatch
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+
+UPSMON_CONF = "/etc/nut/upsmon.conf"
+DEFAULT_PORT = 3493
+LOCALHOST = "localhost"
+CONFIG_FILE = "nut.cfg"
+TARGETS_FILE = "nut_targets.cfg"
+UPSMON_KEYWORD = "@upsmon"
+SNAPSHOT_FILE = "nut.snapshot"
+STATIC_STATE_FILE = "nut.static.json"
+INVENTORY_STATE_FILE = "nut.inventory.json"
+KNOWN_UPSES_FILE = "nut.upses.json"
+# Snapshots older than this are ignored and the plugin polls by itself,
+# nut.sh uses the same limit.
+SNAPSHOT_MAX_AGE = 600
+DEFAULT_CONFIG = {
+    "timeout": 5.0,
+    "budget": 45.0,
+    "cache_interval": None,
+    "collector_interval": 10.0,
+    "delta_refresh": None,
+    "variables": None,
+    "inventory_interval": None,
+    "sample_interval": None,
+    "sample_window": 60.0,
+    "piggyback": False,
+}
+
+# Variables the collector samples between two refreshes
+SAMPLED_VARIABLES = ("input.voltage", "input.frequency", "ups.load", "ups.status")
+
+# Variables describing the device, sent in nut_inventory
+INVENTORY_VARIABLES = frozenset((
+    "battery.date",
+    "battery.mfr.date",
+    "battery.type",
+    "device.mfr",
+    "device.model",
+    "device.serial",
+    "device.type",
+    "driver.name",
+    "driver.version",
+    "driver.version.data",
+    "driver.version.internal",
+    "ups.firmware",
+    "ups.firmware.aux",
+    "ups.mfr",
+    "ups.mfr.date",
+    "ups.model",
+    "ups.serial",
+))
+
+# Variables that (almost) never change, see is_static
+STATIC_PREFIXES = (
+    "battery.date",
+    "battery.mfr.date",
+    "battery.packs",
+    "battery.type",
+    "device.",
+    "driver.",
+    "input.sensitivity",
+    "input.transfer.",
+    "ups.delay.",
+    "ups.firmware",
+    "ups.id",
+    "ups.mfr",
+    "ups.model",
+    "ups.productid",
+    "ups.serial",
+    "ups.type",
+    "ups.vendorid",
+)
+STATIC_SUFFIXES = (
+    ".high",
+    ".low",
+    ".nominal",
+    ".warning",
+)
+
+
+# BEGIN upsd client, generated from plugins/nut/lib/upsd.py. Do not edit
+# here, change lib/upsd.py and run python3 -m tests.sync_upsd.
+
+# Measurement of the query running in the current thread, see poll_all
+_measurement = threading.local()
+
+
+def _measure(key, value):
+    '''Add value to the measurement of the query of the current thread, if any.'''
+    stats = getattr(_measurement, "stats", None)
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + value
+
+
+class UpsdError(Exception):
+    '''Raised when the connection to upsd breaks or upsd violates the protocol.'''
+
+
+class UpsdErrorReply(UpsdError):
+    '''Raised when upsd answers a request with ERR.'''
+
+
+def parse_target(spec):
+    '''
+    Split a upsd target of the form host[:port] as used in upsmon.conf.
+
+    Args:
+        spec (str): The target specification.
+
+    Returns:
+        tuple: The host name and the port.
+    '''
+    if spec.startswith("["):
+        # [IPv6]:port
+        host, _, rest = spec[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif spec.count(":") == 1:
+        host, port = spec.split(":")
+    else:
+        host, port = spec, ""
+    return host, int(port) if port else DEFAULT_PORT
+
+
+def format_target(host, port):
+    '''Inverse of parse_target, omitting the default port.'''
+    if ":" in host:
+        host = "[%s]" % host
+    return host if port == DEFAULT_PORT else "%s:%d" % (host, port)
+
+
+def split_reply(line):
+    '''
+    Tokenize one upsd reply line honoring double quotes and backslash escapes.
+
+    Args:
+        line (str): The reply line without line terminator.
+
+    Returns:
+        list: The tokens of the line.
+    '''
+    tokens = []
+    current = []
+    in_token = in_quotes = escaped = False
+    for char in line:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = in_token = True
+        elif char == '"':
+            in_quotes = not in_quotes
+            in_token = True
+        elif char == " " and not in_quotes:
+            if in_token:
+                tokens.append("".join(current))
+                current = []
+                in_token = False
+        else:
+            current.append(char)
+            in_token = True
+    if in_token:
+        tokens.append("".join(current))
+    return tokens
+
+
+def quote(value):
+    '''Quote a request argument the way split_reply reads it back.'''
+    return '"%s"' % value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class UpsdClient:
+    '''
+    Tiny client for the upsd line protocol.
+
+    Args:
+        host (str): Host name or address of the upsd server.
+        port (int): TCP port of the upsd server.
+        timeout (float): Deadline in seconds for connecting and all following
+            requests together. None waits forever.
+        username (str): User to authenticate as, if upsd requires it.
+        password (str): Password of that user.
+    '''
+
+    def __init__(self, host, port=DEFAULT_PORT, timeout=None, username=None, password=None):
+        self.reset_deadline(timeout)
+        started = time.monotonic()
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        _measure("connect_time", time.monotonic() - started)
+        self._reader = self._sock.makefile("rb")
+        if username is not None:
+            try:
+                self._login(username, password)
+            except (OSError, UpsdError):
+                self.close()
+                raise
+
+    def _login(self, username, password):
+        '''Send USERNAME and PASSWORD and check that upsd accepted both.'''
+        requests = ["USERNAME %s" % quote(username)]
+        if password is not None:
+            requests.append("PASSWORD %s" % quote(password))
+        self._send(requests)
+        for _ in requests:
+            tokens = self._readline()
+            if tokens[:1] == ["ERR"]:
+                raise UpsdErrorReply(" ".join(tokens[1:]))
+            if tokens != ["OK"]:
+                raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+
+    def reset_deadline(self, timeout):
+        '''Start a new deadline for the following requests of a kept-open session.'''
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+
+    def _arm(self):
+        '''Shrink the socket timeout to the time left until the deadline.'''
+        if self._deadline is None:
+            return
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("timed out")
+        self._sock.settimeout(remaining)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''Say goodbye to upsd and close the connection.'''
+        try:
+            self._send(["LOGOUT"])
+        except (OSError, ValueError):
+            pass
+        self._reader.close()
+        self._sock.close()
+
+    def _send(self, requests):
+        self._arm()
+        self._sock.sendall("".join(r + "\n" for r in requests).encode("utf-8"))
+
+    def _readline(self):
+        self._arm()
+        raw = self._reader.readline()
+        _measure("bytes", len(raw))
+        if not raw:
+            raise UpsdError("connection closed by upsd")
+        return split_reply(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+    def _read_list(self, query):
+        '''Read one BEGIN LIST ... END LIST block and return its item lines.'''
+        tokens = self._readline()
+        if tokens[:1] == ["ERR"]:
+            raise UpsdErrorReply(" ".join(tokens[1:]))
+        if tokens != ["BEGIN", "LIST"] + query:
+            raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+        items = []
+        while True:
+            tokens = self._readline()
+            if tokens == ["END", "LIST"] + query:
+                return items
+            items.append(tokens)
+
+    def list_ups(self):
+        '''Return the names of all UPSes known to upsd.'''
+        self._send(["LIST UPS"])
+        return [t[1] for t in self._read_list(["UPS"]) if len(t) >= 2]
+
+    def list_vars(self, upses):
+        '''
+        Fetch the variables of several UPSes with pipelined LIST VAR requests.
+
+        Args:
+            upses (list): Names of the UPSes to query.
+
+        Returns:
+            dict: UPS names mapped to a list of (variable, value) tuples. UPSes
+            for which upsd answered with an error are mapped to the error.
+        '''
+        self._send(["LIST VAR %s" % ups for ups in upses])
+        result = {}
+        for ups in upses:
+            try:
+                result[ups] = [
+                    (t[2], t[3]) for t in self._read_list(["VAR", ups]) if len(t) >= 4
+                ]
+            except UpsdErrorReply as exc:
+                result[ups] = exc
+        return result
+
+    def get_vars(self, upses, variables):
+        '''
+        Fetch some variables of several UPSes with pipelined GET VAR requests.
+
+        Args:
+            upses (list): Names of the UPSes to query.
+            variables (tuple): Names of the variables to fetch.
+
+        Returns:
+            dict: UPS names mapped to a list of (variable, value) tuples.
+            Variables the UPS does not support are left out.
+        '''
+        self._send(["GET VAR %s %s" % (ups, var) for ups in upses for var in variables])
+        result = {}
+        for ups in upses:
+            values = result[ups] = []
+            for var in variables:
+                tokens = self._readline()
+                if tokens[:1] == ["ERR"]:
+                    continue
+                if len(tokens) < 4 or tokens[:3] != ["VAR", ups, var]:
+                    raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+                values.append((var, tokens[3]))
+        return result
+
+
+def ups_label(ups, host, port):
+    '''Name of a UPS in the agent output, like upsc addresses it.'''
+    return ups if host == LOCALHOST else "%s@%s" % (ups, format_target(host, port))
+
+
+def section_lines(host, port, upses, collected=None, interval=None):
+    '''
+    Render the variables of one upsd server in the format of nut.sh.
+
+    Args:
+        host (str): Host name of the upsd server.
+        port (int): TCP port of the upsd server.
+        upses (dict): Result of UpsdClient.list_vars.
+        collected (int): Time the data was collected, reported as collector.time.
+        interval (int): Cache interval, reported as collector.interval.
+
+    Yields:
+        str: Output lines.
+    '''
+    for ups, variables in upses.items():
+        yield "==> %s <==" % ups_label(ups, host, port)
+        if isinstance(variables, Exception):
+            yield "collector.error: %s" % describe_error(variables)
+            continue
+        for key, value in variables:
+            yield "%s: %s" % (key, value)
+        if collected is not None:
+            yield "collector.time: %d" % collected
+        if interval:
+            yield "collector.interval: %d" % interval
+
+
+def poll_target(host, port, timeout=None, username=None, password=None):
+    '''Query all UPSes of one upsd server over a single connection.'''
+    with UpsdClient(host, port, timeout, username, password) as client:
+        upses = client.list_ups()
+        return client.list_vars(upses) if upses else {}
+
+
+def poll_all(targets, timeout, budget, poll=poll_target, workers=None, stats=None):
+    '''
+    Query all upsd servers concurrently.
+
+    The servers are queried by a pool of daemon threads, so a server that
+    hangs beyond the overall budget is simply abandoned when the plugin exits.
+    Servers not queried when the budget runs out are not started anymore.
+
+    Args:
+        targets (list): The (host, port) tuples to query.
+        timeout (float): Per-host deadline in seconds.
+        budget (float): Overall deadline in seconds.
+        poll (Callable): Function querying a single server.
+        workers (int): Maximum number of servers queried at the same time.
+            None queries all servers at once.
+        stats (dict): Filled with the measurement of every finished query,
+            (host, port) mapped to the response_time, the connect_time of a
+            new connection and the bytes received.
+
+    Returns:
+        list: One (host, port, result) tuple per target in the order of
+        targets. The result is the return value of poll or the exception
+        the query failed with.
+    '''
+    results = [UpsdError("budget exceeded")] * len(targets)
+    pending = iter(enumerate(targets))
+    lock = threading.Lock()
+    deadline = time.monotonic() + budget
+
+    def worker():
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None or time.monotonic() >= deadline:
+                return
+            idx, (host, port) = item
+            measurement = _measurement.stats = {}
+            started = time.monotonic()
+            try:
+                result = poll(host, port, timeout=timeout)
+            except (OSError, UpsdError) as exc:
+                result = exc
+            measurement["response_time"] = time.monotonic() - started
+            _measurement.stats = None
+            with lock:
+                if time.monotonic() < deadline:
+                    results[idx] = result
+                    if stats is not None:
+                        stats[(host, port)] = measurement
+
+    threads = [
+        threading.Thread(target=worker, daemon=True)
+        for _ in range(min(workers or len(targets), len(targets)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+
+    with lock:
+        return [(host, port, result) for (host, port), result in zip(targets, results)]
+
+
+def describe_error(exc):
+    '''Render an exception of a failed query as a short single line message.'''
+    if isinstance(exc, socket.timeout):
+        return "timed out"
+    return (str(exc) or type(exc).__name__).replace("\n", " ")
+
+
+def render_output(results, collected, interval=None, known=None):
+    '''
+    Render the agent sections for the results of poll_all.
+
+    Args:
+        results (list): Result of poll_all.
+        collected (int): Time the data was collected.
+        interval (int): Cache interval, if running as cached plugin.
+        known (dict): UPS names of earlier runs per upsd server (host[:port]).
+            The UPSes of a failed server are listed with collector.error, so
+            the check can tell them apart from removed UPSes.
+
+    Yields:
+        str: Output lines.
+    '''
+    yield "<<<nut>>>"
+    for host, port, upses in results:
+        if isinstance(upses, Exception):
+            upses = {ups: upses for ups in (known or {}).get(format_target(host, port), ())}
+        for line in section_lines(host, port, upses, collected, interval):
+            yield line
+
+    errors = [(h, p, e) for h, p, e in results if isinstance(e, Exception)]
+    if errors:
+        yield "<<<nut_errors>>>"
+        for host, port, exc in errors:
+            yield "%s %s" % (format_target(host, port), describe_error(exc))
+
+
+def piggyback_host(label):
+    '''The name of the piggyback host of a UPS, its label made a valid host name.'''
+    return re.sub(r"[^A-Za-z0-9._-]", "_", label)
+
+
+def piggyback_lines(lines):
+    '''
+    Move the data of every UPS to a piggyback host of its own.
+
+    The blocks of a UPS in all sections (nut, nut_static, nut_samples, ...)
+    are collected under the piggyback host named after the UPS, with the
+    header of their section. Lines outside of a UPS block, like the
+    nut_errors section, stay with the host running the plugin.
+
+    Args:
+        lines (list): Output lines as rendered for a single host.
+
+    Returns:
+        list: The output lines of the host followed by the piggyback data.
+    '''
+    own = []
+    hosts = {}
+    header = None
+    block = None
+    for line in lines:
+        if line.startswith("<<<"):
+            header, block = line, None
+            own.append(line)
+        elif line.startswith("==> ") and line.endswith(" <=="):
+            sections = hosts.setdefault(piggyback_host(line[4:-4]), {})
+            block = sections.setdefault(header, [])
+            block.append(line)
+        elif block is not None:
+            block.append(line)
+        else:
+            own.append(line)
+
+    # Drop the headers of sections which only had UPS blocks
+    output = [
+        line for idx, line in enumerate(own)
+        if not line.startswith("<<<") or (idx + 1 < len(own) and not own[idx + 1].startswith("<<<"))
+    ]
+    for host, sections in hosts.items():
+        output.append("<<<<%s>>>>" % host)
+        for header, block in sections.items():
+            output.append(header)
+            output.extend(block)
+        output.append("<<<<>>>>")
+    return output
+
+
+def agent_stats_lines(results, stats):
+    '''
+    Render the nut_agent_stats section, one line per upsd server.
+
+    Every line holds the server, the connect and response time in seconds,
+    the number of UPSes and variables, the bytes received and the error of
+    the query, if any. Values which are not known are rendered as "-", like
+    the connect time of a session kept open by the collector.
+
+    Args:
+        results (list): Result of poll_all.
+        stats (dict): The measurements of poll_all.
+
+    Yields:
+        str: Output lines.
+    '''
+    yield "<<<nut_agent_stats>>>"
+    for host, port, upses in results:
+        measurement = stats.get((host, port), {})
+        if isinstance(upses, Exception):
+            count = variables = "-"
+            error = describe_error(upses)
+        else:
+            count = len(upses)
+            variables = sum(len(v) for v in upses.values() if not isinstance(v, Exception))
+            error = ", ".join(
+                "%s: %s" % (ups, describe_error(v))
+                for ups, v in upses.items() if isinstance(v, Exception)
+            )
+        fields = [format_target(host, port)]
+        for key in ("connect_time", "response_time"):
+            fields.append("%.4f" % measurement[key] if key in measurement else "-")
+        fields += [str(count), str(variables), str(measurement.get("bytes", 0))]
+        if error:
+            fields.append(error)
+        yield " ".join(fields)
+
+
+def remember_upses(path, results):
+    '''
+    Keep the UPS names of every upsd server which answered in a state file.
+
+    Args:
+        path (str): Location of the state file.
+        results (list): Result of poll_all.
+
+    Returns:
+        dict: The UPS names per upsd server (host[:port]), for the servers
+        which failed the ones of the last successful run.
+    '''
+    try:
+        with open(path, encoding="utf-8") as state:
+            known = json.load(state)
+    except (OSError, ValueError):
+        known = {}
+    current = {}
+    for host, port, upses in results:
+        label = format_target(host, port)
+        if not isinstance(upses, Exception):
+            current[label] = sorted(upses)
+        elif label in known:
+            current[label] = known[label]
+    if current != known:
+        write_atomically(path, [json.dumps(current)])
+    return current
+
+
+def write_atomically(path, lines):
+    '''Atomically replace a file (the snapshot or a state file) with the given lines.'''
+    tmp = "%s.tmp.%d" % (path, os.getpid())
+    with open(tmp, "w", encoding="utf-8") as output:
+        for line in lines:
+            output.write(line + "\n")
+    os.replace(tmp, path)
+
+
+# END upsd client
+
+
+def read_monitor_targets(path=UPSMON_CONF, include_localhost=True):
+    '''
+    Collect all upsd servers referenced by MONITOR lines of upsmon.conf.
+
+    Localhost is part of the result by default, just like in nut.sh.
+
+    Args:
+        path (str): Location of upsmon.conf.
+        include_localhost (bool): Whether to add localhost.
+
+    Returns:
+        list: Sorted list of unique (host, port) tuples.
+    '''
+    targets = {(LOCALHOST, DEFAULT_PORT)} if include_localhost else set()
+    try:
+        with open(path, encoding="utf-8", errors="replace") as conf:
+            for line in conf:
+                words = line.split()
+                if len(words) < 2 or words[0] != "MONITOR" or "@" not in words[1]:
+                    continue
+                targets.add(parse_target(words[1].split("@", 1)[1]))
+    except OSError:
+        pass
+    return sorted(targets)
+
+
+def read_targets(confdir=None):
+    '''
+    Read the upsd servers from $MK_CONFDIR/nut_targets.cfg.
+
+    Without that file the servers are discovered from upsmon.conf.
+
+    Args:
+        confdir (str): Directory of the targets file.
+
+    Returns:
+        tuple: Sorted list of unique (host, port) tuples and a dictionary
+        mapping some of them to their own timeout.
+    '''
+    if confdir is None:
+        confdir = os.environ.get("MK_CONFDIR", "/etc/check_mk")
+    try:
+        with open(os.path.join(confdir, TARGETS_FILE), encoding="utf-8") as targets_file:
+            lines = targets_file.read().splitlines()
+    except OSError:
+        return read_monitor_targets(), {}
+
+    targets = set()
+    timeouts = {}
+    for line in lines:
+        words = line.split()
+        if not words or words[0].startswith("#"):
+            continue
+        if words[0] == UPSMON_KEYWORD:
+            targets.update(read_monitor_targets(include_localhost=False))
+            continue
+        target = parse_target(words[0])
+        targets.add(target)
+        if len(words) > 1:
+            try:
+                timeouts[target] = float(words[1])
+            except ValueError:
+                pass
+    return sorted(targets), timeouts
+
+
+def with_timeouts(poll, timeouts):
+    '''Wrap poll to use the timeout of nut_targets.cfg for the targets having one.'''
+    if not timeouts:
+        return poll
+
+    def poll_with_timeout(host, port, timeout=None):
+        return poll(host, port, timeout=timeouts.get((host, port), timeout))
+    return poll_with_timeout
+
+
+def load_config(confdir=None):
+    '''
+    Read the plugin configuration from $MK_CONFDIR/nut.cfg.
+
+    Args:
+        confdir (str): Directory of the configuration file.
+
+    Returns:
+        dict: The configuration merged over DEFAULT_CONFIG.
+    '''
+    if confdir is None:
+        confdir = os.environ.get("MK_CONFDIR", "/etc/check_mk")
+    parser = configparser.ConfigParser()
+    parser.read(os.path.join(confdir, CONFIG_FILE), encoding="utf-8")
+    config = dict(DEFAULT_CONFIG)
+    if parser.has_section("nut"):
+        for key in (
+            "timeout",
+            "budget",
+            "cache_interval",
+            "collector_interval",
+            "delta_refresh",
+            "inventory_interval",
+            "sample_interval",
+            "sample_window",
+        ):
+            if parser.has_option("nut", key):
+                config[key] = parser.getfloat("nut", key)
+        if parser.has_option("nut", "variables"):
+            config["variables"] = parser.get("nut", "variables").split()
+        if parser.has_option("nut", "piggyback"):
+            config["piggyback"] = parser.getboolean("nut", "piggyback")
+    return config
+
+
+def variable_filter(patterns):
+    '''
+    Build a predicate telling whether a variable is on the allow-list.
+
+    Args:
+        patterns (list): Variable names, possibly with shell style wildcards.
+
+    Returns:
+        Callable: Predicate taking a variable name.
+    '''
+    exact = frozenset(p for p in patterns if not any(c in p for c in "*?["))
+    wildcards = [p for p in patterns if p not in exact]
+
+    def allowed(key):
+        return key in exact or any(fnmatch.fnmatchcase(key, p) for p in wildcards)
+
+    return allowed
+
+
+def filter_variables(results, allowed):
+    '''Drop all variables from the results of poll_all which are not allowed.'''
+    filtered = []
+    for host, port, upses in results:
+        if not isinstance(upses, Exception):
+            upses = {
+                ups: variables if isinstance(variables, Exception)
+                else [(k, v) for k, v in variables if allowed(k)]
+                for ups, variables in upses.items()
+            }
+        filtered.append((host, port, upses))
+    return filtered
+
+
+def default_vardir():
+    '''Directory for files the plugin keeps between runs.'''
+    return os.environ.get("MK_VARDIR", "/var/lib/check_mk_agent")
+
+
+def default_snapshot_path():
+    '''Location of the snapshot file written by the collector.'''
+    return os.path.join(default_vardir(), SNAPSHOT_FILE)
+
+
+def is_inventory(key):
+    '''Tell whether a NUT variable describes the device and goes to nut_inventory.'''
+    return key in INVENTORY_VARIABLES
+
+
+def inventory_section(config):
+    '''The nut_inventory section, sent every inventory_interval seconds.'''
+    return PersistedSection(
+        "nut_inventory",
+        is_inventory,
+        os.path.join(default_vardir(), INVENTORY_STATE_FILE),
+        config["inventory_interval"],
+    )
+
+
+def is_static(key):
+    '''Tell whether a NUT variable is static and can be sent in nut_static.'''
+    return key.startswith(STATIC_PREFIXES) or key.endswith(STATIC_SUFFIXES)
+
+
+class PersistedSection:
+    '''
+    Move rarely changing variables to their own section, which is only sent
+    when one of them changes or a refresh is due and is persisted by Checkmk
+    in between.
+
+    Args:
+        section (str): Name of the section.
+        predicate (Callable): Tells whether a variable belongs to the section.
+        path (str): Path of the state file.
+        refresh (float): Seconds after which the section is sent again even
+            without a change.
+    '''
+
+    def __init__(self, section, predicate, path, refresh):
+        self._section = section
+        self._predicate = predicate
+        self._path = path
+        self._refresh = refresh
+        try:
+            with open(path, encoding="utf-8") as state:
+                data = json.load(state)
+            self._sent = data["sent"]
+            self._upses = data["upses"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self._sent = 0
+            self._upses = {}
+
+    def split(self, results, now):
+        '''
+        Remove the variables of the section from the results of poll_all.
+
+        Args:
+            results (list): Result of poll_all.
+            now (int): The current time.
+
+        Returns:
+            tuple: The remaining results and the lines of the section. The
+            lines are empty when nothing needs to be sent.
+        '''
+        changed = False
+        remaining_results = []
+        for host, port, upses in results:
+            if isinstance(upses, Exception):
+                remaining_results.append((host, port, upses))
+                continue
+            remaining = {}
+            for ups, variables in upses.items():
+                if isinstance(variables, Exception):
+                    remaining[ups] = variables
+                    continue
+                moved = [[k, v] for k, v in variables if self._predicate(k)]
+                remaining[ups] = [(k, v) for k, v in variables if not self._predicate(k)]
+                label = ups_label(ups, host, port)
+                if self._upses.get(label, {}).get("vars") != moved:
+                    changed = True
+                self._upses[label] = {"seen": now, "vars": moved}
+            remaining_results.append((host, port, remaining))
+
+        # Forget UPSes that are gone for good
+        for label in [k for k, v in self._upses.items() if now - v["seen"] > 2 * self._refresh]:
+            del self._upses[label]
+            changed = True
+
+        lines = []
+        if changed or now - self._sent >= self._refresh:
+            self._sent = now
+            # Checkmk keeps the section until the next refresh is overdue
+            lines.append("<<<%s:persist(%d)>>>" % (self._section, now + 2 * self._refresh))
+            for label, entry in sorted(self._upses.items()):
+                lines.append("==> %s <==" % label)
+                lines.extend("%s: %s" % (k, v) for k, v in entry["vars"])
+            # The seen times on disk lag behind by at most one refresh, which
+            # is well below the 2 * refresh after which UPSes are forgotten
+            write_atomically(self._path, [json.dumps({"sent": self._sent, "upses": self._upses})])
+        return remaining_results, lines
+
+
+def read_snapshot(path, max_age=SNAPSHOT_MAX_AGE):
+    '''Return the content of the snapshot file, or None if missing or outdated.'''
+    try:
+        if time.time() - os.stat(path).st_mtime > max_age:
+            return None
+        with open(path, encoding="utf-8") as snapshot:
+            return snapshot.read()
+    except OSError:
+        return None
+
+
+class SampleBuffer:
+    '''
+    Bounded ring buffers of the sampled variables of every UPS.
+
+    Args:
+        interval (float): Seconds between two samples.
+        window (float): Seconds of samples to keep and summarize.
+    '''
+
+    def __init__(self, interval, window):
+        self._interval = interval
+        self._size = max(int(window / interval), 1)
+        self._buffers = {}
+
+    def add(self, results, now):
+        '''
+        Add one sample per UPS and forget UPSes that are gone.
+
+        Args:
+            results (list): Result of poll_all, either of a refresh or of a
+                sampling round.
+            now (float): The current time.
+        '''
+        for host, port, upses in results:
+            if isinstance(upses, Exception):
+                continue
+            for ups, variables in upses.items():
+                if isinstance(variables, Exception):
+                    continue
+                values = dict(variables)
+                label = ups_label(ups, host, port)
+                if label not in self._buffers:
+                    self._buffers[label] = collections.deque(maxlen=self._size)
+                self._buffers[label].append(
+                    (now,) + tuple(values.get(var) for var in SAMPLED_VARIABLES)
+                )
+        # Samples older than the window belong to UPSes that vanished
+        horizon = now - self._size * self._interval
+        for label in [k for k, v in self._buffers.items() if v[-1][0] < horizon]:
+            del self._buffers[label]
+
+    def summary_lines(self):
+        '''
+        Summarize the buffers in the nut_samples section.
+
+        Yields:
+            str: Output lines with the number of samples and the time they
+            span, min, max and average of the numeric variables, the number
+            of status changes and the seconds spent on battery. A UPS counts
+            as on battery from a sample reporting OB up to the next sample,
+            refreshes and sampling rounds are not evenly spaced.
+        '''
+        yield "<<<nut_samples>>>"
+        for label, samples in sorted(self._buffers.items()):
+            yield "==> %s <==" % label
+            yield "samples: %d %d" % (len(samples), samples[-1][0] - samples[0][0])
+            columns = list(zip(*samples))
+            for idx, var in enumerate(SAMPLED_VARIABLES[:-1], 1):
+                values = []
+                for value in columns[idx]:
+                    try:
+                        values.append(float(value))
+                    except (TypeError, ValueError):
+                        pass
+                if values:
+                    yield "%s: %g %g %.2f" % (var, min(values), max(values), sum(values) / len(values))
+            # (time, status) of the samples with a status
+            statuses = [(s[0], s[-1]) for s in samples if s[-1] is not None]
+            if statuses:
+                yield "ups.status.transitions: %d" % sum(
+                    1 for prev, cur in zip(statuses, statuses[1:]) if prev[1] != cur[1]
+                )
+                yield "ups.status.on_battery: %d" % sum(
+                    cur[0] - prev[0] for prev, cur in zip(statuses, statuses[1:])
+                    if "OB" in prev[1].split()
+                )
+
+
+class Collector:
+    '''
+    Keep sessions to all upsd servers open and refresh the snapshot file.
+
+    Args:
+        config (dict): The plugin configuration.
+        snapshot (str): Path of the snapshot file.
+    '''
+
+    def __init__(self, config, snapshot):
+        self._config = config
+        self._snapshot = snapshot
+        self._clients = {}
+        self._locks = {}
+        self._upses = {}
+        self._allowed = variable_filter(config["variables"] or [])
+        self._samples = None
+        if config["sample_interval"]:
+            self._samples = SampleBuffer(config["sample_interval"], config["sample_window"])
+        self._inventory = None
+        self._inventory_lines = []
+        self._inventory_until = 0
+        if config["inventory_interval"]:
+            self._inventory = inventory_section(config)
+
+    def _query(self, host, port, timeout, query):
+        '''Run query with the session of the target, reconnecting if needed.'''
+        target = (host, port)
+        lock = self._locks.setdefault(target, threading.Lock())
+        if not lock.acquire(blocking=False):
+            raise UpsdError("previous poll still running")
+        try:
+            client = self._clients.get(target)
+            if client is None:
+                client = self._clients[target] = UpsdClient(host, port, timeout=timeout)
+            else:
+                client.reset_deadline(timeout)
+            try:
+                return query(target, client)
+            except (OSError, UpsdError):
+                # Reconnect on the next refresh
+                del self._clients[target]
+                client.close()
+                raise
+        finally:
+            lock.release()
+
+    def poll(self, host, port, timeout=None):
+        '''Like poll_target, but reuse the session of the previous refresh.'''
+        def query(target, client):
+            upses = client.list_ups()
+            return client.list_vars(upses) if upses else {}
+        return self._query(host, port, timeout, query)
+
+    def sample_target(self, host, port, timeout=None):
+        '''Fetch the sampled variables of the UPSes known from the last refresh.'''
+        def query(target, client):
+            upses = self._upses.get(target)
+            return client.get_vars(upses, SAMPLED_VARIABLES) if upses else {}
+        return self._query(host, port, timeout, query)
+
+    def sample(self):
+        '''Add one sample of all UPSes to the ring buffers.'''
+        now = time.time()
+        results = poll_all(
+            sorted(self._upses), self._config["timeout"], self._config["sample_interval"],
+            poll=self.sample_target,
+        )
+        self._samples.add(results, now)
+
+    def refresh(self):
+        '''Poll all upsd servers once and write a new snapshot.'''
+        targets, timeouts = read_targets()
+        for target in set(self._clients) - set(targets):
+            self._clients.pop(target).close()
+        for target in set(self._upses) - set(targets):
+            del self._upses[target]
+
+        now = time.time()
+        collected = int(now)
+        stats = {}
+        results = poll_all(
+            targets, self._config["timeout"], self._config["budget"],
+            poll=with_timeouts(self.poll, timeouts), stats=stats,
+        )
+        # Only this thread touches the known UPSes, workers of poll_all
+        # which outlived the budget cannot change them anymore
+        for host, port, upses in results:
+            if not isinstance(upses, Exception):
+                self._upses[(host, port)] = list(upses)
+        stats_lines = list(agent_stats_lines(results, stats))
+        sample_lines = []
+        if self._samples is not None:
+            self._samples.add(results, now)
+            sample_lines = list(self._samples.summary_lines())
+        if self._inventory is not None:
+            results, inventory_lines = self._inventory.split(results, collected)
+            if inventory_lines:
+                # The agent does not print every snapshot. Keep the section in
+                # the snapshots until the agent must have read one of them.
+                self._inventory_lines = inventory_lines
+                self._inventory_until = collected + SNAPSHOT_MAX_AGE
+            elif collected >= self._inventory_until:
+                self._inventory_lines = []
+        if self._config["variables"]:
+            results = filter_variables(results, self._allowed)
+        known = {format_target(*target): upses for target, upses in self._upses.items()}
+        lines = (
+            list(render_output(results, collected, self._config["cache_interval"], known))
+            + self._inventory_lines
+            + sample_lines
+            + stats_lines
+        )
+        if self._config["piggyback"]:
+            lines = piggyback_lines(lines)
+        write_atomically(self._snapshot, lines)
+
+    def run(self):
+        '''
+        Refresh the snapshot every collector_interval seconds, forever, and
+        take samples every sample_interval seconds in between.
+        '''
+        interval = self._config["collector_interval"]
+        step = min(self._config["sample_interval"] or interval, interval)
+        next_refresh = time.monotonic()
+        while True:
+            started = time.monotonic()
+            if started >= next_refresh:
+                self.refresh()
+                next_refresh = started + interval
+            else:
+                self.sample()
+            time.sleep(max(min(next_refresh, started + step) - time.monotonic(), 0))
+
+
+def main(argv=None):
+    '''Entry point of the agent plugin and the collector.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--collector", action="store_true",
+        help="run as long-lived collector writing the snapshot file",
+    )
+    parser.add_argument(
+        "--snapshot", default=default_snapshot_path(),
+        help="path of the snapshot file (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    config = load_config()
+
+    if args.collector:
+        try:
+            Collector(config, args.snapshot).run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    snapshot = read_snapshot(args.snapshot)
+    if snapshot is not None:
+        sys.stdout.write(snapshot)
+        return 0
+
+    collected = int(time.time())
+    targets, timeouts = read_targets()
+    stats = {}
+    results = poll_all(
+        targets, config["timeout"], config["budget"],
+        poll=with_timeouts(poll_target, timeouts), stats=stats,
+    )
+    stats_lines = list(agent_stats_lines(results, stats))
+    inventory_lines = []
+    if config["inventory_interval"]:
+        results, inventory_lines = inventory_section(config).split(results, collected)
+    if config["variables"]:
+        results = filter_variables(results, variable_filter(config["variables"]))
+    static_lines = []
+    if config["delta_refresh"]:
+        static = PersistedSection(
+            "nut_static",
+            is_static,
+            os.path.join(default_vardir(), STATIC_STATE_FILE),
+            config["delta_refresh"],
+        )
+        results, static_lines = static.split(results, collected)
+    known = remember_upses(os.path.join(default_vardir(), KNOWN_UPSES_FILE), results)
+    lines = list(render_output(results, collected, config["cache_interval"], known))
+    lines += static_lines + inventory_lines + stats_lines
+    if config["piggyback"]:
+        lines = piggyback_lines(lines)
+    for line in lines:
+        sys.stdout.write(line + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,196 @@
 #!/bin/bash
 
+# Emit the snapshot of the NUT collector (nut.py --collector) while it is fresh
+snapshot="${MK_VARDIR:-/var/lib/check_mk_agent}/nut.snapshot"
+if [ -n "$(find "$snapshot" -mmin -10 2>/dev/null)" ]; then
+  cat "$snapshot"
+  exit 0
+fi
+
 which upsc >/dev/null 2>&1 || exit 0
 
 echo '<<<nut>>>'
 
-hosts=`(
+now=$(date +%s)
+
+config="${MK_CONFDIR:-/etc/check_mk}/nut.cfg"
+
+# "piggyback = yes" in nut.cfg sends every UPS as piggyback host of its own
+piggyback=
+if grep -qiE '^\s*piggyback\s*=\s*(1|yes|true|on)\s*$' "$config" 2>/dev/null; then
+  piggyback=1
+fi
+
+# Numeric option of nut.cfg, the default if it is not set
+config_number() {
+  value=$(sed -n "s/^\s*$1\s*=\s*\([0-9.]*\)\s*$/\1/p" "$config" 2>/dev/null | tail -n 1)
+  echo "${value:-$2}"
+}
+
+# Deadline of every upsc call unless the server has its own, and the
+# deadline of the whole run, like nut.py
+default_timeout=$(config_number timeout 5)
+budget=$(config_number budget 45)
+
+# upsd servers of the MONITOR lines of upsmon.conf
+upsmon_targets() {
   if which awk >/dev/null 2>&1; then
     for file in /etc/nut/upsmon.conf; do
       [ -f $file ] || continue
       grep "^MONITOR\s" $file
     done | awk '{if(split($2, parts, "@") >= 2) { print parts[2] } }'
   fi
-  echo localhost # make sure localhost is on the list
-) | sort -u`
-for host in $hosts; do
-  for ups in $(upsc -l $host 2>/dev/null); do
-    if [ "$host" = "localhost" ]; then
-      echo "==> $ups <=="
+}
+
+# Targets rendered by the agent bakery: "host[:port] [timeout]" per line,
+# "@upsmon" adds the servers of upsmon.conf
+targets_file="${MK_CONFDIR:-/etc/check_mk}/nut_targets.cfg"
+if [ -f "$targets_file" ]; then
+  targets=$(
+    while read -r target timeout _; do
+      case "$target" in
+        ""|"#"*) ;;
+        @upsmon) upsmon_targets ;;
+        *) echo "$target${timeout:+ $timeout}" ;;
+      esac
+    done < "$targets_file" | sort -u -k1,1
+  )
+else
+  targets=$(
+    (
+      upsmon_targets
+      echo localhost # make sure localhost is on the list
+    ) | sort -u
+  )
+fi
+
+# UPS names of the last successful run per server, so the UPSes of a server
+# which fails are listed with collector.error instead of vanishing
+cachedir="${MK_VARDIR:-/var/lib/check_mk_agent}"
+workdir=$(mktemp -d)
+trap 'rm -rf "$workdir"' EXIT
+
+# Seconds with fractions where date supports %N, for nut_agent_stats
+clock() {
+  date +%s.%N
+}
+
+elapsed() {
+  awk -v start="$1" -v end="$2" 'BEGIN { printf "%.4f", end - start }'
+}
+
+has_timeout=
+which timeout >/dev/null 2>&1 && has_timeout=1
+
+# Header of the data of one UPS, in its own piggyback host if configured
+begin_ups() {
+  if [ -n "$piggyback" ]; then
+    echo "<<<<$(echo "$1" | sed 's/[^A-Za-z0-9._-]/_/g')>>>>"
+    echo '<<<nut>>>'
+  fi
+  echo "==> $1 <=="
+}
+
+end_ups() {
+  [ -z "$piggyback" ] || echo '<<<<>>>>'
+}
+
+ups_label() {
+  if [ "$2" = "localhost" ]; then
+    echo "$1"
+  else
+    echo "$1@$2"
+  fi
+}
+
+# Query one upsd server. Prints the UPS data and writes the stats line of
+# the server to $workdir/stats.<index> when it is done.
+poll_host() {
+  host=$1
+  timeout=$2
+  idx=$3
+  errfile="$workdir/err.$idx"
+  upsc=upsc
+  [ -z "$has_timeout" ] || upsc="timeout ${timeout}s upsc"
+  cache="$cachedir/nut.upses.$host"
+  started=$(clock)
+  if upses=$($upsc -l $host 2>"$errfile"); then
+    echo "$upses" > "$cache" 2>/dev/null
+    server_error=
+    count=0
+    variables=0
+    nbytes=$(printf '%s\n' "$upses" | wc -c)
+  else
+    [ $? -ne 124 ] || echo "timed out" > "$errfile"
+    upses=$(cat "$cache" 2>/dev/null)
+    server_error=$(tail -n 1 "$errfile")
+    server_error="${server_error:-no answer}"
+    server_error="${server_error#Error: }"
+    count=-
+    variables=-
+    nbytes=0
+  fi
+  # upsc connects for every call, the time of upsc -l stands for the connect time
+  connect_time=-
+  [ -n "$server_error" ] || connect_time=$(elapsed "$started" "$(clock)")
+  errors=
+  for ups in $upses; do
+    begin_ups "$(ups_label "$ups" "$host")"
+    if [ -n "$server_error" ]; then
+      echo "collector.error: $server_error"
+    elif output=$($upsc $ups@$host 2>"$errfile"); then
+      echo "$output"
+      echo "collector.time: $now"
+      count=$((count + 1))
+      variables=$((variables + $(printf '%s\n' "$output" | grep -c ': ')))
+      nbytes=$((nbytes + $(printf '%s\n' "$output" | wc -c)))
     else
-      echo "==> $ups@$host <=="
+      [ $? -ne 124 ] || echo "timed out" > "$errfile"
+      error=$(tail -n 1 "$errfile")
+      error="${error:-no answer}"
+      echo "collector.error: ${error#Error: }"
+      count=$((count + 1))
+      errors="${errors:+$errors, }$ups: ${error#Error: }"
     fi
-    upsc $ups@$host 2>/dev/null
+    end_ups
+  done
+  echo "$host $connect_time $(elapsed "$started" "$(clock)") $count $variables $nbytes ${server_error:-$errors}" > "$workdir/stats.$idx"
+}
+
+# Query all servers at once, so a dead server does not hold up the others
+hosts=()
+pids=()
+while read -r host timeout; do
+  [ -n "$host" ] || continue
+  hosts+=("$host")
+  poll_host "$host" "${timeout:-$default_timeout}" "${#hosts[@]}" > "$workdir/out.${#hosts[@]}" &
+  pids+=($!)
+done <<< "$targets"
+
+# Servers still running when the budget is used up are abandoned
+if [ ${#pids[@]} -gt 0 ]; then
+  (sleep "$budget"; kill "${pids[@]}") >/dev/null 2>&1 &
+  watchdog=$!
+  wait "${pids[@]}" 2>/dev/null
+  kill "$watchdog" 2>/dev/null
+fi
+
+for idx in "${!hosts[@]}"; do
+  host=${hosts[$idx]}
+  idx=$((idx + 1))
+  if [ -f "$workdir/stats.$idx" ]; then
+    cat "$workdir/out.$idx"
+    continue
+  fi
+  for ups in $(cat "$cachedir/nut.upses.$host" 2>/dev/null); do
+    begin_ups "$(ups_label "$ups" "$host")"
+    echo "collector.error: budget exceeded"
+    end_ups
   done
+  echo "$host - - - - 0 budget exceeded" > "$workdir/stats.$idx"
+done
+
+echo '<<<nut_agent_stats>>>'
+for idx in "${!hosts[@]}"; do
+  sed 's/ *$//' "$workdir/stats.$((idx + 1))"
 done
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Module for the NUT HW/SW inventory.
+
+The Python agent plugin sends the variables describing the device in the
+nut_inventory section, at most every few hours. This module turns them into
+one inventory row per UPS.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+from typing import Dict
+
+from cmk.agent_based.v2 import (
+    AgentSection,
+    InventoryPlugin,
+    InventoryResult,
+    StringTable,
+    TableRow,
+)
+
+Section = Dict[str, Dict[str, str]]
+
+# Inventory columns mapped to the NUT variables providing them, best first
+_COLUMNS = (
+    ("manufacturer", ("device.mfr", "ups.mfr")),
+    ("model", ("device.model", "ups.model")),
+    ("serial", ("device.serial", "ups.serial")),
+    ("type", ("device.type",)),
+    ("firmware", ("ups.firmware",)),
+    ("firmware_aux", ("ups.firmware.aux",)),
+    ("manufacturing_date", ("ups.mfr.date",)),
+    ("driver", ("driver.name",)),
+    ("driver_version", ("driver.version",)),
+    ("driver_version_internal", ("driver.version.internal",)),
+    ("battery_type", ("battery.type",)),
+    ("battery_date", ("battery.date",)),
+    ("battery_manufacturing_date", ("battery.mfr.date",)),
+)
+
+
+def parse_nut_inventory(string_table: StringTable) -> Section:
+    '''
+    Parse the nut_inventory section.
+
+    Args:
+        string_table (StringTable): Lines in the same format as the nut section.
+
+    Returns:
+        Section: UPS names mapped to their variables.
+    '''
+    section: Section = {}
+    variables: Dict[str, str] = {}
+    for line in string_table:
+        if line[0] == "==>" and line[-1] == "<==":
+            variables = section.setdefault(" ".join(line[1:-1]), {})
+            continue
+        if len(line) < 2:
+            continue
+        variables[line[0].rstrip(":")] = " ".join(line[1:])
+    return section
+
+
+def inventory_nut(section: Section) -> InventoryResult:
+    '''
+    Yield one inventory row per UPS.
+
+    Args:
+        section (Section): Parsed nut_inventory section.
+
+    Yields:
+        TableRow: Device data of one UPS.
+    '''
+    for ups, variables in sorted(section.items()):
+        columns = {}
+        for column, keys in _COLUMNS:
+            for key in keys:
+                if variables.get(key):
+                    columns[column] = variables[key]
+                    break
+        yield TableRow(
+            path=["hardware", "ups"],
+            key_columns={"name": ups},
+            inventory_columns=columns,
+        )
+
+
+agent_section_nut_inventory = AgentSection(
+    name="nut_inventory",
+    parse_function=parse_nut_inventory,
+)
+
+
+inventory_plugin_nut = InventoryPlugin(
+    name="nut",
+    sections=["nut_inventory"],
+    inventory_function=inventory_nut,
+)
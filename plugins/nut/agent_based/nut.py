@@ -23,19 +23,30 @@ and performs checks against defined thresholds.
 # to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
 # Boston, MA 02110-1301 USA.
 
+import enum
+import functools
+import math
+import time
 from typing import (
     Any,
     Callable,
     Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
     Mapping,
-    TypedDict,
+    MutableMapping,
+    Optional,
     Tuple,
+    Union,
 )
 
 from cmk.agent_based.v2 import (
     AgentSection,
     DiscoveryResult,
+    Metric,
     check_levels,
+    get_value_store,
     render,
     CheckPlugin,
     CheckResult,
@@ -45,6 +56,17 @@ from cmk.agent_based.v2 import (
     State
 )
 
+from ..lib.metrics import (
+    METRICS,
+    METRICS_BY_VARIABLE,
+    PHASES,
+    PHASE_QUANTITIES,
+    PHASE_VARIABLES,
+    NutMetric,
+    NutPhaseQuantity,
+    default_levels,
+)
+
 # from plugins.nut.web.plugins.wato import nut
 
 # pylint: disable=W0105
@@ -87,29 +109,239 @@ from cmk.agent_based.v2 import (
 
 Metrics = Dict[str, int]
 
+# NUT variable: (slot of UpsData, converter), metrics come from the registry
+_PARSED_VARIABLES: Mapping[str, Tuple[str, Callable[[str], Any]]] = {
+    'battery.packs': ('battery_packs', int),
+    'collector.error': ('collector_error', str),
+    'collector.interval': ('collector_interval', float),
+    'collector.time': ('collector_time', float),
+    'ups.beeper.status': ('ups_beeper_status', str),
+    'ups.power.nominal': ('ups_power_nominal', float),
+    'ups.realpower.nominal': ('ups_realpower_nominal', float),
+    'ups.alarm': ('ups_alarm', str),
+    'ups.status': ('ups_status', str),
+    **{variable: (metric.name, metric.convert) for variable, metric in METRICS_BY_VARIABLE.items()},
+}
+
+_PHASE_QUANTITIES: Mapping[str, NutPhaseQuantity] = {
+    quantity.name: quantity for quantity in PHASE_QUANTITIES
+}
+
+# Metrics only few UPSes report and the rare error marker of the agent are
+# kept in the overflow dictionary of UpsData
+_OVERFLOW: FrozenSet[str] = frozenset(
+    metric.name for metric in METRICS if not metric.slot
+) | {'collector_error'}
+
+_SLOTS: Tuple[str, ...] = tuple(sorted(
+    {slot for slot, _convert in _PARSED_VARIABLES.values() if slot not in _OVERFLOW}
+    | {metric.name for metric in METRICS if metric.slot}
+    | {metric.value for metric in METRICS if metric.value is not None}
+))
+
+
+class UpsStatus(enum.IntFlag):
+    '''
+    The flags of ups.status.
+
+    Based on the status data of
+    https://github.com/networkupstools/nut/blob/master/docs/new-drivers.txt,
+    plus FSD set by upsmon and the communication states upsmon reports.
+    '''
+    OL = enum.auto()
+    OB = enum.auto()
+    LB = enum.auto()
+    HB = enum.auto()
+    RB = enum.auto()
+    CHRG = enum.auto()
+    DISCHRG = enum.auto()
+    BYPASS = enum.auto()
+    CAL = enum.auto()
+    OFF = enum.auto()
+    OVER = enum.auto()
+    TRIM = enum.auto()
+    BOOST = enum.auto()
+    FSD = enum.auto()
+    ALARM = enum.auto()
+    TEST = enum.auto()
+    ECO = enum.auto()
+    COMM = enum.auto()
+    NOCOMM = enum.auto()
+
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def split(cls, status: str) -> Tuple['UpsStatus', Tuple[str, ...]]:
+        '''
+        The flags of a ups.status value and the tokens which are no flag.
+
+        A fleet reports only a handful of distinct status values, the result
+        is cached and shared by all UPSes with the same status.
+        '''
+        flags = cls(0)
+        unknown: Tuple[str, ...] = ()
+        for token in status.split():
+            flag = cls.__members__.get(token)
+            if flag is None:
+                unknown += (token,)
+            else:
+                flags |= flag
+        return flags, unknown
+
+    @classmethod
+    def parse(cls, status: str) -> 'UpsStatus':
+        '''The flags of a ups.status value, unknown tokens are ignored.'''
+        return cls.split(status)[0]
+
 
-class UpsData(TypedDict, total=False):
-    '''TypedDict to define the model for UPS data.'''
-    battery_charge: float
-    battery_packs: int
-    battery_runtime: float
-    battery_voltage: float
-    input_frequency: float
-    input_voltage: float
-    input_voltage_fault: float
-    output_voltage: float
-    ups_beeper_status: str
-    ups_load: float
-    ups_temperature: float
+class UpsData(Mapping[str, Any]):
+    '''
+    Compact record holding the data of one UPS.
+
+    The values the check knows about live in slots, anything else goes to a
+    small overflow dictionary which is only created when needed. The record
+    is a read-only mapping for its consumers, so it is used like the
+    dictionary it replaces while needing a fraction of its memory.
+
+    The flags of ups.status are parsed once and kept next to the values,
+    they are not part of the mapping.
+    '''
+
+    __slots__ = _SLOTS + ('_status', '_extra')
+
+    FIELDS: FrozenSet[str] = frozenset(_SLOTS)
+
+    def __init__(self, **values: Any) -> None:
+        self._extra: Optional[Dict[str, Any]] = None
+        for key, value in values.items():
+            self[key] = value
+
+    def split_status(self) -> Tuple[UpsStatus, Tuple[str, ...]]:
+        '''The flags of ups.status and its unknown tokens, parsed on first use.'''
+        try:
+            return self._status
+        except AttributeError:
+            self._status = UpsStatus.split(self.get('ups_status', ''))
+            return self._status
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == 'ups_status' and hasattr(self, '_status'):
+            del self._status
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in _SLOTS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"UpsData({dict(self)!r})"
 
 
 Section = Dict[str, UpsData]
 
 
+def split_status(ups_data: Mapping[str, Any]) -> Tuple[UpsStatus, Tuple[str, ...]]:
+    '''The flags of ups.status of one UPS and the tokens which are no flag.'''
+    if isinstance(ups_data, UpsData):
+        return ups_data.split_status()
+    return UpsStatus.split(ups_data.get('ups_status', ''))
+
+
+def status_flags(ups_data: Mapping[str, Any]) -> UpsStatus:
+    '''The flags of ups.status of one UPS, none if it does not report a status.'''
+    return split_status(ups_data)[0]
+
+
+# NUT variable: (slot of UpsData or phase quantity, converter, index of the phase or None)
+_PARSE_SPECS: Mapping[str, Tuple[str, Callable[[str], Any], Optional[int]]] = {
+    **{variable: (key, convert, None) for variable, (key, convert) in _PARSED_VARIABLES.items()},
+    **{variable: (quantity, float, index) for variable, (quantity, index) in PHASE_VARIABLES.items()},
+}
+
+# Lookup table keyed by the raw first word of an agent line ("battery.charge:"),
+# so lines of variables we do not care about are dropped with a single lookup.
+_PARSE_TABLE: Mapping[str, Tuple[str, Callable[[str], Any], Optional[int]]] = {
+    **_PARSE_SPECS,
+    **{f"{variable}:": spec for variable, spec in _PARSE_SPECS.items()},
+}
+
+
+def _set_phase(ups_data: UpsData, quantity: str, index: int, value: float) -> None:
+    '''
+    Store the value of one phase.
+
+    The values of a quantity are kept in one list per UPS, with None for the
+    phases the UPS does not report. All lists live under the key "phases".
+    '''
+    phases = ups_data.get('phases')
+    if phases is None:
+        phases = ups_data['phases'] = {}
+    values = phases.get(quantity)
+    if values is None:
+        values = phases[quantity] = [None] * len(_PHASE_QUANTITIES[quantity].phases)
+    values[index] = value
+
+
+def _derive_metrics(ups_data: UpsData) -> None:
+    '''
+    Compute the values derived from the raw NUT variables.
+
+    This runs once per UPS right after parsing, so the check function only
+    reads values and never modifies the (possibly cached) section.
+
+    Args:
+        ups_data (UpsData): The parsed data of one UPS, updated in place.
+    '''
+    # Parse ups.status into its flags once, all checks read them from there
+    ups_data.split_status()
+
+    voltage = ups_data.get('battery_voltage')
+    if voltage is not None:
+        ups_data['battery_voltage_total'] = voltage * ups_data.get('battery_packs', 1)
+
+    load = ups_data.get('ups_load')
+    realpower_nominal = ups_data.get('ups_realpower_nominal')
+    power_nominal = ups_data.get('ups_power_nominal')
+
+    # Prefer measured values, estimate from the load otherwise
+    if 'ups_realpower' not in ups_data and load is not None and realpower_nominal is not None:
+        ups_data['ups_realpower'] = load * realpower_nominal / 100
+    if 'ups_power' not in ups_data and load is not None and power_nominal is not None:
+        ups_data['ups_power'] = load * power_nominal / 100
+
+    realpower = ups_data.get('ups_realpower')
+    if realpower is not None and realpower_nominal is not None:
+        ups_data['ups_realpower_headroom'] = realpower_nominal - realpower
+
+
 def nut_parse(string_table: StringTable) -> Section:
     '''
     Parse the input string table from the NUT UPS output into a structured section.
 
+    The parser makes a single pass over the lines and only does one dictionary
+    lookup for every variable it does not know. It is expected to handle at
+    least 2,000,000 lines per second, see tests/test_nut_benchmark.py.
+
     Args:
         string_table (StringTable): The raw string table lines from the agent output.
 
@@ -118,43 +350,59 @@ def nut_parse(string_table: StringTable) -> Section:
     '''
 
     parsed: Section = {}
+    ups_data = None
+    lookup = _PARSE_TABLE.get
 
-    for idx, line in enumerate(string_table):
+    for line in string_table:
+        spec = lookup(line[0])
 
-        if line[0] == "==>" and line[-1] == "<==":
-            # Found section beginning
-            ups_name = " ".join(string_table[idx][1:-1])
-            parsed[ups_name] = {}
-
-        elif len(line) >= 2:
-            # Found key value pair
-            key = line[0]
-            val = " ".join(line[1:])
-
-            # Fix key
-            key = key.replace('.', '_').replace(':', '')
-
-            # Convert several keys/values
-            if key in [
-                    'battery_charge',
-                    'battery_runtime',
-                    'battery_voltage',
-                    'input_frequency',
-                    'input_voltage',
-                    'input_voltage_fault',
-                    'output_voltage',
-                    'ups_load',
-                    'ups_temperature'
-            ]:
-                parsed[ups_name][key] = float(val)
-            elif key in ['battery_packs']:
-                parsed[ups_name][key] = int(val)
-            elif key in ['ups_status', 'ups_beeper_status']:
-                parsed[ups_name][key] = val
+        if spec is None:
+            if line[0] == "==>" and line[-1] == "<==":
+                # Found section beginning
+                ups_data = parsed[" ".join(line[1:-1])] = UpsData()
+            continue
+
+        if ups_data is None or len(line) < 2:
+            continue
+
+        key, convert, phase = spec
+        value = convert(line[1] if len(line) == 2 else " ".join(line[1:]))
+        if phase is not None:
+            _set_phase(ups_data, key, phase, value)
+            continue
+        try:
+            setattr(ups_data, key, value)
+        except AttributeError:
+            # Metric kept in the overflow dictionary
+            ups_data[key] = value
+
+    for ups_data in parsed.values():
+        _derive_metrics(ups_data)
 
     return parsed
 
 
+def merge_static(ups_data: UpsData, static: UpsData) -> UpsData:
+    '''
+    Complete the data of one UPS with its values from the nut_static section.
+
+    In delta mode the agent sends static variables (like battery.packs or the
+    nominal values) only when they change, Checkmk persists them in between.
+
+    Args:
+        ups_data (UpsData): The data of the UPS from the nut section.
+        static (UpsData): The data of the UPS from the nut_static section.
+
+    Returns:
+        UpsData: A new record, the derived values are computed again.
+    '''
+    merged = UpsData(**static)
+    for key, value in ups_data.items():
+        merged[key] = value
+    _derive_metrics(merged)
+    return merged
+
+
 def discover_nut(section: Section) -> DiscoveryResult:
     '''
     Discover UPS services based on the parsed section.
@@ -167,21 +415,33 @@ def discover_nut(section: Section) -> DiscoveryResult:
     '''
 
     for ups_name, ups_data in section.items():
-        if len(ups_data) > 0:
+        # A UPS which only carries the error marker is unreachable right now
+        if any(key != 'collector_error' for key in ups_data):
             yield Service(item=ups_name)
 
 
-_METRIC_SPECS: Mapping[str, Tuple[str, Callable, bool, bool, bool]] = {
-    # 'metric': ('Metric Name', renderer, notice_only, lower_levels, upper_levels)
-    'battery_charge': ('Battery charge', render.percent, False, True, False),
-    'battery_runtime': ('Battery runtime', render.timespan, False, True, False),
-    'battery_voltage': ('Battery voltage', lambda v: f"{v:0.2f} V", True, True, False),
-    'input_frequency': ('Input frequency', render.frequency, True, True, True),
-    'input_voltage': ('Input voltage', lambda v: f"{v:0.2f} V", True, True, True),
-    'input_voltage_fault': ('Input voltage (fault)', lambda v: f"{v:0.2f} V", True, False, True),
-    'output_voltage': ('Output voltage', lambda v: f"{v:.2f} V", True, True, True),
-    'ups_load': ('Load', render.percent, False, True, True),
-    'ups_temperature': ('Temperature', lambda v: f"{v:0.1f} °C", True, False, True),
+def _render_func(metric: Union[NutMetric, NutPhaseQuantity]) -> Callable[[float], str]:
+    '''The function rendering the values of a metric in the check summary.'''
+    if metric.unit == "%":
+        return render.percent
+    if metric.unit == "s":
+        return render.timespan
+    if metric.unit == "Hz":
+        return render.frequency
+    return lambda v: f"{v:.{metric.digits}f} {metric.unit}"
+
+
+_METRIC_SPECS: Mapping[str, Tuple[str, Callable, bool, bool, bool, str]] = {
+    # 'metric': ('Metric Name', renderer, notice_only, lower_levels, upper_levels, value slot)
+    metric.name: (
+        metric.title,
+        _render_func(metric),
+        metric.notice_only,
+        metric.lower,
+        metric.upper,
+        metric.value or metric.name,
+    )
+    for metric in METRICS
 }
 
 
@@ -201,9 +461,122 @@ _STATUS_SPECS: Mapping[str, Tuple[State, str]] = {
     'OVER': (State.CRIT, 'Overloaded'),
     'TRIM': (State.WARN, 'Trimming incoming voltage'),
     'BOOST': (State.WARN, 'Boosting incoming voltage'),
+    'FSD': (State.CRIT, 'Forced shutdown'),
+    'ALARM': (State.CRIT, 'Alarm'),
+    'TEST': (State.OK, 'Self test running'),
+    'ECO': (State.OK, 'ECO mode'),
+    'COMM': (State.OK, 'Communication established'),
+    'NOCOMM': (State.CRIT, 'No communication'),
 }
 
 
+def _data_age_levels(params: Mapping[str, Any], ups_data: UpsData) -> Optional[Tuple[str, Any]]:
+    '''
+    Levels for the age of the collected data.
+
+    Configured levels win. Otherwise snapshots of a cached agent plugin are
+    outdated after two and stale after four cache intervals.
+    '''
+    if 'data_age' in params:
+        return params['data_age']
+    interval = ups_data.get('collector_interval')
+    if interval:
+        return ("fixed", (2 * interval, 4 * interval))
+    return None
+
+
+def _metric_levels(params: Mapping[str, Any], metric: str) -> Tuple[Any, Any]:
+    '''
+    Lower and upper levels of a metric of _METRIC_SPECS.
+
+    The parameters are either a dictionary with lower and upper levels, or
+    simple levels applying to the direction the metric supports.
+    '''
+    metric_params = params.get(metric)
+    if isinstance(metric_params, dict):
+        return metric_params.get("lower", None), metric_params.get("upper", None)
+    if _METRIC_SPECS[metric][3]:
+        return metric_params, None
+    return None, metric_params
+
+
+def phase_imbalance(values: Iterable[Optional[float]]) -> Optional[float]:
+    '''
+    Imbalance between the phases in percent.
+
+    This is the largest deviation of a phase from the average of all phases,
+    relative to the average (NEMA definition).
+
+    Args:
+        values (Iterable[Optional[float]]): The values of the phases, None
+            for phases not reported.
+
+    Returns:
+        Optional[float]: The imbalance, None for less than two phases or an
+        average of zero.
+    '''
+    present = [value for value in values if value is not None]
+    if len(present) < 2:
+        return None
+    average = sum(present) / len(present)
+    if average <= 0:
+        return None
+    return max(abs(value - average) for value in present) / average * 100
+
+
+def check_phases(params: Mapping[str, Any], ups_data: UpsData) -> CheckResult:
+    '''
+    Check the per-phase values of a three-phase UPS.
+
+    Every phase is checked against the levels of the corresponding single
+    phase metric, like the input voltage. The imbalance between the phases
+    has its own levels.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters.
+        ups_data (UpsData): The data of the UPS.
+
+    Yields:
+        CheckResult: Results and metrics per phase and quantity.
+    '''
+    phases = ups_data.get('phases')
+    if not phases:
+        return
+    for quantity in PHASE_QUANTITIES:
+        values = phases.get(quantity.name)
+        if values is None:
+            continue
+        render_func = _render_func(quantity)
+        levels_lower, levels_upper = (
+            _metric_levels(params, quantity.levels) if quantity.levels else (None, None)
+        )
+        for phase, value in zip(quantity.phases, values):
+            if value is None:
+                continue
+            yield from check_levels(
+                value,
+                metric_name=f"nut_{quantity.name}_{phase.lower().replace('-', '_')}",
+                label=f"{quantity.title} {phase}",
+                levels_lower=levels_lower,
+                levels_upper=levels_upper,
+                render_func=render_func,
+                notice_only=True,
+                boundaries=(0, None),
+            )
+        imbalance = phase_imbalance(values) if quantity.imbalance else None
+        if imbalance is not None:
+            yield from check_levels(
+                imbalance,
+                metric_name=f"nut_{quantity.name}_imbalance",
+                label=f"{quantity.title} imbalance"
+                + ("" if quantity.phases is PHASES else " (line to line)"),
+                levels_upper=params.get(quantity.imbalance),
+                render_func=render.percent,
+                notice_only=True,
+                boundaries=(0, None),
+            )
+
+
 def check_nut(item: str, params: Mapping[str, Any], section: Section) -> CheckResult:
     '''
     Check the UPS data for the specified item against provided parameters.
@@ -228,19 +601,28 @@ def check_nut(item: str, params: Mapping[str, Any], section: Section) -> CheckRe
         return
 
     # Check UPS status
-    # print(f"Checking UPS: {item}")
-    for status in ups_data['ups_status'].split():
-        # print(f"Status: {status}")
-        if status in _STATUS_SPECS:
-            yield Result(
-                state=_STATUS_SPECS[status][0],
-                summary=f"Status: {_STATUS_SPECS[status][1]} ({status})"
-            )
+    flags, unknown = split_status(ups_data)
+    for flag in flags:
+        state, text = _STATUS_SPECS[flag.name]
+        if flag is UpsStatus.ALARM and ups_data.get('ups_alarm'):
+            yield Result(state=state, summary=f"Status: {text} ({ups_data['ups_alarm']})")
         else:
-            yield Result(
-                state=State.UNKNOWN,
-                summary=f"Unknown status: {status}"
-            )
+            yield Result(state=state, summary=f"Status: {text} ({flag.name})")
+    for status in unknown:
+        yield Result(
+            state=State.UNKNOWN,
+            summary=f"Unknown status: {status}"
+        )
+
+    # Check age of the collected data (cached agent plugin)
+    if 'collector_time' in ups_data:
+        yield from check_levels(
+            max(time.time() - ups_data['collector_time'], 0),
+            label="Data age",
+            levels_upper=_data_age_levels(params, ups_data),
+            render_func=render.timespan,
+            notice_only=True,
+        )
 
     # Check Beeper status
     current_beeper_status = ups_data.get('ups_beeper_status')
@@ -254,36 +636,478 @@ def check_nut(item: str, params: Mapping[str, Any], section: Section) -> CheckRe
         )
 
     # Check all metrics
-    for metric in ups_data:
-        # print(f"Metric: {metric}, Value: {ups_data[metric]}")
-        # Ignore unspecified metrics
-        if metric not in _METRIC_SPECS:
+    for metric, metric_spec in _METRIC_SPECS.items():
+        value = ups_data.get(metric_spec[5])
+        if value is None:
             continue
 
-        # Calculate real voltage
-        if metric == 'battery_voltage':
-            ups_data[metric] = ups_data[metric] * ups_data.get('battery_packs', 1)
+        levels_lower, levels_upper = _metric_levels(params, metric)
 
-        metric_params = params.get(metric)
+        yield from check_levels(
+            value,
+            metric_name=f"nut_{metric}",
+            label=metric_spec[0],
+            levels_lower=levels_lower,
+            levels_upper=levels_upper,
+            render_func=metric_spec[1],
+            notice_only=metric_spec[2],
+            boundaries=(0, None),
+        )
+
+    # Check the phases of three-phase UPSes
+    yield from check_phases(params, ups_data)
+
+
+# Time constant of the smoothed charge rates: samples older than that weigh
+# less than 37%, no matter how often the check runs
+_TREND_TIME_CONSTANT = 300.0
+# Samples further apart than that do not describe the same discharge
+_TREND_MAX_GAP = 1800.0
 
-        if isinstance(metric_params, dict):
-            levels_lower = metric_params.get("lower", None)
-            levels_upper = metric_params.get("upper", None)
-        else:
-            # If metric_params is a simple value (like a fixed threshold),
-            levels_lower = metric_params if metric_params is not None else None
-            levels_upper = None
 
+def _ewma(previous: Optional[float], sample: float, elapsed: float) -> float:
+    '''Exponentially weighted moving average for irregular sample intervals.'''
+    if previous is None:
+        return sample
+    return previous + (1 - math.exp(-elapsed / _TREND_TIME_CONSTANT)) * (sample - previous)
+
+
+def _render_rate(value: float) -> str:
+    return f"{value:.2f}%/min"
+
+
+def check_battery_trend(
+    params: Mapping[str, Any],
+    ups_data: UpsData,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    '''
+    Track the discharge and recharge rate of the battery.
+
+    The smoothed rates are kept in the value store together with the last
+    sample, so the state per UPS has a fixed size. While the UPS runs on
+    battery, the time to empty is predicted from the discharge rate instead
+    of trusting battery.runtime of the driver.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters.
+        ups_data (UpsData): The data of the UPS.
+        value_store (MutableMapping[str, Any]): The value store of the service.
+        now (float): Time the data was collected.
+
+    Yields:
+        CheckResult: Results and metrics of the rates and the time to empty.
+    '''
+    charge = ups_data.get('battery_charge')
+    if charge is None:
+        return
+    discharging = bool(status_flags(ups_data) & (UpsStatus.OB | UpsStatus.DISCHRG))
+
+    # (time, charge, discharging, discharge rate, recharge rate)
+    last = value_store.get('battery_trend')
+    discharge_rate = recharge_rate = None
+    if last is not None and now <= last[0]:
+        # Same data again, like the snapshot of a cached agent plugin
+        now, charge, discharging, discharge_rate, recharge_rate = last
+    elif last is not None and now - last[0] <= _TREND_MAX_GAP and discharging == last[2]:
+        elapsed = now - last[0]
+        # Positive while the charge drops, in percent per minute
+        rate = (last[1] - charge) / elapsed * 60
+        if discharging:
+            discharge_rate = _ewma(last[3], max(rate, 0.0), elapsed)
+        elif charge < 100:
+            recharge_rate = _ewma(last[4], max(-rate, 0.0), elapsed)
+    value_store['battery_trend'] = (now, charge, discharging, discharge_rate, recharge_rate)
+
+    if discharge_rate is not None:
         yield from check_levels(
-            ups_data[metric],
-            metric_name=f"nut_{metric}",
-            label=_METRIC_SPECS[metric][0],
+            discharge_rate,
+            metric_name="nut_battery_discharge_rate",
+            label="Discharge rate",
+            levels_upper=params.get('battery_discharge_rate'),
+            render_func=_render_rate,
+            boundaries=(0, None),
+        )
+        if discharge_rate > 0:
+            yield from check_levels(
+                charge / discharge_rate * 60,
+                metric_name="nut_battery_time_to_empty",
+                label="Time to empty",
+                levels_lower=params.get('battery_time_to_empty'),
+                render_func=render.timespan,
+                boundaries=(0, None),
+            )
+    if recharge_rate is not None:
+        yield from check_levels(
+            recharge_rate,
+            metric_name="nut_battery_recharge_rate",
+            label="Recharge rate",
+            levels_lower=params.get('battery_recharge_rate'),
+            render_func=_render_rate,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+
+
+# Longest gap between two samples the energy integration bridges
+_ENERGY_MAX_GAP = 1800.0
+
+
+def _render_energy(value: float) -> str:
+    return f"{value / 1000:.3f} kWh"
+
+
+def check_energy(
+    ups_data: UpsData,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    '''
+    Integrate the real power of the UPS into its energy consumption.
+
+    The energy is accumulated with the trapezoidal rule between two samples.
+    The value store only holds the last sample and the running total, so the
+    state per UPS has a fixed size. Longer gaps, like a stopped agent, and
+    clocks going backwards are not bridged: the total is kept and the
+    integration starts over from the next sample.
+
+    Args:
+        ups_data (UpsData): The data of the UPS, measured or estimated real power.
+        value_store (MutableMapping[str, Any]): The value store of the service.
+        now (float): Time the data was collected.
+
+    Yields:
+        CheckResult: The energy in Wh since the first check and the average
+        power since the last sample.
+    '''
+    power = ups_data.get('ups_realpower')
+    if power is None:
+        return
+    power = max(power, 0.0)
+
+    # (time, power, energy)
+    last = value_store.get('energy')
+    energy = 0.0 if last is None else last[2]
+    average = None
+    if last is not None and now == last[0]:
+        # Same data again, like the snapshot of a cached agent plugin
+        power = last[1]
+    elif last is not None and 0 < now - last[0] <= _ENERGY_MAX_GAP:
+        average = (last[1] + power) / 2
+        energy += average * (now - last[0]) / 3600
+    value_store['energy'] = (now, power, energy)
+
+    yield from check_levels(
+        energy,
+        metric_name="nut_energy",
+        label="Energy",
+        render_func=_render_energy,
+        notice_only=True,
+        boundaries=(0, None),
+    )
+    if average is not None:
+        yield from check_levels(
+            average,
+            metric_name="nut_average_power",
+            label="Average power",
+            render_func=lambda v: f"{v:.0f} W",
+            notice_only=True,
+            boundaries=(0, None),
+        )
+
+
+def check_status_transitions(
+    params: Mapping[str, Any],
+    ups_data: UpsData,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    '''
+    Count the transfers to and from battery in a sliding window.
+
+    A UPS flapping between OL and OB looks healthy on most single checks.
+    The times of the transfers within the window are kept in the value
+    store, together with the time of the last transfer.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters.
+        ups_data (UpsData): The data of the UPS.
+        value_store (MutableMapping[str, Any]): The value store of the service.
+        now (float): Time the data was collected.
+
+    Yields:
+        CheckResult: Results and metrics of the transfers.
+    '''
+    if 'ups_status' not in ups_data:
+        return
+    on_battery = bool(status_flags(ups_data) & UpsStatus.OB)
+    # Rules saved before the window was validated may hold 0 or less
+    window = max(params.get('flap_window', 3600), 1)
+
+    # (time, on battery, time of the last transfer, times of the transfers in the window)
+    last = value_store.get('status_trend')
+    if last is None:
+        last_transfer, transfers = None, ()
+    elif now <= last[0]:
+        # Same data again, like the snapshot of a cached agent plugin
+        now, on_battery, last_transfer, transfers = last
+    else:
+        last_transfer, transfers = last[2], last[3]
+        if on_battery != last[1]:
+            last_transfer = now
+            transfers += (now,)
+    transfers = tuple(t for t in transfers if t > now - window)
+    value_store['status_trend'] = (now, on_battery, last_transfer, transfers)
+
+    yield from check_levels(
+        len(transfers),
+        metric_name="nut_status_transfers",
+        label=f"Transfers in the last {render.timespan(window)}",
+        levels_upper=params.get('status_transfers'),
+        render_func=lambda v: f"{v:.0f}",
+        notice_only=True,
+        boundaries=(0, None),
+    )
+    yield from check_levels(
+        len(transfers) / window * 3600,
+        metric_name="nut_flap_rate",
+        label="Flap rate",
+        levels_upper=params.get('flap_rate'),
+        render_func=lambda v: f"{v:.1f}/h",
+        notice_only=not transfers,
+        boundaries=(0, None),
+    )
+    if last_transfer is not None:
+        yield from check_levels(
+            now - last_transfer,
+            metric_name="nut_time_since_transfer",
+            label="Time since last transfer",
+            levels_lower=params.get('time_since_transfer'),
+            render_func=render.timespan,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+
+
+SamplesSection = Dict[str, Dict[str, Any]]
+
+_SAMPLED_METRICS: Mapping[str, str] = {
+    # NUT variable: metric of _METRIC_SPECS
+    'input.voltage': 'input_voltage',
+    'input.frequency': 'input_frequency',
+    'ups.load': 'ups_load',
+}
+
+
+def parse_nut_samples(string_table: StringTable) -> SamplesSection:
+    '''
+    Parse the nut_samples section of the collector.
+
+    Args:
+        string_table (StringTable): The raw string table lines from the agent output.
+
+    Returns:
+        SamplesSection: UPS names mapped to the sample count and time span,
+        (min, max, avg) per sampled metric, the number of status changes
+        and the seconds on battery.
+    '''
+    parsed: SamplesSection = {}
+    summary: Dict[str, Any] = {}
+    for line in string_table:
+        if line[0] == "==>" and line[-1] == "<==":
+            summary = parsed[" ".join(line[1:-1])] = {}
+            continue
+        key = line[0].rstrip(":")
+        try:
+            if key == "samples":
+                summary["samples"], summary["span"] = int(line[1]), int(line[2])
+            elif key in _SAMPLED_METRICS:
+                summary[_SAMPLED_METRICS[key]] = tuple(float(v) for v in line[1:4])
+            elif key == "ups.status.transitions":
+                summary["transitions"] = int(line[1])
+            elif key == "ups.status.on_battery":
+                summary["on_battery"] = int(line[1])
+        except (IndexError, ValueError):
+            continue
+    return parsed
+
+
+def check_nut_samples(params: Mapping[str, Any], summary: Mapping[str, Any]) -> CheckResult:
+    '''
+    Check the summary of the samples the collector took since the last run.
+
+    The minimum and maximum of a sampled metric are checked against the lower
+    and upper levels of the metric itself.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters.
+        summary (Mapping[str, Any]): The parsed summary of one UPS.
+
+    Yields:
+        CheckResult: Results and metrics of the sampled values.
+    '''
+    if not summary.get("samples"):
+        return
+    yield Result(
+        state=State.OK,
+        notice=f"Samples: {summary['samples']} in {render.timespan(summary['span'])}",
+    )
+    for metric in _SAMPLED_METRICS.values():
+        if metric not in summary:
+            continue
+        lowest, highest, _average = summary[metric]
+        label, render_func = _METRIC_SPECS[metric][:2]
+        levels_lower, levels_upper = _metric_levels(params, metric)
+        yield from check_levels(
+            lowest,
+            metric_name=f"nut_{metric}_min",
+            label=f"{label} (min)",
             levels_lower=levels_lower,
+            render_func=render_func,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+        yield from check_levels(
+            highest,
+            metric_name=f"nut_{metric}_max",
+            label=f"{label} (max)",
             levels_upper=levels_upper,
-            render_func=_METRIC_SPECS[metric][1],
-            notice_only=_METRIC_SPECS[metric][2],
+            render_func=render_func,
+            notice_only=True,
             boundaries=(0, None),
         )
+    if "transitions" in summary:
+        yield from check_levels(
+            summary["transitions"],
+            metric_name="nut_status_transitions",
+            label="Status changes",
+            levels_upper=params.get('status_transitions'),
+            render_func=lambda v: f"{v:.0f}",
+            notice_only=not summary["transitions"],
+            boundaries=(0, None),
+        )
+    if summary.get("on_battery"):
+        yield from check_levels(
+            summary["on_battery"],
+            metric_name="nut_on_battery_time",
+            label="Time on battery",
+            levels_upper=params.get('on_battery_time'),
+            render_func=render.timespan,
+            boundaries=(0, None),
+        )
+
+
+def discover_nut_sections(
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+    section_nut_samples: Optional[SamplesSection],
+) -> DiscoveryResult:
+    '''Discovery function of the plugin, only the nut section carries services.'''
+    yield from discover_nut(section_nut or {})
+
+
+def check_stale(
+    params: Mapping[str, Any],
+    ups_data: UpsData,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> Tuple[Optional[UpsData], CheckResult]:
+    '''
+    Keep the last good data of a UPS and serve it while the UPS is unreachable.
+
+    The agent lists a UPS with collector.error when its upsd server or the
+    driver failed. Within the grace period the last good data is checked
+    again and reported as stale, afterwards the UPS is UNKNOWN. A UPS which
+    is missing without the marker has been removed and is not covered here.
+
+    Only the time the UPS was last reachable is stored on every run. The copy
+    of its data is rewritten when the status changes or the copy gets older
+    than half the grace period, so the served values are never far behind.
+    It carries no collector values, the age of the copy is reported here
+    instead of by the data age check.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters, stale_grace and stale_state.
+        ups_data (UpsData): The current data of the UPS.
+        value_store (MutableMapping[str, Any]): The value store of the service.
+        now (float): The current time.
+
+    Returns:
+        Tuple[Optional[UpsData], CheckResult]: The data to check, None if
+        there is none, and the results on the staleness.
+    '''
+    error = ups_data.get('collector_error')
+    grace = params.get('stale_grace', 0)
+    if error is None:
+        if grace > 0 and 'ups_status' in ups_data:
+            seen = ups_data.get('collector_time', now)
+            value_store['last_seen'] = seen
+            last_good = value_store.get('last_good')
+            if (
+                last_good is None
+                or last_good[1].get('ups_status') != ups_data['ups_status']
+                or seen - last_good[0] >= grace / 2
+            ):
+                value_store['last_good'] = (seen, {
+                    key: value for key, value in ups_data.items()
+                    if not key.startswith('collector_')
+                })
+        return ups_data, []
+
+    last_good = value_store.get('last_good')
+    seen = value_store.get('last_seen')
+    if last_good is None or seen is None or now - seen > grace:
+        return None, [Result(state=State.UNKNOWN, summary=f"No data: {error}")]
+    return UpsData(**last_good[1]), [Result(
+        state=State(params.get('stale_state', State.OK.value)),
+        summary=f"Stale data from {render.timespan(max(now - last_good[0], 0))} ago ({error})",
+    )]
+
+
+def check_nut_sections(
+    item: str,
+    params: Mapping[str, Any],
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+    section_nut_samples: Optional[SamplesSection],
+) -> CheckResult:
+    '''
+    Check function of the plugin, adding the persisted static values to
+    check_nut, serving the last good data of unreachable UPSes, tracking the
+    battery trend, the transfers to battery and the energy, and checking the
+    samples of the collector.
+    '''
+    section = section_nut or {}
+    ups_data = section.get(item)
+    if ups_data is not None and section_nut_static and item in section_nut_static:
+        ups_data = merge_static(ups_data, section_nut_static[item])
+        section = {item: ups_data}
+    if ups_data is None:
+        yield from check_nut(item, params, section)
+        return
+
+    value_store = get_value_store()
+    now = time.time()
+    stale_data, stale_results = check_stale(params, ups_data, value_store, now)
+    yield from stale_results
+    if stale_data is None:
+        return
+    if stale_data is not ups_data:
+        # The old values are shown, but not written to the graphs again
+        yield from (
+            result for result in check_nut(item, params, {item: stale_data})
+            if not isinstance(result, Metric)
+        )
+        return
+
+    yield from check_nut(item, params, section)
+    now = ups_data.get('collector_time', now)
+    yield from check_battery_trend(params, ups_data, value_store, now)
+    yield from check_status_transitions(params, ups_data, value_store, now)
+    yield from check_energy(ups_data, value_store, now)
+    if section_nut_samples and item in section_nut_samples:
+        yield from check_nut_samples(params, section_nut_samples[item])
 
 
 agent_section_nut = AgentSection(
@@ -292,35 +1116,30 @@ agent_section_nut = AgentSection(
 )
 
 
+agent_section_nut_static = AgentSection(
+    name="nut_static",
+    parse_function=nut_parse,
+)
+
+
+agent_section_nut_samples = AgentSection(
+    name="nut_samples",
+    parse_function=parse_nut_samples,
+)
+
+
 check_plugin_nut = CheckPlugin(
     name="nut",
     service_name="UPS %s",
-    discovery_function=discover_nut,
-    check_function=check_nut,
-    sections=["nut"],
+    discovery_function=discover_nut_sections,
+    check_function=check_nut_sections,
+    sections=["nut", "nut_static", "nut_samples"],
     check_default_parameters={
-        'battery_charge': ("fixed", (90, 85)),
-        'battery_runtime': ("fixed", (1200, 900)),
-        'battery_voltage': ("fixed", (10, 5)),
-        'input_frequency': {
-            'lower': ('fixed', (49, 45)),
-            'upper': ('fixed', (51, 55))
-        },
-        'input_voltage': {
-            'lower': ('fixed', (0, 0)),
-            'upper': ('fixed', (245, 250))
-        },
-        'output_voltage': {
-            'lower': ('fixed', (0, 0)),
-            'upper': ('fixed', (245, 250))
-        },
-        'input_voltage_fault': ("fixed", (155, 160)),
+        **default_levels(),
         'ups_beeper_status': 'enabled',
-        'ups_load': {
-            'lower': ('fixed', (0, 0)),
-            'upper': ('fixed', (50, 70))
-        },
-        'ups_temperature': ("fixed", (35, 40)),
+        'flap_rate': ("fixed", (4.0, 10.0)),
+        'stale_grace': 600,
+        'stale_state': State.OK.value,
     },
     check_ruleset_name="nut",
 )
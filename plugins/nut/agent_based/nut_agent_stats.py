@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Module for the upsd servers the NUT agent plugins and the special agent query.
+
+nut.sh, nut.py, the collector and the special agent send one line per upsd
+server in the nut_agent_stats section:
+
+    <<<nut_agent_stats>>>
+    localhost 0.0012 0.0410 2 84 5120
+    nas:3494 - 5.0021 - - 0 timed out
+
+The fields are the server, the connect and response time in seconds, the
+number of UPSes and variables, the bytes received and the error of the
+query, if any. "-" marks values which are not known. Each server gets a
+service, so a degrading upsd or a slow link shows up before it hits the
+timeout of the agent.
+
+The servers which failed are also listed in the nut_errors section, which
+older versions of the plugins send without nut_agent_stats:
+
+    <<<nut_errors>>>
+    nas:3494 timed out
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, TypeVar
+
+from cmk.agent_based.v2 import (
+    AgentSection,
+    CheckPlugin,
+    CheckResult,
+    DiscoveryResult,
+    Result,
+    Service,
+    State,
+    StringTable,
+    check_levels,
+    render,
+)
+
+_T = TypeVar("_T")
+
+
+class TargetStats(NamedTuple):
+    '''The statistics of the query of one upsd server.'''
+    connect_time: Optional[float]
+    response_time: Optional[float]
+    upses: Optional[int]
+    variables: Optional[int]
+    bytes: Optional[int]
+    error: Optional[str]
+
+
+Section = Dict[str, TargetStats]
+
+# upsd server (host[:port]): error of its query
+ErrorsSection = Dict[str, str]
+
+
+def _value(raw: str, convert: Callable[[str], _T]) -> Optional[_T]:
+    '''A field of the section, None if it is not known.'''
+    try:
+        return convert(raw)
+    except ValueError:
+        return None
+
+
+def parse_nut_agent_stats(string_table: StringTable) -> Section:
+    '''
+    Parse the nut_agent_stats section.
+
+    Args:
+        string_table (StringTable): One line per upsd server.
+
+    Returns:
+        Section: The servers, host[:port], mapped to their statistics.
+    '''
+    parsed: Section = {}
+    for line in string_table:
+        if len(line) < 6:
+            continue
+        parsed[line[0]] = TargetStats(
+            connect_time=_value(line[1], float),
+            response_time=_value(line[2], float),
+            upses=_value(line[3], int),
+            variables=_value(line[4], int),
+            bytes=_value(line[5], int),
+            error=" ".join(line[6:]) or None,
+        )
+    return parsed
+
+
+def parse_nut_errors(string_table: StringTable) -> ErrorsSection:
+    '''
+    Parse the nut_errors section.
+
+    Args:
+        string_table (StringTable): One line per failed upsd server.
+
+    Returns:
+        ErrorsSection: The failed servers, host[:port], mapped to their error.
+    '''
+    return {line[0]: " ".join(line[1:]) or "failed" for line in string_table if line}
+
+
+def discover_nut_agent_stats(
+    section_nut_agent_stats: Optional[Section],
+    section_nut_errors: Optional[ErrorsSection],
+) -> DiscoveryResult:
+    '''One service per upsd server.'''
+    for target in {**(section_nut_errors or {}), **(section_nut_agent_stats or {})}:
+        yield Service(item=target)
+
+
+def check_nut_agent_stats(
+    item: str,
+    params: Mapping[str, Any],
+    section_nut_agent_stats: Optional[Section],
+    section_nut_errors: Optional[ErrorsSection],
+) -> CheckResult:
+    '''
+    Check the query of one upsd server.
+
+    Args:
+        item (str): The upsd server, host[:port].
+        params (Mapping[str, Any]): The levels and the state of failed queries.
+        section_nut_agent_stats (Section): The parsed nut_agent_stats section.
+        section_nut_errors (ErrorsSection): The parsed nut_errors section.
+
+    Yields:
+        CheckResult: The error of the query, the times and the sizes.
+    '''
+    stats = (section_nut_agent_stats or {}).get(item)
+    error = stats.error if stats is not None else (section_nut_errors or {}).get(item)
+    if error is not None:
+        yield Result(
+            state=State(params.get('error_state', State.CRIT.value)),
+            summary=f"Error: {error}",
+        )
+    if stats is None:
+        if error is None:
+            yield Result(state=State.UNKNOWN, summary="Could not find data in output")
+        return
+
+    if stats.connect_time is not None:
+        yield from check_levels(
+            stats.connect_time,
+            metric_name="nut_agent_connect_time",
+            label="Connect time",
+            levels_upper=params.get('connect_time'),
+            render_func=render.timespan,
+            boundaries=(0, None),
+        )
+    if stats.response_time is not None:
+        yield from check_levels(
+            stats.response_time,
+            metric_name="nut_agent_response_time",
+            label="Response time",
+            levels_upper=params.get('response_time'),
+            render_func=render.timespan,
+            boundaries=(0, None),
+        )
+    if stats.upses is not None:
+        yield from check_levels(
+            stats.upses,
+            metric_name="nut_agent_upses",
+            label="UPSes",
+            levels_lower=params.get('upses'),
+            render_func=str,
+            boundaries=(0, None),
+        )
+    if stats.variables is not None:
+        yield from check_levels(
+            stats.variables,
+            metric_name="nut_agent_variables",
+            label="Variables",
+            render_func=str,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+    if stats.bytes is not None:
+        yield from check_levels(
+            stats.bytes,
+            metric_name="nut_agent_bytes",
+            label="Received",
+            render_func=render.bytes,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+
+
+agent_section_nut_agent_stats = AgentSection(
+    name="nut_agent_stats",
+    parse_function=parse_nut_agent_stats,
+)
+
+
+agent_section_nut_errors = AgentSection(
+    name="nut_errors",
+    parse_function=parse_nut_errors,
+)
+
+
+check_plugin_nut_agent_stats = CheckPlugin(
+    name="nut_agent_stats",
+    service_name="NUT upsd %s",
+    sections=["nut_agent_stats", "nut_errors"],
+    discovery_function=discover_nut_agent_stats,
+    check_function=check_nut_agent_stats,
+    check_ruleset_name="nut_agent_stats",
+    check_default_parameters={
+        'response_time': ("fixed", (2.0, 4.0)),
+        'error_state': State.CRIT.value,
+    },
+)
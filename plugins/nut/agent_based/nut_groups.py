@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Module for the NUT redundancy group and host summary checks.
+
+A discovery rule groups the UPSes of a host, like the A and B feed of a rack.
+Each group gets a service telling whether the remaining UPSes can carry the
+combined load if one of them fails (N-1). Optionally one summary service
+sums up all UPSes of the host. Both evaluate their UPSes in a single pass
+over the parsed nut section.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from cmk.agent_based.v2 import (
+    CheckPlugin,
+    CheckResult,
+    DiscoveryResult,
+    Result,
+    RuleSetType,
+    Service,
+    State,
+    check_levels,
+    render,
+)
+
+from .nut import Section, UpsData, UpsStatus, merge_static, status_flags
+
+
+def _members(
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+    patterns: Optional[Sequence[str]] = None,
+) -> Iterable[Tuple[str, UpsData]]:
+    '''
+    The UPSes of the host, completed with their static values.
+
+    Args:
+        section_nut (Section): The parsed nut section.
+        section_nut_static (Section): The parsed nut_static section.
+        patterns (Sequence[str]): Regular expressions matching the beginning
+            of the UPS names. None selects all UPSes.
+
+    Yields:
+        Tuple[str, UpsData]: UPS names and their data.
+    '''
+    static = section_nut_static or {}
+    for name, ups_data in sorted((section_nut or {}).items()):
+        if patterns is not None and not any(re.match(p, name) for p in patterns):
+            continue
+        yield name, merge_static(ups_data, static[name]) if name in static else ups_data
+
+
+def _without_data(
+    members: Iterable[Tuple[str, UpsData]],
+) -> Tuple[List[Tuple[str, UpsData]], List[str]]:
+    '''
+    Separate the UPSes the agent could not query from the others.
+
+    The agent lists the UPSes of a failed upsd server or driver with
+    collector.error only, so they cannot take part in the aggregation.
+
+    Args:
+        members (Iterable[Tuple[str, UpsData]]): UPS names and their data.
+
+    Returns:
+        Tuple: The UPSes with data and the names of those without.
+    '''
+    available: List[Tuple[str, UpsData]] = []
+    missing: List[str] = []
+    for name, ups_data in members:
+        if 'collector_error' in ups_data:
+            missing.append(name)
+        else:
+            available.append((name, ups_data))
+    return available, missing
+
+
+def _check_missing(missing: Sequence[str], total: int) -> CheckResult:
+    '''Warn about UPSes without data, which are left out of the aggregation.'''
+    if missing:
+        yield Result(
+            state=State.WARN,
+            summary=f"{len(missing)} of {total} members without data: {_render_names(missing)}",
+        )
+
+
+def aggregate(members: Iterable[Tuple[str, UpsData]]) -> Dict[str, Any]:
+    '''
+    Sum up the data of several UPSes in one pass.
+
+    Args:
+        members (Iterable[Tuple[str, UpsData]]): UPS names and their data.
+
+    Returns:
+        Dict[str, Any]: The names of all UPSes, of those on battery and with
+        low battery, the total and nominal real power, the total load, and
+        the worst runtime and charge with the names of the UPSes. Totals are
+        None if one of the UPSes does not report the value.
+    '''
+    names: List[str] = []
+    on_battery: List[str] = []
+    low_battery: List[str] = []
+    realpower: Optional[float] = 0.0
+    nominal: Optional[List[float]] = []
+    load: Optional[float] = 0.0
+    runtime: Optional[Tuple[float, str]] = None
+    charge: Optional[Tuple[float, str]] = None
+
+    for name, ups_data in members:
+        names.append(name)
+        flags = status_flags(ups_data)
+        if flags & UpsStatus.OB:
+            on_battery.append(name)
+        if flags & UpsStatus.LB:
+            low_battery.append(name)
+
+        value = ups_data.get('ups_realpower')
+        realpower = None if value is None or realpower is None else realpower + value
+        value = ups_data.get('ups_realpower_nominal')
+        nominal = None if value is None or nominal is None else nominal + [value]
+        value = ups_data.get('ups_load')
+        load = None if value is None or load is None else load + value
+
+        value = ups_data.get('battery_runtime')
+        if value is not None and (runtime is None or value < runtime[0]):
+            runtime = (value, name)
+        value = ups_data.get('battery_charge')
+        if value is not None and (charge is None or value < charge[0]):
+            charge = (value, name)
+
+    return {
+        'names': names,
+        'on_battery': on_battery,
+        'low_battery': low_battery,
+        'realpower': realpower if names else None,
+        'nominal': nominal if names else None,
+        'load': load if names else None,
+        'runtime': runtime,
+        'charge': charge,
+    }
+
+
+def n1_load(summary: Mapping[str, Any]) -> Optional[float]:
+    '''
+    Load of the remaining UPSes in percent if the biggest one fails.
+
+    With the real power and the nominal real power of all UPSes the load is
+    related to the remaining capacity. Otherwise the UPSes are assumed to be
+    of equal size and the load percentages are spread over one UPS less.
+
+    Args:
+        summary (Mapping[str, Any]): Result of aggregate.
+
+    Returns:
+        Optional[float]: The load, None for less than two UPSes or without data.
+    '''
+    count = len(summary['names'])
+    if count < 2:
+        return None
+    if summary['realpower'] is not None and summary['nominal']:
+        remaining = sum(summary['nominal']) - max(summary['nominal'])
+        if remaining > 0:
+            return summary['realpower'] / remaining * 100
+    if summary['load'] is not None:
+        return summary['load'] / (count - 1)
+    return None
+
+
+def _render_names(names: Sequence[str]) -> str:
+    return ", ".join(names)
+
+
+def _check_common(params: Mapping[str, Any], summary: Mapping[str, Any]) -> CheckResult:
+    '''Results shared by the group and the summary service.'''
+    if summary['low_battery']:
+        yield Result(
+            state=State.CRIT,
+            summary=f"Low battery: {_render_names(summary['low_battery'])}",
+        )
+    yield from check_levels(
+        len(summary['on_battery']),
+        metric_name="nut_fleet_on_battery",
+        label="On battery",
+        levels_upper=params.get('on_battery'),
+        render_func=lambda v: f"{v:.0f}",
+        boundaries=(0, len(summary['names'])),
+    )
+    if summary['on_battery']:
+        yield Result(state=State.OK, notice=f"On battery: {_render_names(summary['on_battery'])}")
+    if summary['runtime'] is not None:
+        value, name = summary['runtime']
+        yield from check_levels(
+            value,
+            metric_name="nut_fleet_runtime_min",
+            label=f"Worst runtime ({name})",
+            levels_lower=params.get('battery_runtime'),
+            render_func=render.timespan,
+            boundaries=(0, None),
+        )
+    if summary['charge'] is not None:
+        value, name = summary['charge']
+        yield from check_levels(
+            value,
+            metric_name="nut_fleet_charge_min",
+            label=f"Worst charge ({name})",
+            levels_lower=params.get('battery_charge'),
+            render_func=render.percent,
+            notice_only=True,
+            boundaries=(0, 100),
+        )
+    if summary['realpower'] is not None:
+        yield from check_levels(
+            summary['realpower'],
+            metric_name="nut_fleet_realpower",
+            label="Combined real power",
+            levels_upper=params.get('realpower'),
+            render_func=lambda v: f"{v:0.0f} W",
+            boundaries=(0, None),
+        )
+    elif summary['load'] is not None:
+        yield from check_levels(
+            summary['load'],
+            metric_name="nut_fleet_load",
+            label="Combined load",
+            render_func=render.percent,
+            notice_only=True,
+            boundaries=(0, None),
+        )
+
+
+def discover_nut_group(
+    params: Sequence[Mapping[str, Any]],
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+) -> DiscoveryResult:
+    '''One service per configured group with at least one UPS present.'''
+    seen = set()
+    for rule in params:
+        for group in rule.get('groups', []):
+            if group['name'] in seen:
+                continue
+            seen.add(group['name'])
+            if any(_members(section_nut, None, group['members'])):
+                yield Service(item=group['name'], parameters={'members': group['members']})
+
+
+def check_nut_group(
+    item: str,
+    params: Mapping[str, Any],
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+) -> CheckResult:
+    '''
+    Check whether the UPSes of a redundancy group can carry their load.
+
+    Args:
+        item (str): The name of the group.
+        params (Mapping[str, Any]): The check parameters, including the
+            member patterns stored at discovery.
+        section_nut (Section): The parsed nut section.
+        section_nut_static (Section): The parsed nut_static section.
+
+    Yields:
+        CheckResult: Results and metrics of the group.
+    '''
+    available, missing = _without_data(
+        _members(section_nut, section_nut_static, params.get('members', []))
+    )
+    if not available and not missing:
+        yield Result(state=State.UNKNOWN, summary="No UPS of the group found in output")
+        return
+
+    summary = aggregate(available)
+    yield Result(state=State.OK, summary=f"UPSes: {len(summary['names'])}")
+    yield from _check_missing(missing, len(available) + len(missing))
+    if not available:
+        return
+    yield Result(state=State.OK, notice=f"Members: {_render_names(summary['names'])}")
+    yield from _check_common(params, summary)
+
+    load = n1_load(summary)
+    if load is None and missing:
+        # Already reported by the warning about the members without data
+        return
+    if load is None:
+        yield Result(
+            state=State(params.get('n1_state', State.CRIT.value)),
+            summary="N-1 redundancy: cannot be evaluated",
+        )
+        return
+    yield from check_levels(
+        load,
+        metric_name="nut_fleet_n1_load",
+        label="Load if one UPS fails",
+        levels_upper=params.get('n1_load'),
+        render_func=render.percent,
+        boundaries=(0, None),
+    )
+    if load > 100:
+        yield Result(
+            state=State(params.get('n1_state', State.CRIT.value)),
+            summary="N-1 redundancy lost",
+        )
+    else:
+        yield Result(state=State.OK, summary="N-1 redundancy holds")
+
+
+def discover_nut_summary(
+    params: Sequence[Mapping[str, Any]],
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+) -> DiscoveryResult:
+    '''The summary service, if requested by one of the rules.'''
+    if section_nut and any(rule.get('host_summary') for rule in params):
+        yield Service()
+
+
+def check_nut_summary(
+    params: Mapping[str, Any],
+    section_nut: Optional[Section],
+    section_nut_static: Optional[Section],
+) -> CheckResult:
+    '''
+    Sum up all UPSes of the host in one service.
+
+    Args:
+        params (Mapping[str, Any]): The check parameters.
+        section_nut (Section): The parsed nut section.
+        section_nut_static (Section): The parsed nut_static section.
+
+    Yields:
+        CheckResult: Results and metrics of all UPSes together.
+    '''
+    available, missing = _without_data(_members(section_nut, section_nut_static))
+    if not available and not missing:
+        yield Result(state=State.UNKNOWN, summary="No UPS found in output")
+        return
+    summary = aggregate(available)
+    yield from check_levels(
+        len(summary['names']),
+        metric_name="nut_fleet_ups_count",
+        label="UPSes",
+        render_func=lambda v: f"{v:.0f}",
+        boundaries=(0, None),
+    )
+    yield from _check_missing(missing, len(available) + len(missing))
+    if available:
+        yield from _check_common(params, summary)
+
+
+check_plugin_nut_group = CheckPlugin(
+    name="nut_group",
+    service_name="UPS group %s",
+    sections=["nut", "nut_static"],
+    discovery_function=discover_nut_group,
+    discovery_ruleset_name="nut_groups",
+    discovery_ruleset_type=RuleSetType.ALL,
+    discovery_default_parameters={},
+    check_function=check_nut_group,
+    check_ruleset_name="nut_group",
+    check_default_parameters={
+        'battery_runtime': ("fixed", (1200, 900)),
+        'n1_load': ("fixed", (80.0, 100.0)),
+        'n1_state': State.CRIT.value,
+    },
+)
+
+
+check_plugin_nut_summary = CheckPlugin(
+    name="nut_summary",
+    service_name="UPS summary",
+    sections=["nut", "nut_static"],
+    discovery_function=discover_nut_summary,
+    discovery_ruleset_name="nut_groups",
+    discovery_ruleset_type=RuleSetType.ALL,
+    discovery_default_parameters={},
+    check_function=check_nut_summary,
+    check_ruleset_name="nut_summary",
+    check_default_parameters={
+        'battery_runtime': ("fixed", (1200, 900)),
+    },
+)
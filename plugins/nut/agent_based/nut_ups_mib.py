@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Module for UPSes monitored via SNMP and the UPS-MIB (RFC 1628).
+
+Network cards of many UPSes implement the standard UPS-MIB. This module
+fetches it and translates it into the NUT variables the snmp-ups driver
+of NUT would report, so the result is parsed into the same section as the
+output of the agent plugin. The nut check, its rules and graphs therefore
+apply unchanged, without a snmp-ups driver and upsd in between.
+
+The tables of the MIB are fetched by walking them, which Checkmk does with
+bulk requests for hosts configured for SNMP bulkwalk.
+
+Checkmk monitors every UPS-MIB device with its own ups_* checks already, so
+the services of this module are only discovered on hosts enabled in the rule
+"Network UPS Tools via SNMP (UPS-MIB)".
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from cmk.agent_based.v2 import (
+    CheckPlugin,
+    CheckResult,
+    DiscoveryResult,
+    SNMPSection,
+    SNMPTree,
+    StringTable,
+    exists,
+)
+
+from .nut import Section, check_nut_sections, check_plugin_nut, discover_nut, nut_parse
+
+UPS_MIB = ".1.3.6.1.2.1.33.1"
+
+# Scalars of the UPS-MIB, fetched as one row
+_IDENT_NAME, _IDENT_MODEL = "1.5.0", "1.2.0"
+_SCALARS: Tuple[str, ...] = (
+    _IDENT_NAME,
+    _IDENT_MODEL,
+    "2.1.0",  # upsBatteryStatus
+    "2.3.0",  # upsEstimatedMinutesRemaining
+    "2.4.0",  # upsEstimatedChargeRemaining
+    "2.5.0",  # upsBatteryVoltage (0.1 V)
+    "2.6.0",  # upsBatteryCurrent (0.1 A)
+    "2.7.0",  # upsBatteryTemperature
+    "4.1.0",  # upsOutputSource
+    "4.2.0",  # upsOutputFrequency (0.1 Hz)
+    "9.5.0",  # upsConfigOutputVA
+    "9.6.0",  # upsConfigOutputPower
+    "9.8.0",  # upsConfigAudibleStatus
+)
+
+# Scalar: (NUT variable, factor), like the ietf mapping of the snmp-ups driver
+_SCALAR_VARIABLES: Mapping[str, Tuple[str, float]] = {
+    "2.3.0": ("battery.runtime", 60),
+    "2.4.0": ("battery.charge", 1),
+    "2.5.0": ("battery.voltage", 0.1),
+    "2.6.0": ("battery.current", 0.1),
+    "2.7.0": ("battery.temperature", 1),
+    "4.2.0": ("output.frequency", 0.1),
+    "9.5.0": ("ups.power.nominal", 1),
+    "9.6.0": ("ups.realpower.nominal", 1),
+}
+
+# Columns of upsInputTable and upsOutputTable: (column, NUT variable, factor),
+# {phase} is replaced for UPSes with several lines, the first line wins for
+# variables without it
+_INPUT_COLUMNS: Tuple[Tuple[str, str, float], ...] = (
+    ("2", "input.frequency", 0.1),
+    ("3", "input{phase}.voltage", 1),
+    ("4", "input{phase}.current", 0.1),
+    ("5", "input{phase}.realpower", 1),
+)
+_OUTPUT_COLUMNS: Tuple[Tuple[str, str, float], ...] = (
+    ("2", "output{phase}.voltage", 1),
+    ("3", "output{phase}.current", 0.1),
+    ("4", "output{phase}.realpower", 1),
+    ("5", "output{phase}.power.percent", 1),
+)
+
+# upsOutputSource: flags of ups.status
+_OUTPUT_SOURCE_STATUS: Mapping[str, Tuple[str, ...]] = {
+    "2": ("OFF",),
+    "3": ("OL",),
+    "4": ("OL", "BYPASS"),
+    "5": ("OB",),
+    "6": ("OL", "BOOST"),
+    "7": ("OL", "TRIM"),
+}
+
+# upsBatteryStatus: flags of ups.status
+_BATTERY_STATUS: Mapping[str, Tuple[str, ...]] = {
+    "3": ("LB",),  # batteryLow
+    "4": ("LB",),  # batteryDepleted
+}
+
+_AUDIBLE_STATUS: Mapping[str, str] = {
+    "1": "disabled",
+    "2": "enabled",
+    "3": "muted",
+}
+
+# Well known alarms (upsWellKnownAlarms): (name, flag of ups.status or None)
+_ALARMS: Mapping[str, Tuple[str, Optional[str]]] = {
+    "1": ("Battery bad", "RB"),
+    "2": ("On battery", None),
+    "3": ("Low battery", None),
+    "4": ("Depleted battery", None),
+    "5": ("Temperature bad", "ALARM"),
+    "6": ("Input bad", "ALARM"),
+    "7": ("Output bad", "ALARM"),
+    "8": ("Output overload", "OVER"),
+    "9": ("On bypass", None),
+    "10": ("Bypass bad", "ALARM"),
+    "11": ("Output off as requested", None),
+    "12": ("UPS off as requested", None),
+    "13": ("Charger failed", "ALARM"),
+    "14": ("UPS output off", None),
+    "15": ("UPS system off", None),
+    "16": ("Fan failure", "ALARM"),
+    "17": ("Fuse failure", "ALARM"),
+    "18": ("General fault", "ALARM"),
+    "19": ("Diagnostic test failed", "ALARM"),
+    "20": ("Communications lost", "ALARM"),
+    "21": ("Awaiting power", None),
+    "22": ("Shutdown pending", "ALARM"),
+    "23": ("Shutdown imminent", "FSD"),
+    "24": ("Test in progress", "TEST"),
+}
+_WELL_KNOWN_ALARMS = f"{UPS_MIB}.6.3.".lstrip(".")
+
+
+def _scaled(raw: str, factor: float) -> Optional[str]:
+    '''A raw integer of the MIB in the unit of NUT, None if it is missing.'''
+    try:
+        value = int(raw) * factor
+    except ValueError:
+        return None
+    return str(round(value, 3))
+
+
+def _line_variables(
+    rows: StringTable,
+    columns: Tuple[Tuple[str, str, float], ...],
+) -> Dict[str, str]:
+    '''
+    Variables of the lines of the input or output table.
+
+    The variables of a UPS with a single line carry no phase, those of a UPS
+    with three lines are named after the phases, like input.L1.voltage.
+    '''
+    variables: Dict[str, str] = {}
+    phases: Sequence[str] = [""] if len(rows) == 1 else [f".L{idx}" for idx in range(1, 4)]
+    for phase, row in zip(phases, rows):
+        for (_column, variable, factor), raw in zip(columns, row):
+            value = _scaled(raw, factor)
+            if value is not None:
+                variables.setdefault(variable.format(phase=phase), value)
+    return variables
+
+
+def _status(source: str, battery: str, alarms: Sequence[str]) -> Tuple[str, List[str]]:
+    '''The ups.status and the names of the alarms not covered by a status flag.'''
+    flags = list(_OUTPUT_SOURCE_STATUS.get(source, ()))
+    flags.extend(_BATTERY_STATUS.get(battery, ()))
+    texts = []
+    for alarm in alarms:
+        name, flag = _ALARMS.get(alarm, (f"Alarm {alarm}", "ALARM"))
+        if flag == "ALARM":
+            texts.append(name)
+        if flag is not None and flag not in flags:
+            flags.append(flag)
+    return " ".join(flags), texts
+
+
+def ups_mib_variables(string_table: Sequence[StringTable]) -> Tuple[str, Dict[str, str]]:
+    '''
+    Translate the fetched UPS-MIB into NUT variables.
+
+    Args:
+        string_table (Sequence[StringTable]): The scalars, the input table,
+            the output table and the alarm table.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The name of the UPS and its variables,
+        as the snmp-ups driver of NUT reports them.
+    '''
+    scalars_rows, input_rows, output_rows, alarm_rows = string_table
+    scalars = dict(zip(_SCALARS, scalars_rows[0])) if scalars_rows else {}
+    name = scalars.get(_IDENT_NAME) or scalars.get(_IDENT_MODEL) or "ups"
+
+    variables: Dict[str, str] = {}
+    for oid, (variable, factor) in _SCALAR_VARIABLES.items():
+        value = _scaled(scalars.get(oid, ""), factor)
+        if value is not None:
+            variables[variable] = value
+    variables.update(_line_variables(input_rows, _INPUT_COLUMNS))
+    variables.update(_line_variables(output_rows, _OUTPUT_COLUMNS))
+    if "output.power.percent" in variables:
+        variables["ups.load"] = variables.pop("output.power.percent")
+    if "output.realpower" in variables:
+        variables["ups.realpower"] = variables.pop("output.realpower")
+    elif "output.L1.realpower" in variables:
+        variables["ups.realpower"] = str(sum(
+            float(variables.get(f"output.L{idx}.realpower", 0)) for idx in range(1, 4)
+        ))
+    if scalars.get("9.8.0") in _AUDIBLE_STATUS:
+        variables["ups.beeper.status"] = _AUDIBLE_STATUS[scalars["9.8.0"]]
+
+    # upsAlarmDescr points to a well known alarm, vendor specific ones count too
+    alarms = [
+        row[0].lstrip(".")[len(_WELL_KNOWN_ALARMS):]
+        if row[0].lstrip(".").startswith(_WELL_KNOWN_ALARMS) else row[0]
+        for row in alarm_rows
+        if row and row[0]
+    ]
+    status, alarm_texts = _status(
+        scalars.get("4.1.0", ""), scalars.get("2.1.0", ""), alarms
+    )
+    if status:
+        variables["ups.status"] = status
+    if alarm_texts:
+        variables["ups.alarm"] = ", ".join(alarm_texts)
+    return name, variables
+
+
+def parse_nut_ups_mib(string_table: Sequence[StringTable]) -> Optional[Section]:
+    '''
+    Parse the UPS-MIB into the section of the nut check.
+
+    The variables are fed through nut_parse, so the record of the UPS is
+    exactly the one the agent plugin would produce.
+
+    Args:
+        string_table (Sequence[StringTable]): The fetched trees.
+
+    Returns:
+        Section: The UPS mapped to its data, None without data.
+    '''
+    name, variables = ups_mib_variables(string_table)
+    if not variables:
+        return None
+    return nut_parse(
+        [["==>", name, "<=="]]
+        + [[f"{variable}:", value] for variable, value in sorted(variables.items())]
+    )
+
+
+def discover_nut_ups_mib(params: Mapping[str, Any], section: Section) -> DiscoveryResult:
+    '''One service per UPS, only on hosts enabled by the discovery rule.'''
+    if params.get('enabled'):
+        yield from discover_nut(section)
+
+
+def check_nut_ups_mib(item: str, params: Mapping[str, Any], section: Section) -> CheckResult:
+    '''Check the UPS like the nut check does, with the same rules.'''
+    yield from check_nut_sections(item, params, section, None, None)
+
+
+snmp_section_nut_ups_mib = SNMPSection(
+    name="nut_ups_mib",
+    detect=exists(f"{UPS_MIB}.1.1.0"),
+    fetch=[
+        SNMPTree(base=UPS_MIB, oids=list(_SCALARS)),
+        SNMPTree(base=f"{UPS_MIB}.3.3.1", oids=[column for column, _v, _f in _INPUT_COLUMNS]),
+        SNMPTree(base=f"{UPS_MIB}.4.4.1", oids=[column for column, _v, _f in _OUTPUT_COLUMNS]),
+        SNMPTree(base=f"{UPS_MIB}.6.2.1", oids=["2"]),
+    ],
+    parse_function=parse_nut_ups_mib,
+)
+
+
+check_plugin_nut_ups_mib = CheckPlugin(
+    name="nut_ups_mib",
+    service_name="UPS %s",
+    discovery_function=discover_nut_ups_mib,
+    discovery_ruleset_name="nut_ups_mib",
+    discovery_default_parameters={'enabled': False},
+    check_function=check_nut_ups_mib,
+    check_default_parameters=check_plugin_nut.check_default_parameters,
+    check_ruleset_name="nut",
+)
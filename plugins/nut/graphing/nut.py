@@ -14,8 +14,8 @@
 
 # from cmk.gui.plugins.metrics import metric_info
 from cmk.graphing.v1 import Title
-# from cmk.graphing.v1.graphs import Graph, MinimalRange
-from cmk.graphing.v1.metrics import Color, DecimalNotation, Metric, Unit, TimeNotation
+from cmk.graphing.v1.graphs import Graph
+from cmk.graphing.v1.metrics import Color, DecimalNotation, IECNotation, Metric, Unit, TimeNotation
 from cmk.graphing.v1.perfometers import Closed, FocusRange, Perfometer
 
 metric_nut_battery_charge = Metric(
@@ -39,6 +39,20 @@ metric_nut_battery_voltage = Metric(
     color=Color.GREEN,
 )
 
+metric_nut_battery_current = Metric(
+    name="nut_battery_current",
+    title=Title("Battery current"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.DARK_GREEN,
+)
+
+metric_nut_battery_temperature = Metric(
+    name="nut_battery_temperature",
+    title=Title("Battery temperature"),
+    unit=Unit(DecimalNotation("C")),
+    color=Color.DARK_BROWN,
+)
+
 metric_nut_input_frequency = Metric(
     name="nut_input_frequency",
     title=Title("Input frequency"),
@@ -60,6 +74,13 @@ metric_nut_input_voltage_fault = Metric(
     color=Color.RED,
 )
 
+metric_nut_input_current = Metric(
+    name="nut_input_current",
+    title=Title("Input current"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.LIGHT_ORANGE,
+)
+
 metric_nut_output_voltage = Metric(
     name="nut_output_voltage",
     title=Title("Output voltage"),
@@ -67,6 +88,20 @@ metric_nut_output_voltage = Metric(
     color=Color.GREEN,
 )
 
+metric_nut_output_frequency = Metric(
+    name="nut_output_frequency",
+    title=Title("Output frequency"),
+    unit=Unit(DecimalNotation("1/s")),
+    color=Color.DARK_YELLOW,
+)
+
+metric_nut_output_current = Metric(
+    name="nut_output_current",
+    title=Title("Output current"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.DARK_ORANGE,
+)
+
 metric_nut_ups_load = Metric(
     name="nut_ups_load",
     title=Title("Load"),
@@ -74,6 +109,34 @@ metric_nut_ups_load = Metric(
     color=Color.GREEN,
 )
 
+metric_nut_ups_power = Metric(
+    name="nut_ups_power",
+    title=Title("Apparent power"),
+    unit=Unit(DecimalNotation("VA")),
+    color=Color.PURPLE,
+)
+
+metric_nut_ups_realpower = Metric(
+    name="nut_ups_realpower",
+    title=Title("Real power"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.ORANGE,
+)
+
+metric_nut_ups_realpower_headroom = Metric(
+    name="nut_ups_realpower_headroom",
+    title=Title("Real power headroom"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.LIGHT_GREEN,
+)
+
+metric_nut_ups_efficiency = Metric(
+    name="nut_ups_efficiency",
+    title=Title("Efficiency"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.LIGHT_PURPLE,
+)
+
 metric_nut_ups_temperature = Metric(
     name="nut_ups_temperature",
     title=Title("Temperature"),
@@ -81,8 +144,610 @@ metric_nut_ups_temperature = Metric(
     color=Color.BROWN,
 )
 
+metric_nut_input_phase_voltage_l1 = Metric(
+    name="nut_input_phase_voltage_l1",
+    title=Title("Input voltage L1"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BROWN,
+)
+
+metric_nut_input_phase_voltage_l2 = Metric(
+    name="nut_input_phase_voltage_l2",
+    title=Title("Input voltage L2"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BLACK,
+)
+
+metric_nut_input_phase_voltage_l3 = Metric(
+    name="nut_input_phase_voltage_l3",
+    title=Title("Input voltage L3"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.GRAY,
+)
+
+metric_nut_input_phase_voltage_imbalance = Metric(
+    name="nut_input_phase_voltage_imbalance",
+    title=Title("Input voltage imbalance"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_PURPLE,
+)
+
+graph_nut_input_phase_voltage = Graph(
+    name="nut_input_phase_voltage",
+    title=Title("Input voltage per phase"),
+    simple_lines=[
+        "nut_input_phase_voltage_l1",
+        "nut_input_phase_voltage_l2",
+        "nut_input_phase_voltage_l3",
+    ],
+    optional=["nut_input_phase_voltage_l2", "nut_input_phase_voltage_l3"],
+)
+
+metric_nut_input_line_voltage_l1_l2 = Metric(
+    name="nut_input_line_voltage_l1_l2",
+    title=Title("Input voltage L1-L2"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BROWN,
+)
+
+metric_nut_input_line_voltage_l2_l3 = Metric(
+    name="nut_input_line_voltage_l2_l3",
+    title=Title("Input voltage L2-L3"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BLACK,
+)
+
+metric_nut_input_line_voltage_l3_l1 = Metric(
+    name="nut_input_line_voltage_l3_l1",
+    title=Title("Input voltage L3-L1"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.GRAY,
+)
+
+metric_nut_input_line_voltage_imbalance = Metric(
+    name="nut_input_line_voltage_imbalance",
+    title=Title("Input voltage imbalance (line to line)"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.LIGHT_PURPLE,
+)
+
+graph_nut_input_line_voltage = Graph(
+    name="nut_input_line_voltage",
+    title=Title("Input voltage between phases"),
+    simple_lines=[
+        "nut_input_line_voltage_l1_l2",
+        "nut_input_line_voltage_l2_l3",
+        "nut_input_line_voltage_l3_l1",
+    ],
+    optional=["nut_input_line_voltage_l2_l3", "nut_input_line_voltage_l3_l1"],
+)
+
+metric_nut_input_phase_current_l1 = Metric(
+    name="nut_input_phase_current_l1",
+    title=Title("Input current L1"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.BROWN,
+)
+
+metric_nut_input_phase_current_l2 = Metric(
+    name="nut_input_phase_current_l2",
+    title=Title("Input current L2"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.BLACK,
+)
+
+metric_nut_input_phase_current_l3 = Metric(
+    name="nut_input_phase_current_l3",
+    title=Title("Input current L3"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.GRAY,
+)
+
+metric_nut_input_phase_current_imbalance = Metric(
+    name="nut_input_phase_current_imbalance",
+    title=Title("Input current imbalance"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_PURPLE,
+)
+
+graph_nut_input_phase_current = Graph(
+    name="nut_input_phase_current",
+    title=Title("Input current per phase"),
+    simple_lines=[
+        "nut_input_phase_current_l1",
+        "nut_input_phase_current_l2",
+        "nut_input_phase_current_l3",
+    ],
+    optional=["nut_input_phase_current_l2", "nut_input_phase_current_l3"],
+)
+
+metric_nut_input_phase_realpower_l1 = Metric(
+    name="nut_input_phase_realpower_l1",
+    title=Title("Input real power L1"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.BROWN,
+)
+
+metric_nut_input_phase_realpower_l2 = Metric(
+    name="nut_input_phase_realpower_l2",
+    title=Title("Input real power L2"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.BLACK,
+)
+
+metric_nut_input_phase_realpower_l3 = Metric(
+    name="nut_input_phase_realpower_l3",
+    title=Title("Input real power L3"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.GRAY,
+)
+
+graph_nut_input_phase_realpower = Graph(
+    name="nut_input_phase_realpower",
+    title=Title("Input real power per phase"),
+    simple_lines=[
+        "nut_input_phase_realpower_l1",
+        "nut_input_phase_realpower_l2",
+        "nut_input_phase_realpower_l3",
+    ],
+    optional=["nut_input_phase_realpower_l2", "nut_input_phase_realpower_l3"],
+)
+
+metric_nut_output_phase_voltage_l1 = Metric(
+    name="nut_output_phase_voltage_l1",
+    title=Title("Output voltage L1"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BROWN,
+)
+
+metric_nut_output_phase_voltage_l2 = Metric(
+    name="nut_output_phase_voltage_l2",
+    title=Title("Output voltage L2"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BLACK,
+)
+
+metric_nut_output_phase_voltage_l3 = Metric(
+    name="nut_output_phase_voltage_l3",
+    title=Title("Output voltage L3"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.GRAY,
+)
+
+metric_nut_output_phase_voltage_imbalance = Metric(
+    name="nut_output_phase_voltage_imbalance",
+    title=Title("Output voltage imbalance"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_PURPLE,
+)
+
+graph_nut_output_phase_voltage = Graph(
+    name="nut_output_phase_voltage",
+    title=Title("Output voltage per phase"),
+    simple_lines=[
+        "nut_output_phase_voltage_l1",
+        "nut_output_phase_voltage_l2",
+        "nut_output_phase_voltage_l3",
+    ],
+    optional=["nut_output_phase_voltage_l2", "nut_output_phase_voltage_l3"],
+)
+
+metric_nut_output_line_voltage_l1_l2 = Metric(
+    name="nut_output_line_voltage_l1_l2",
+    title=Title("Output voltage L1-L2"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BROWN,
+)
+
+metric_nut_output_line_voltage_l2_l3 = Metric(
+    name="nut_output_line_voltage_l2_l3",
+    title=Title("Output voltage L2-L3"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.BLACK,
+)
+
+metric_nut_output_line_voltage_l3_l1 = Metric(
+    name="nut_output_line_voltage_l3_l1",
+    title=Title("Output voltage L3-L1"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.GRAY,
+)
+
+metric_nut_output_line_voltage_imbalance = Metric(
+    name="nut_output_line_voltage_imbalance",
+    title=Title("Output voltage imbalance (line to line)"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.LIGHT_PURPLE,
+)
+
+graph_nut_output_line_voltage = Graph(
+    name="nut_output_line_voltage",
+    title=Title("Output voltage between phases"),
+    simple_lines=[
+        "nut_output_line_voltage_l1_l2",
+        "nut_output_line_voltage_l2_l3",
+        "nut_output_line_voltage_l3_l1",
+    ],
+    optional=["nut_output_line_voltage_l2_l3", "nut_output_line_voltage_l3_l1"],
+)
+
+metric_nut_output_phase_current_l1 = Metric(
+    name="nut_output_phase_current_l1",
+    title=Title("Output current L1"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.BROWN,
+)
+
+metric_nut_output_phase_current_l2 = Metric(
+    name="nut_output_phase_current_l2",
+    title=Title("Output current L2"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.BLACK,
+)
+
+metric_nut_output_phase_current_l3 = Metric(
+    name="nut_output_phase_current_l3",
+    title=Title("Output current L3"),
+    unit=Unit(DecimalNotation("A")),
+    color=Color.GRAY,
+)
+
+metric_nut_output_phase_current_imbalance = Metric(
+    name="nut_output_phase_current_imbalance",
+    title=Title("Output current imbalance"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_PURPLE,
+)
+
+graph_nut_output_phase_current = Graph(
+    name="nut_output_phase_current",
+    title=Title("Output current per phase"),
+    simple_lines=[
+        "nut_output_phase_current_l1",
+        "nut_output_phase_current_l2",
+        "nut_output_phase_current_l3",
+    ],
+    optional=["nut_output_phase_current_l2", "nut_output_phase_current_l3"],
+)
+
+metric_nut_output_phase_realpower_l1 = Metric(
+    name="nut_output_phase_realpower_l1",
+    title=Title("Output real power L1"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.BROWN,
+)
+
+metric_nut_output_phase_realpower_l2 = Metric(
+    name="nut_output_phase_realpower_l2",
+    title=Title("Output real power L2"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.BLACK,
+)
+
+metric_nut_output_phase_realpower_l3 = Metric(
+    name="nut_output_phase_realpower_l3",
+    title=Title("Output real power L3"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.GRAY,
+)
+
+graph_nut_output_phase_realpower = Graph(
+    name="nut_output_phase_realpower",
+    title=Title("Output real power per phase"),
+    simple_lines=[
+        "nut_output_phase_realpower_l1",
+        "nut_output_phase_realpower_l2",
+        "nut_output_phase_realpower_l3",
+    ],
+    optional=["nut_output_phase_realpower_l2", "nut_output_phase_realpower_l3"],
+)
+
+metric_nut_output_phase_load_l1 = Metric(
+    name="nut_output_phase_load_l1",
+    title=Title("Load L1"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.BROWN,
+)
+
+metric_nut_output_phase_load_l2 = Metric(
+    name="nut_output_phase_load_l2",
+    title=Title("Load L2"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.BLACK,
+)
+
+metric_nut_output_phase_load_l3 = Metric(
+    name="nut_output_phase_load_l3",
+    title=Title("Load L3"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.GRAY,
+)
+
+metric_nut_output_phase_load_imbalance = Metric(
+    name="nut_output_phase_load_imbalance",
+    title=Title("Load imbalance"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_PURPLE,
+)
+
+graph_nut_output_phase_load = Graph(
+    name="nut_output_phase_load",
+    title=Title("Load per phase"),
+    simple_lines=[
+        "nut_output_phase_load_l1",
+        "nut_output_phase_load_l2",
+        "nut_output_phase_load_l3",
+    ],
+    optional=["nut_output_phase_load_l2", "nut_output_phase_load_l3"],
+)
+
+metric_nut_battery_discharge_rate = Metric(
+    name="nut_battery_discharge_rate",
+    title=Title("Battery discharge rate"),
+    unit=Unit(DecimalNotation("%/min")),
+    color=Color.RED,
+)
+
+metric_nut_battery_recharge_rate = Metric(
+    name="nut_battery_recharge_rate",
+    title=Title("Battery recharge rate"),
+    unit=Unit(DecimalNotation("%/min")),
+    color=Color.GREEN,
+)
+
+metric_nut_battery_time_to_empty = Metric(
+    name="nut_battery_time_to_empty",
+    title=Title("Battery time to empty"),
+    unit=Unit(TimeNotation()),
+    color=Color.DARK_BLUE,
+)
+
+metric_nut_energy = Metric(
+    name="nut_energy",
+    title=Title("Energy"),
+    unit=Unit(DecimalNotation("Wh")),
+    color=Color.DARK_BLUE,
+)
+
+metric_nut_average_power = Metric(
+    name="nut_average_power",
+    title=Title("Average real power"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.LIGHT_BLUE,
+)
+
+metric_nut_agent_connect_time = Metric(
+    name="nut_agent_connect_time",
+    title=Title("upsd connect time"),
+    unit=Unit(TimeNotation()),
+    color=Color.LIGHT_GREEN,
+)
+
+metric_nut_agent_response_time = Metric(
+    name="nut_agent_response_time",
+    title=Title("upsd response time"),
+    unit=Unit(TimeNotation()),
+    color=Color.DARK_GREEN,
+)
+
+metric_nut_agent_upses = Metric(
+    name="nut_agent_upses",
+    title=Title("UPSes of the upsd server"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.BLUE,
+)
+
+metric_nut_agent_variables = Metric(
+    name="nut_agent_variables",
+    title=Title("Variables of the upsd server"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.CYAN,
+)
+
+metric_nut_agent_bytes = Metric(
+    name="nut_agent_bytes",
+    title=Title("Bytes received from the upsd server"),
+    unit=Unit(IECNotation("B")),
+    color=Color.PURPLE,
+)
+
+metric_nut_input_voltage_min = Metric(
+    name="nut_input_voltage_min",
+    title=Title("Input voltage (min)"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.DARK_YELLOW,
+)
+
+metric_nut_input_voltage_max = Metric(
+    name="nut_input_voltage_max",
+    title=Title("Input voltage (max)"),
+    unit=Unit(DecimalNotation("V")),
+    color=Color.LIGHT_YELLOW,
+)
+
+metric_nut_input_frequency_min = Metric(
+    name="nut_input_frequency_min",
+    title=Title("Input frequency (min)"),
+    unit=Unit(DecimalNotation("1/s")),
+    color=Color.DARK_ORANGE,
+)
+
+metric_nut_input_frequency_max = Metric(
+    name="nut_input_frequency_max",
+    title=Title("Input frequency (max)"),
+    unit=Unit(DecimalNotation("1/s")),
+    color=Color.LIGHT_ORANGE,
+)
+
+metric_nut_ups_load_min = Metric(
+    name="nut_ups_load_min",
+    title=Title("Load (min)"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_GREEN,
+)
+
+metric_nut_ups_load_max = Metric(
+    name="nut_ups_load_max",
+    title=Title("Load (max)"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.LIGHT_GREEN,
+)
+
+metric_nut_status_transitions = Metric(
+    name="nut_status_transitions",
+    title=Title("Status changes"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.PINK,
+)
+
+metric_nut_on_battery_time = Metric(
+    name="nut_on_battery_time",
+    title=Title("Time on battery"),
+    unit=Unit(TimeNotation()),
+    color=Color.DARK_RED,
+)
+
+metric_nut_status_transfers = Metric(
+    name="nut_status_transfers",
+    title=Title("Transfers to battery and back"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.PURPLE,
+)
+
+metric_nut_flap_rate = Metric(
+    name="nut_flap_rate",
+    title=Title("Flap rate"),
+    unit=Unit(DecimalNotation("/h")),
+    color=Color.DARK_PINK,
+)
+
+metric_nut_time_since_transfer = Metric(
+    name="nut_time_since_transfer",
+    title=Title("Time since last transfer"),
+    unit=Unit(TimeNotation()),
+    color=Color.CYAN,
+)
+
+metric_nut_fleet_ups_count = Metric(
+    name="nut_fleet_ups_count",
+    title=Title("UPSes"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.GRAY,
+)
+
+metric_nut_fleet_on_battery = Metric(
+    name="nut_fleet_on_battery",
+    title=Title("UPSes on battery"),
+    unit=Unit(DecimalNotation("")),
+    color=Color.RED,
+)
+
+metric_nut_fleet_runtime_min = Metric(
+    name="nut_fleet_runtime_min",
+    title=Title("Worst battery runtime"),
+    unit=Unit(TimeNotation()),
+    color=Color.BLUE,
+)
+
+metric_nut_fleet_charge_min = Metric(
+    name="nut_fleet_charge_min",
+    title=Title("Worst battery charge"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.LIGHT_BLUE,
+)
+
+metric_nut_fleet_realpower = Metric(
+    name="nut_fleet_realpower",
+    title=Title("Combined real power"),
+    unit=Unit(DecimalNotation("W")),
+    color=Color.ORANGE,
+)
+
+metric_nut_fleet_load = Metric(
+    name="nut_fleet_load",
+    title=Title("Combined load"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.GREEN,
+)
+
+metric_nut_fleet_n1_load = Metric(
+    name="nut_fleet_n1_load",
+    title=Title("Load if one UPS fails"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.DARK_RED,
+)
+
 perfometer_nut = Perfometer(
     name="nut",
     focus_range=FocusRange(Closed(0), Closed(100)),
     segments=["nut_battery_charge"],
 )
+
+perfometer_nut_fleet_n1_load = Perfometer(
+    name="nut_fleet_n1_load",
+    focus_range=FocusRange(Closed(0), Closed(100)),
+    segments=["nut_fleet_n1_load"],
+)
+
+graph_nut_ups_power = Graph(
+    name="nut_ups_power",
+    title=Title("UPS power"),
+    compound_lines=["nut_ups_realpower", "nut_ups_realpower_headroom"],
+    simple_lines=["nut_ups_power"],
+    optional=["nut_ups_power", "nut_ups_realpower_headroom"],
+)
+
+graph_nut_energy = Graph(
+    name="nut_energy",
+    title=Title("Energy"),
+    simple_lines=["nut_energy"],
+)
+
+graph_nut_average_power = Graph(
+    name="nut_average_power",
+    title=Title("Average real power"),
+    simple_lines=["nut_average_power", "nut_ups_realpower"],
+    optional=["nut_ups_realpower"],
+)
+
+graph_nut_agent_times = Graph(
+    name="nut_agent_times",
+    title=Title("upsd query times"),
+    simple_lines=["nut_agent_response_time", "nut_agent_connect_time"],
+    optional=["nut_agent_connect_time"],
+)
+
+graph_nut_battery_rates = Graph(
+    name="nut_battery_rates",
+    title=Title("Battery charge rates"),
+    simple_lines=["nut_battery_discharge_rate", "nut_battery_recharge_rate"],
+    optional=["nut_battery_discharge_rate", "nut_battery_recharge_rate"],
+)
+
+graph_nut_battery_time = Graph(
+    name="nut_battery_time",
+    title=Title("Battery time left"),
+    simple_lines=["nut_battery_runtime", "nut_battery_time_to_empty"],
+    optional=["nut_battery_time_to_empty"],
+)
+
+graph_nut_input_voltage_range = Graph(
+    name="nut_input_voltage_range",
+    title=Title("Input voltage range"),
+    simple_lines=["nut_input_voltage_max", "nut_input_voltage", "nut_input_voltage_min"],
+    optional=["nut_input_voltage_max", "nut_input_voltage_min"],
+)
+
+graph_nut_input_frequency_range = Graph(
+    name="nut_input_frequency_range",
+    title=Title("Input frequency range"),
+    simple_lines=["nut_input_frequency_max", "nut_input_frequency", "nut_input_frequency_min"],
+    optional=["nut_input_frequency_max", "nut_input_frequency_min"],
+)
+
+graph_nut_ups_load_range = Graph(
+    name="nut_ups_load_range",
+    title=Title("Load range"),
+    simple_lines=["nut_ups_load_max", "nut_ups_load", "nut_ups_load_min"],
+    optional=["nut_ups_load_max", "nut_ups_load_min"],
+)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Registry of the UPS metrics of the NUT check.
+
+Every metric is described once here. The check plugin derives the parser
+lookup table, the slots of its records, the checked metrics and their default
+levels from it. The graphing and ruleset modules declare their objects
+explicitly, tests/test_nut_metrics.py makes sure every metric has them.
+
+The module has no dependencies on Checkmk APIs, so all of the plugin
+families can import it.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+from typing import Any, Callable, Dict, FrozenSet, Mapping, NamedTuple, Optional, Tuple
+
+Levels = Tuple[float, float]
+
+
+class NutMetric(NamedTuple):
+    '''
+    Description of one metric of the NUT check.
+
+    Attributes:
+        name (str): Name of the metric without the nut_ prefix, also the slot
+            of the parsed record and the key of the check parameters.
+        variable (str): The NUT variable, None for values derived by the check.
+        title (str): Title of the metric, used as label of the check result.
+        unit (str): Unit symbol, "%" and "s" are rendered as percent and time span.
+        digits (int): Decimal places of the check summary.
+        lower (bool): Whether lower levels can be configured.
+        upper (bool): Whether upper levels can be configured.
+        notice_only (bool): Whether the result only shows up in the details.
+        default_lower (Levels): Levels applied without a rule.
+        default_upper (Levels): Levels applied without a rule.
+        value (str): Slot of the checked value if it differs from the name.
+        convert (Callable): Converter of the raw NUT value.
+        slot (bool): Whether the parsed record keeps the value in a slot. Values
+            only few UPSes report go to its overflow dictionary instead, every
+            slot costs memory in the record of every UPS.
+    '''
+    name: str
+    variable: Optional[str]
+    title: str
+    unit: str
+    digits: int
+    lower: bool = False
+    upper: bool = False
+    notice_only: bool = True
+    default_lower: Optional[Levels] = None
+    default_upper: Optional[Levels] = None
+    value: Optional[str] = None
+    convert: Callable[[str], Any] = float
+    slot: bool = True
+
+
+METRICS: Tuple[NutMetric, ...] = (
+    NutMetric(
+        'battery_charge', 'battery.charge', "Battery charge", "%", 0,
+        lower=True, notice_only=False, default_lower=(90, 85),
+    ),
+    NutMetric(
+        'battery_runtime', 'battery.runtime', "Battery runtime", "s", 0,
+        lower=True, notice_only=False, default_lower=(1200, 900),
+    ),
+    NutMetric(
+        'battery_voltage', 'battery.voltage', "Battery voltage", "V", 2,
+        lower=True, default_lower=(10, 5),
+        value='battery_voltage_total',
+    ),
+    NutMetric(
+        'battery_current', 'battery.current', "Battery current", "A", 2,
+        upper=True, slot=False,
+    ),
+    NutMetric(
+        'battery_temperature', 'battery.temperature', "Battery temperature", "°C", 1,
+        upper=True, slot=False,
+    ),
+    NutMetric(
+        'input_frequency', 'input.frequency', "Input frequency", "Hz", 2,
+        lower=True, upper=True,
+        default_lower=(49, 45), default_upper=(51, 55),
+    ),
+    NutMetric(
+        'input_voltage', 'input.voltage', "Input voltage", "V", 2,
+        lower=True, upper=True,
+        default_lower=(0, 0), default_upper=(245, 250),
+    ),
+    NutMetric(
+        'input_voltage_fault', 'input.voltage.fault', "Input voltage (fault)", "V", 2,
+        upper=True, default_upper=(155, 160),
+    ),
+    NutMetric(
+        'input_current', 'input.current', "Input current", "A", 2,
+        upper=True, slot=False,
+    ),
+    NutMetric(
+        'output_voltage', 'output.voltage', "Output voltage", "V", 2,
+        lower=True, upper=True,
+        default_lower=(0, 0), default_upper=(245, 250),
+    ),
+    NutMetric(
+        'output_frequency', 'output.frequency', "Output frequency", "Hz", 2,
+        lower=True, upper=True,
+        slot=False,
+    ),
+    NutMetric(
+        'output_current', 'output.current', "Output current", "A", 2,
+        upper=True, slot=False,
+    ),
+    NutMetric(
+        'ups_load', 'ups.load', "Load", "%", 0,
+        lower=True, upper=True, notice_only=False,
+        default_lower=(0, 0), default_upper=(50, 70),
+    ),
+    NutMetric(
+        'ups_power', 'ups.power', "Apparent power", "VA", 0,
+        upper=True,
+    ),
+    NutMetric(
+        'ups_realpower', 'ups.realpower', "Real power", "W", 0,
+        upper=True,
+    ),
+    NutMetric(
+        'ups_realpower_headroom', None, "Real power headroom", "W", 0,
+        lower=True,
+    ),
+    NutMetric(
+        'ups_efficiency', 'ups.efficiency', "Efficiency", "%", 0,
+        lower=True, slot=False,
+    ),
+    NutMetric(
+        'ups_temperature', 'ups.temperature', "Temperature", "°C", 1,
+        upper=True, default_upper=(35, 40),
+    ),
+)
+
+# Lookup tables built once at import
+METRICS_BY_NAME: Mapping[str, NutMetric] = {metric.name: metric for metric in METRICS}
+METRICS_BY_VARIABLE: Mapping[str, NutMetric] = {
+    metric.variable: metric for metric in METRICS if metric.variable is not None
+}
+
+
+def default_levels() -> Dict[str, Any]:
+    '''
+    The default check parameters of all metrics having default levels.
+
+    Returns:
+        Dict[str, Any]: Simple levels for metrics with levels in a single
+        direction, dictionaries with lower and upper levels otherwise.
+    '''
+    params: Dict[str, Any] = {}
+    for metric in METRICS:
+        if metric.lower and metric.upper:
+            levels = {
+                direction: ("fixed", value)
+                for direction, value in (
+                    ('lower', metric.default_lower), ('upper', metric.default_upper)
+                )
+                if value is not None
+            }
+            if levels:
+                params[metric.name] = levels
+        elif metric.default_lower is not None:
+            params[metric.name] = ("fixed", metric.default_lower)
+        elif metric.default_upper is not None:
+            params[metric.name] = ("fixed", metric.default_upper)
+    return params
+
+
+PHASES: Tuple[str, ...] = ("L1", "L2", "L3")
+LINE_PAIRS: Tuple[str, ...] = ("L1-L2", "L2-L3", "L3-L1")
+
+
+class NutPhaseQuantity(NamedTuple):
+    '''
+    Description of a quantity three-phase UPSes report per phase.
+
+    The parser keeps the values of all phases of a quantity in one list,
+    indexed like the phases.
+
+    Attributes:
+        name (str): Name of the quantity, the per-phase metrics are named
+            nut_<name>_l1, nut_<name>_l2, ...
+        variables (Tuple[str, ...]): Templates of the NUT variables, {phase}
+            is replaced by the name of the phase. Drivers differ in the naming
+            of the phase to neutral voltage (input.L1.voltage or input.L1-N.voltage).
+        title (str): Title of the quantity.
+        unit (str): Unit symbol.
+        digits (int): Decimal places of the check summary.
+        phases (Tuple[str, ...]): The phases, or the pairs of phases for
+            voltages between phases.
+        levels (str): Key of the check parameters with the levels applying to
+            every phase, None for no levels.
+        imbalance (str): Key of the check parameters with the levels of the
+            imbalance between the phases, None if it is not evaluated.
+    '''
+    name: str
+    variables: Tuple[str, ...]
+    title: str
+    unit: str
+    digits: int
+    phases: Tuple[str, ...] = PHASES
+    levels: Optional[str] = None
+    imbalance: Optional[str] = None
+
+    @property
+    def graph_title(self) -> str:
+        '''Title of the graph showing all phases.'''
+        return f"{self.title} {'per phase' if self.phases is PHASES else 'between phases'}"
+
+
+PHASE_QUANTITIES: Tuple[NutPhaseQuantity, ...] = (
+    NutPhaseQuantity(
+        'input_phase_voltage', ('input.{phase}.voltage', 'input.{phase}-N.voltage'),
+        "Input voltage", "V", 1, levels='input_voltage', imbalance='voltage_imbalance',
+    ),
+    NutPhaseQuantity(
+        'input_line_voltage', ('input.{phase}.voltage',),
+        "Input voltage", "V", 1, phases=LINE_PAIRS, imbalance='voltage_imbalance',
+    ),
+    NutPhaseQuantity(
+        'input_phase_current', ('input.{phase}.current',),
+        "Input current", "A", 2, levels='input_current', imbalance='current_imbalance',
+    ),
+    NutPhaseQuantity(
+        'input_phase_realpower', ('input.{phase}.realpower',),
+        "Input real power", "W", 0,
+    ),
+    NutPhaseQuantity(
+        'output_phase_voltage', ('output.{phase}.voltage', 'output.{phase}-N.voltage'),
+        "Output voltage", "V", 1, levels='output_voltage', imbalance='voltage_imbalance',
+    ),
+    NutPhaseQuantity(
+        'output_line_voltage', ('output.{phase}.voltage',),
+        "Output voltage", "V", 1, phases=LINE_PAIRS, imbalance='voltage_imbalance',
+    ),
+    NutPhaseQuantity(
+        'output_phase_current', ('output.{phase}.current',),
+        "Output current", "A", 2, levels='output_current', imbalance='current_imbalance',
+    ),
+    NutPhaseQuantity(
+        'output_phase_realpower', ('output.{phase}.realpower',),
+        "Output real power", "W", 0,
+    ),
+    NutPhaseQuantity(
+        'output_phase_load', ('output.{phase}.power.percent',),
+        "Load", "%", 0, levels='ups_load', imbalance='current_imbalance',
+    ),
+)
+
+# NUT variable: (name of the quantity, index of the phase)
+PHASE_VARIABLES: Mapping[str, Tuple[str, int]] = {
+    template.format(phase=phase): (quantity.name, index)
+    for quantity in PHASE_QUANTITIES
+    for template in quantity.variables
+    for index, phase in enumerate(quantity.phases)
+}
+
+# NUT variables the check reads besides the metrics and the phases
+STATUS_VARIABLES: Tuple[str, ...] = (
+    'battery.packs',
+    'ups.alarm',
+    'ups.beeper.status',
+    'ups.power.nominal',
+    'ups.realpower.nominal',
+    'ups.status',
+)
+
+# NUT variables the check consumes, the default allow-list of the agent plugin
+CONSUMED_VARIABLES: FrozenSet[str] = (
+    frozenset(STATUS_VARIABLES) | frozenset(METRICS_BY_VARIABLE) | frozenset(PHASE_VARIABLES)
+)
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Client for the upsd network protocol and the rendering of its results.
+
+The special agent polls upsd servers from the Checkmk site with this
+module, so it prints exactly the sections of the agent plugin nut.py.
+
+This module is the only source of the client. The agent plugin has to stay
+a single file which runs with the Python of the monitored hosts and without
+the Checkmk site, so it cannot import it. Instead, python -m tests.sync_upsd
+copies the code below the marker comment into a generated block of the
+agent plugin, and tests/test_nut_upsd.py fails when that block is outdated.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+import json
+import os
+import re
+import socket
+import threading
+import time
+
+DEFAULT_PORT = 3493
+LOCALHOST = "localhost"
+
+# The agent plugin nut.py carries a copy of everything below this line,
+# written by python -m tests.sync_upsd
+
+# Measurement of the query running in the current thread, see poll_all
+_measurement = threading.local()
+
+
+def _measure(key, value):
+    '''Add value to the measurement of the query of the current thread, if any.'''
+    stats = getattr(_measurement, "stats", None)
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + value
+
+
+class UpsdError(Exception):
+    '''Raised when the connection to upsd breaks or upsd violates the protocol.'''
+
+
+class UpsdErrorReply(UpsdError):
+    '''Raised when upsd answers a request with ERR.'''
+
+
+def parse_target(spec):
+    '''
+    Split a upsd target of the form host[:port] as used in upsmon.conf.
+
+    Args:
+        spec (str): The target specification.
+
+    Returns:
+        tuple: The host name and the port.
+    '''
+    if spec.startswith("["):
+        # [IPv6]:port
+        host, _, rest = spec[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif spec.count(":") == 1:
+        host, port = spec.split(":")
+    else:
+        host, port = spec, ""
+    return host, int(port) if port else DEFAULT_PORT
+
+
+def format_target(host, port):
+    '''Inverse of parse_target, omitting the default port.'''
+    if ":" in host:
+        host = "[%s]" % host
+    return host if port == DEFAULT_PORT else "%s:%d" % (host, port)
+
+
+def split_reply(line):
+    '''
+    Tokenize one upsd reply line honoring double quotes and backslash escapes.
+
+    Args:
+        line (str): The reply line without line terminator.
+
+    Returns:
+        list: The tokens of the line.
+    '''
+    tokens = []
+    current = []
+    in_token = in_quotes = escaped = False
+    for char in line:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = in_token = True
+        elif char == '"':
+            in_quotes = not in_quotes
+            in_token = True
+        elif char == " " and not in_quotes:
+            if in_token:
+                tokens.append("".join(current))
+                current = []
+                in_token = False
+        else:
+            current.append(char)
+            in_token = True
+    if in_token:
+        tokens.append("".join(current))
+    return tokens
+
+
+def quote(value):
+    '''Quote a request argument the way split_reply reads it back.'''
+    return '"%s"' % value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class UpsdClient:
+    '''
+    Tiny client for the upsd line protocol.
+
+    Args:
+        host (str): Host name or address of the upsd server.
+        port (int): TCP port of the upsd server.
+        timeout (float): Deadline in seconds for connecting and all following
+            requests together. None waits forever.
+        username (str): User to authenticate as, if upsd requires it.
+        password (str): Password of that user.
+    '''
+
+    def __init__(self, host, port=DEFAULT_PORT, timeout=None, username=None, password=None):
+        self.reset_deadline(timeout)
+        started = time.monotonic()
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        _measure("connect_time", time.monotonic() - started)
+        self._reader = self._sock.makefile("rb")
+        if username is not None:
+            try:
+                self._login(username, password)
+            except (OSError, UpsdError):
+                self.close()
+                raise
+
+    def _login(self, username, password):
+        '''Send USERNAME and PASSWORD and check that upsd accepted both.'''
+        requests = ["USERNAME %s" % quote(username)]
+        if password is not None:
+            requests.append("PASSWORD %s" % quote(password))
+        self._send(requests)
+        for _ in requests:
+            tokens = self._readline()
+            if tokens[:1] == ["ERR"]:
+                raise UpsdErrorReply(" ".join(tokens[1:]))
+            if tokens != ["OK"]:
+                raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+
+    def reset_deadline(self, timeout):
+        '''Start a new deadline for the following requests of a kept-open session.'''
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+
+    def _arm(self):
+        '''Shrink the socket timeout to the time left until the deadline.'''
+        if self._deadline is None:
+            return
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("timed out")
+        self._sock.settimeout(remaining)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''Say goodbye to upsd and close the connection.'''
+        try:
+            self._send(["LOGOUT"])
+        except (OSError, ValueError):
+            pass
+        self._reader.close()
+        self._sock.close()
+
+    def _send(self, requests):
+        self._arm()
+        self._sock.sendall("".join(r + "\n" for r in requests).encode("utf-8"))
+
+    def _readline(self):
+        self._arm()
+        raw = self._reader.readline()
+        _measure("bytes", len(raw))
+        if not raw:
+            raise UpsdError("connection closed by upsd")
+        return split_reply(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+    def _read_list(self, query):
+        '''Read one BEGIN LIST ... END LIST block and return its item lines.'''
+        tokens = self._readline()
+        if tokens[:1] == ["ERR"]:
+            raise UpsdErrorReply(" ".join(tokens[1:]))
+        if tokens != ["BEGIN", "LIST"] + query:
+            raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+        items = []
+        while True:
+            tokens = self._readline()
+            if tokens == ["END", "LIST"] + query:
+                return items
+            items.append(tokens)
+
+    def list_ups(self):
+        '''Return the names of all UPSes known to upsd.'''
+        self._send(["LIST UPS"])
+        return [t[1] for t in self._read_list(["UPS"]) if len(t) >= 2]
+
+    def list_vars(self, upses):
+        '''
+        Fetch the variables of several UPSes with pipelined LIST VAR requests.
+
+        Args:
+            upses (list): Names of the UPSes to query.
+
+        Returns:
+            dict: UPS names mapped to a list of (variable, value) tuples. UPSes
+            for which upsd answered with an error are mapped to the error.
+        '''
+        self._send(["LIST VAR %s" % ups for ups in upses])
+        result = {}
+        for ups in upses:
+            try:
+                result[ups] = [
+                    (t[2], t[3]) for t in self._read_list(["VAR", ups]) if len(t) >= 4
+                ]
+            except UpsdErrorReply as exc:
+                result[ups] = exc
+        return result
+
+    def get_vars(self, upses, variables):
+        '''
+        Fetch some variables of several UPSes with pipelined GET VAR requests.
+
+        Args:
+            upses (list): Names of the UPSes to query.
+            variables (tuple): Names of the variables to fetch.
+
+        Returns:
+            dict: UPS names mapped to a list of (variable, value) tuples.
+            Variables the UPS does not support are left out.
+        '''
+        self._send(["GET VAR %s %s" % (ups, var) for ups in upses for var in variables])
+        result = {}
+        for ups in upses:
+            values = result[ups] = []
+            for var in variables:
+                tokens = self._readline()
+                if tokens[:1] == ["ERR"]:
+                    continue
+                if len(tokens) < 4 or tokens[:3] != ["VAR", ups, var]:
+                    raise UpsdError("unexpected reply: %s" % " ".join(tokens))
+                values.append((var, tokens[3]))
+        return result
+
+
+def ups_label(ups, host, port):
+    '''Name of a UPS in the agent output, like upsc addresses it.'''
+    return ups if host == LOCALHOST else "%s@%s" % (ups, format_target(host, port))
+
+
+def section_lines(host, port, upses, collected=None, interval=None):
+    '''
+    Render the variables of one upsd server in the format of nut.sh.
+
+    Args:
+        host (str): Host name of the upsd server.
+        port (int): TCP port of the upsd server.
+        upses (dict): Result of UpsdClient.list_vars.
+        collected (int): Time the data was collected, reported as collector.time.
+        interval (int): Cache interval, reported as collector.interval.
+
+    Yields:
+        str: Output lines.
+    '''
+    for ups, variables in upses.items():
+        yield "==> %s <==" % ups_label(ups, host, port)
+        if isinstance(variables, Exception):
+            yield "collector.error: %s" % describe_error(variables)
+            continue
+        for key, value in variables:
+            yield "%s: %s" % (key, value)
+        if collected is not None:
+            yield "collector.time: %d" % collected
+        if interval:
+            yield "collector.interval: %d" % interval
+
+
+def poll_target(host, port, timeout=None, username=None, password=None):
+    '''Query all UPSes of one upsd server over a single connection.'''
+    with UpsdClient(host, port, timeout, username, password) as client:
+        upses = client.list_ups()
+        return client.list_vars(upses) if upses else {}
+
+
+def poll_all(targets, timeout, budget, poll=poll_target, workers=None, stats=None):
+    '''
+    Query all upsd servers concurrently.
+
+    The servers are queried by a pool of daemon threads, so a server that
+    hangs beyond the overall budget is simply abandoned when the plugin exits.
+    Servers not queried when the budget runs out are not started anymore.
+
+    Args:
+        targets (list): The (host, port) tuples to query.
+        timeout (float): Per-host deadline in seconds.
+        budget (float): Overall deadline in seconds.
+        poll (Callable): Function querying a single server.
+        workers (int): Maximum number of servers queried at the same time.
+            None queries all servers at once.
+        stats (dict): Filled with the measurement of every finished query,
+            (host, port) mapped to the response_time, the connect_time of a
+            new connection and the bytes received.
+
+    Returns:
+        list: One (host, port, result) tuple per target in the order of
+        targets. The result is the return value of poll or the exception
+        the query failed with.
+    '''
+    results = [UpsdError("budget exceeded")] * len(targets)
+    pending = iter(enumerate(targets))
+    lock = threading.Lock()
+    deadline = time.monotonic() + budget
+
+    def worker():
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None or time.monotonic() >= deadline:
+                return
+            idx, (host, port) = item
+            measurement = _measurement.stats = {}
+            started = time.monotonic()
+            try:
+                result = poll(host, port, timeout=timeout)
+            except (OSError, UpsdError) as exc:
+                result = exc
+            measurement["response_time"] = time.monotonic() - started
+            _measurement.stats = None
+            with lock:
+                if time.monotonic() < deadline:
+                    results[idx] = result
+                    if stats is not None:
+                        stats[(host, port)] = measurement
+
+    threads = [
+        threading.Thread(target=worker, daemon=True)
+        for _ in range(min(workers or len(targets), len(targets)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+
+    with lock:
+        return [(host, port, result) for (host, port), result in zip(targets, results)]
+
+
+def describe_error(exc):
+    '''Render an exception of a failed query as a short single line message.'''
+    if isinstance(exc, socket.timeout):
+        return "timed out"
+    return (str(exc) or type(exc).__name__).replace("\n", " ")
+
+
+def render_output(results, collected, interval=None, known=None):
+    '''
+    Render the agent sections for the results of poll_all.
+
+    Args:
+        results (list): Result of poll_all.
+        collected (int): Time the data was collected.
+        interval (int): Cache interval, if running as cached plugin.
+        known (dict): UPS names of earlier runs per upsd server (host[:port]).
+            The UPSes of a failed server are listed with collector.error, so
+            the check can tell them apart from removed UPSes.
+
+    Yields:
+        str: Output lines.
+    '''
+    yield "<<<nut>>>"
+    for host, port, upses in results:
+        if isinstance(upses, Exception):
+            upses = {ups: upses for ups in (known or {}).get(format_target(host, port), ())}
+        for line in section_lines(host, port, upses, collected, interval):
+            yield line
+
+    errors = [(h, p, e) for h, p, e in results if isinstance(e, Exception)]
+    if errors:
+        yield "<<<nut_errors>>>"
+        for host, port, exc in errors:
+            yield "%s %s" % (format_target(host, port), describe_error(exc))
+
+
+def piggyback_host(label):
+    '''The name of the piggyback host of a UPS, its label made a valid host name.'''
+    return re.sub(r"[^A-Za-z0-9._-]", "_", label)
+
+
+def piggyback_lines(lines):
+    '''
+    Move the data of every UPS to a piggyback host of its own.
+
+    The blocks of a UPS in all sections (nut, nut_static, nut_samples, ...)
+    are collected under the piggyback host named after the UPS, with the
+    header of their section. Lines outside of a UPS block, like the
+    nut_errors section, stay with the host running the plugin.
+
+    Args:
+        lines (list): Output lines as rendered for a single host.
+
+    Returns:
+        list: The output lines of the host followed by the piggyback data.
+    '''
+    own = []
+    hosts = {}
+    header = None
+    block = None
+    for line in lines:
+        if line.startswith("<<<"):
+            header, block = line, None
+            own.append(line)
+        elif line.startswith("==> ") and line.endswith(" <=="):
+            sections = hosts.setdefault(piggyback_host(line[4:-4]), {})
+            block = sections.setdefault(header, [])
+            block.append(line)
+        elif block is not None:
+            block.append(line)
+        else:
+            own.append(line)
+
+    # Drop the headers of sections which only had UPS blocks
+    output = [
+        line for idx, line in enumerate(own)
+        if not line.startswith("<<<") or (idx + 1 < len(own) and not own[idx + 1].startswith("<<<"))
+    ]
+    for host, sections in hosts.items():
+        output.append("<<<<%s>>>>" % host)
+        for header, block in sections.items():
+            output.append(header)
+            output.extend(block)
+        output.append("<<<<>>>>")
+    return output
+
+
+def agent_stats_lines(results, stats):
+    '''
+    Render the nut_agent_stats section, one line per upsd server.
+
+    Every line holds the server, the connect and response time in seconds,
+    the number of UPSes and variables, the bytes received and the error of
+    the query, if any. Values which are not known are rendered as "-", like
+    the connect time of a session kept open by the collector.
+
+    Args:
+        results (list): Result of poll_all.
+        stats (dict): The measurements of poll_all.
+
+    Yields:
+        str: Output lines.
+    '''
+    yield "<<<nut_agent_stats>>>"
+    for host, port, upses in results:
+        measurement = stats.get((host, port), {})
+        if isinstance(upses, Exception):
+            count = variables = "-"
+            error = describe_error(upses)
+        else:
+            count = len(upses)
+            variables = sum(len(v) for v in upses.values() if not isinstance(v, Exception))
+            error = ", ".join(
+                "%s: %s" % (ups, describe_error(v))
+                for ups, v in upses.items() if isinstance(v, Exception)
+            )
+        fields = [format_target(host, port)]
+        for key in ("connect_time", "response_time"):
+            fields.append("%.4f" % measurement[key] if key in measurement else "-")
+        fields += [str(count), str(variables), str(measurement.get("bytes", 0))]
+        if error:
+            fields.append(error)
+        yield " ".join(fields)
+
+
+def remember_upses(path, results):
+    '''
+    Keep the UPS names of every upsd server which answered in a state file.
+
+    Args:
+        path (str): Location of the state file.
+        results (list): Result of poll_all.
+
+    Returns:
+        dict: The UPS names per upsd server (host[:port]), for the servers
+        which failed the ones of the last successful run.
+    '''
+    try:
+        with open(path, encoding="utf-8") as state:
+            known = json.load(state)
+    except (OSError, ValueError):
+        known = {}
+    current = {}
+    for host, port, upses in results:
+        label = format_target(host, port)
+        if not isinstance(upses, Exception):
+            current[label] = sorted(upses)
+        elif label in known:
+            current[label] = known[label]
+    if current != known:
+        write_atomically(path, [json.dumps(current)])
+    return current
+
+
+def write_atomically(path, lines):
+    '''Atomically replace a file (the snapshot or a state file) with the given lines.'''
+    tmp = "%s.tmp.%d" % (path, os.getpid())
+    with open(tmp, "w", encoding="utf-8") as output:
+        for line in lines:
+            output.write(line + "\n")
+    os.replace(tmp, path)
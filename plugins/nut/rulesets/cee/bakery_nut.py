@@ -16,16 +16,43 @@
 # to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
 # Boston, MA 02110-1301 USA.
 
-from cmk.rulesets.v1 import Title
+from typing import Any, Mapping
+
+from cmk.rulesets.v1 import Message, Title
 from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    CascadingSingleChoice,
+    CascadingSingleChoiceElement,
     Dictionary,
     DictElement,
+    FixedValue,
+    List,
+    String,
     SingleChoice,
     SingleChoiceElement,
     DefaultValue,
+    Float,
+    Integer,
+    validators,
 )
 from cmk.rulesets.v1.rule_specs import AgentConfig, Topic, Help
 
+# Options only the Python plugin and the collector evaluate
+PYTHON_ONLY_OPTIONS = ("delta_refresh", "inventory_interval", "variables")
+
+
+def _validate_python_options(value: Mapping[str, Any]) -> None:
+    '''Reject options of the Python plugin which nut.sh would silently ignore.'''
+    if value.get("implementation", "shell") == "python" or "collector_interval" in value:
+        return
+    ignored = [option for option in PYTHON_ONLY_OPTIONS if option in value]
+    if ignored:
+        raise validators.ValidationError(
+            Message(
+                "The shell plugin ignores %s. Choose the Python plugin or the collector."
+            ) % ", ".join(ignored)
+        )
+
 
 def _parameter_form_bakery() -> Dictionary:
     return Dictionary(
@@ -50,8 +77,238 @@ def _parameter_form_bakery() -> Dictionary:
                         ),
                     ],
                 ),
-            )
-        }
+            ),
+            "implementation": DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Plugin implementation"),
+                    help_text=Help(
+                        "The shell plugin forks <tt>upsc</tt> for every UPS. \
+                        The Python plugin talks to upsd directly and uses \
+                        a single connection per upsd server."
+                    ),
+                    prefill=DefaultValue("shell"),
+                    elements=[
+                        SingleChoiceElement(
+                            name="shell",
+                            title=Title("Shell script using upsc (nut.sh)"),
+                        ),
+                        SingleChoiceElement(
+                            name="python",
+                            title=Title("Python plugin speaking the upsd protocol (nut.py)"),
+                        ),
+                    ],
+                ),
+            ),
+            "targets": DictElement(
+                parameter_form=List(
+                    title=Title("upsd servers"),
+                    help_text=Help(
+                        "Query exactly these upsd servers instead of discovering \
+                        them from the MONITOR lines of <tt>upsmon.conf</tt> on \
+                        every run. Without this option, the plugin discovers the \
+                        servers and always adds localhost."
+                    ),
+                    element_template=Dictionary(
+                        elements={
+                            "host": DictElement(
+                                required=True,
+                                parameter_form=String(
+                                    title=Title("Host name or IP address"),
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                            ),
+                            "port": DictElement(
+                                parameter_form=Integer(
+                                    title=Title("TCP port"),
+                                    prefill=DefaultValue(3493),
+                                    custom_validate=(validators.NetworkPort(),),
+                                ),
+                            ),
+                            "timeout": DictElement(
+                                parameter_form=Float(
+                                    title=Title("Timeout for this server"),
+                                    unit_symbol="s",
+                                    prefill=DefaultValue(5.0),
+                                ),
+                            ),
+                        },
+                    ),
+                    custom_validate=(validators.LengthInRange(min_value=1),),
+                ),
+            ),
+            "upsmon_targets": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Add the upsd servers of upsmon.conf"),
+                    label=Title("Also query the servers of the MONITOR lines of upsmon.conf"),
+                    help_text=Help(
+                        "Only used together with an explicit list of upsd servers."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "piggyback": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Piggyback hosts"),
+                    label=Title("Send every UPS as piggyback data of its own host"),
+                    help_text=Help(
+                        "The piggyback host of a UPS is named after the UPS, like "
+                        "ups_nas_3494 for ups@nas:3494. Create hosts with these names "
+                        "to check every UPS on its own host."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "timeout": DictElement(
+                parameter_form=Float(
+                    title=Title("Timeout per upsd server"),
+                    help_text=Help(
+                        "Time a single upsd server may take to accept the \
+                        connection and answer all requests. The shell plugin \
+                        applies it to every call of upsc."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(5.0),
+                ),
+            ),
+            "budget": DictElement(
+                parameter_form=Float(
+                    title=Title("Overall time budget"),
+                    help_text=Help(
+                        "Time after which the plugin stops waiting for upsd \
+                        servers and reports the remaining ones as failed. \
+                        Keep it below the agent timeout."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(45.0),
+                ),
+            ),
+            "cache_interval": DictElement(
+                parameter_form=Integer(
+                    title=Title("Run asynchronously (cache interval)"),
+                    help_text=Help(
+                        "Run the plugin in the background at this interval. \
+                        The agent returns the last complete snapshot right \
+                        away, and the check reports outdated data if it gets \
+                        too old."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(300),
+                    custom_validate=(validators.NumberInRange(min_value=60),),
+                ),
+            ),
+            "collector_interval": DictElement(
+                parameter_form=Float(
+                    title=Title("Run persistent collector daemon"),
+                    help_text=Help(
+                        "Deploy a collector running as systemd service. It keeps \
+                        the sessions to all upsd servers open, refreshes the data \
+                        at this interval and writes a snapshot file which the \
+                        agent plugin just prints."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(10.0),
+                    custom_validate=(validators.NumberInRange(min_value=1.0),),
+                ),
+            ),
+            "sample_interval": DictElement(
+                parameter_form=Float(
+                    title=Title("Sample power quality between refreshes"),
+                    help_text=Help(
+                        "Let the collector sample input voltage, input frequency, \
+                        load and status at this interval. Every snapshot carries \
+                        minimum, maximum and average of the samples, the number \
+                        of status changes and the time on battery, which catches \
+                        short brownouts between two agent runs. Only used with the \
+                        collector."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(5.0),
+                    custom_validate=(validators.NumberInRange(min_value=1.0),),
+                ),
+            ),
+            "sample_window": DictElement(
+                parameter_form=Integer(
+                    title=Title("Time span of the sample summary"),
+                    help_text=Help(
+                        "Samples of this time span are summarized. It should \
+                        match the check interval of the host."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(60),
+                    custom_validate=(validators.NumberInRange(min_value=10),),
+                ),
+            ),
+            "delta_refresh": DictElement(
+                parameter_form=Integer(
+                    title=Title("Send static variables only on change"),
+                    help_text=Help(
+                        "Let the Python plugin send static variables like driver \
+                        parameters, versions and nominal values only when they \
+                        change, and at the latest after this time. Checkmk keeps \
+                        them in between. Requires the Python plugin or the \
+                        collector."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(3600),
+                    custom_validate=(validators.NumberInRange(min_value=60),),
+                ),
+            ),
+            "inventory_interval": DictElement(
+                parameter_form=Integer(
+                    title=Title("Send device data for the HW/SW inventory"),
+                    help_text=Help(
+                        "Let the Python plugin send vendor, model, serial number, \
+                        firmware, driver and battery dates in a separate section \
+                        for the HW/SW inventory. It is sent only when something \
+                        changes, and at the latest after this time. Checkmk keeps \
+                        it in between. Requires the Python plugin or the \
+                        collector."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(14400),
+                    custom_validate=(validators.NumberInRange(min_value=600),),
+                ),
+            ),
+            "variables": DictElement(
+                parameter_form=CascadingSingleChoice(
+                    title=Title("Variables to send"),
+                    help_text=Help(
+                        "Let the Python plugin drop all other variables before \
+                        sending the data. Drivers like usbhid-ups or snmp-ups \
+                        expose 150 variables and more, of which the check only \
+                        uses a few. Requires the Python plugin or the \
+                        collector, the shell plugin always sends all variables."
+                    ),
+                    prefill=DefaultValue("consumed"),
+                    elements=[
+                        CascadingSingleChoiceElement(
+                            name="consumed",
+                            title=Title("Only the variables used by the check"),
+                            parameter_form=FixedValue(value=None),
+                        ),
+                        CascadingSingleChoiceElement(
+                            name="custom",
+                            title=Title("Custom list of variables"),
+                            parameter_form=List(
+                                element_template=String(
+                                    help_text=Help(
+                                        "Name of a NUT variable, shell style \
+                                        wildcards like <tt>input.*</tt> are allowed."
+                                    ),
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                            ),
+                        ),
+                        CascadingSingleChoiceElement(
+                            name="all",
+                            title=Title("All variables"),
+                            parameter_form=FixedValue(value=None),
+                        ),
+                    ],
+                ),
+            ),
+        },
+        custom_validate=(_validate_python_options,),
     )
 
 
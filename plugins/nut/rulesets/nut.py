@@ -14,8 +14,10 @@ from cmk.rulesets.v1.form_specs import (
     DefaultValue,
     Integer,
     Float,
+    ServiceState,
     SingleChoiceElement,
     SingleChoice,
+    validators,
 )
 
 from cmk.rulesets.v1.rule_specs import (
@@ -84,6 +86,43 @@ def _parameter_valuespec_nut():
                     prefill_fixed_levels=DefaultValue(value=(1200, 900)),
                 )
             ),
+            "battery_discharge_rate": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Battery discharge rate (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the smoothed rate at which the battery charge drops "
+                        "while the UPS runs on battery."
+                    ),
+                    form_spec_template=Float(unit_symbol="%/min"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(5.0, 10.0)),
+                )
+            ),
+            "battery_time_to_empty": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Battery time to empty (lower threshold)"),
+                    help_text=Help(
+                        "Set the levels for the time left until the battery is empty while the UPS "
+                        "runs on battery. It is predicted from the measured discharge rate instead "
+                        "of the runtime reported by the driver."
+                    ),
+                    form_spec_template=Integer(unit_symbol="sec"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(900, 600)),
+                )
+            ),
+            "battery_recharge_rate": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Battery recharge rate (lower threshold)"),
+                    help_text=Help(
+                        "Set the levels for the smoothed rate at which the battery charges after "
+                        "power returns. A slow recharge points to a worn battery or charger."
+                    ),
+                    form_spec_template=Float(unit_symbol="%/min"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(0.2, 0.1)),
+                )
+            ),
             "battery_voltage": DictElement(
                 parameter_form=SimpleLevels(
                     title=Title("Battery voltage"),
@@ -177,6 +216,92 @@ def _parameter_valuespec_nut():
                     prefill_fixed_levels=DefaultValue(value=(155, 160)),
                 )
             ),
+            "data_age": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Data age"),
+                    help_text=Help(
+                        "Set the levels for the age of the data reported by the agent plugin. "
+                        "Without levels, data of a cached agent plugin is considered outdated "
+                        "after two and stale after four cache intervals."
+                    ),
+                    form_spec_template=Integer(unit_symbol="sec"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(600, 1200)),
+                )
+            ),
+            "status_transitions": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Status changes between two checks (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the number of status changes, like transfers to battery "
+                        "and back, the collector sampled since the last check. Requires sampling in "
+                        "the agent plugin configuration."
+                    ),
+                    form_spec_template=Integer(),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(1, 4)),
+                )
+            ),
+            "on_battery_time": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Time on battery between two checks (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the time the UPS ran on battery according to the samples "
+                        "of the collector since the last check. Requires sampling in the agent plugin "
+                        "configuration."
+                    ),
+                    form_spec_template=Integer(unit_symbol="sec"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(10, 30)),
+                )
+            ),
+            "flap_window": DictElement(
+                parameter_form=Integer(
+                    title=Title("Time window for transfers to battery"),
+                    help_text=Help(
+                        "Transfers to battery and back are counted within this sliding window."
+                    ),
+                    unit_symbol="sec",
+                    prefill=DefaultValue(3600),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                )
+            ),
+            "status_transfers": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Transfers within the time window (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the number of transfers to battery and back within "
+                        "the time window."
+                    ),
+                    form_spec_template=Integer(),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(4, 10)),
+                )
+            ),
+            "flap_rate": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Flap rate (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the transfers to battery and back per hour, averaged "
+                        "over the time window. A UPS flapping between line and battery power "
+                        "looks healthy on most single checks."
+                    ),
+                    form_spec_template=Float(unit_symbol="/h"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(4.0, 10.0)),
+                )
+            ),
+            "time_since_transfer": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Time since the last transfer (lower threshold)"),
+                    help_text=Help(
+                        "Set the levels for the time since the UPS last switched to battery or back."
+                    ),
+                    form_spec_template=Integer(unit_symbol="sec"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(600, 60)),
+                )
+            ),
             "ups_beeper_status": DictElement(
                 parameter_form=SingleChoice(
                     title=Title("Beeper status (normal state)"),
@@ -214,6 +339,39 @@ def _parameter_valuespec_nut():
                     }
                 )
             ),
+            "ups_realpower": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Real power (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the real power drawn from the UPS. If the UPS does not "
+                        "measure it, it is estimated from the load and the nominal real power."
+                    ),
+                    form_spec_template=Integer(unit_symbol="W"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(800, 900)),
+                )
+            ),
+            "ups_power": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Apparent power (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the apparent power drawn from the UPS. If the UPS does not "
+                        "measure it, it is estimated from the load and the nominal apparent power."
+                    ),
+                    form_spec_template=Integer(unit_symbol="VA"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(1200, 1400)),
+                )
+            ),
+            "ups_realpower_headroom": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Real power headroom (lower threshold)"),
+                    help_text=Help("Set the levels for the real power left until the nominal real power of the UPS."),
+                    form_spec_template=Integer(unit_symbol="W"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(200, 100)),
+                )
+            ),
             "ups_temperature": DictElement(
                 parameter_form=SimpleLevels(
                     title=Title("Temperature (upper threshold)"),
@@ -223,6 +381,120 @@ def _parameter_valuespec_nut():
                     prefill_fixed_levels=DefaultValue(value=(35, 40)),
                 )
             ),
+            "battery_current": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Battery current (upper threshold)"),
+                    help_text=Help("Set the levels for the maximum battery current."),
+                    form_spec_template=Float(unit_symbol="A"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(20.0, 30.0)),
+                )
+            ),
+            "battery_temperature": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Battery temperature (upper threshold)"),
+                    help_text=Help("Set the levels for the maximum battery temperature."),
+                    form_spec_template=Integer(unit_symbol="°C"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(35, 40)),
+                )
+            ),
+            "input_current": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Input current (upper threshold)"),
+                    help_text=Help("Set the levels for the maximum input current."),
+                    form_spec_template=Float(unit_symbol="A"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(10.0, 12.0)),
+                )
+            ),
+            "output_frequency": DictElement(
+                parameter_form=Dictionary(
+                    title=Title("Output frequency"),
+                    elements={
+                        "lower": DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title("Output frequency (lower threshold)"),
+                                help_text=Help("Set the warning and critical levels for the minimum output frequency."),
+                                form_spec_template=Integer(unit_symbol="Hz"),
+                                level_direction=LevelDirection.LOWER,
+                                prefill_fixed_levels=DefaultValue(value=(49, 45)),
+                            )
+                        ),
+                        "upper": DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title("Output frequency (upper threshold)"),
+                                help_text=Help("Set the warning and critical levels for the maximum output frequency."),
+                                form_spec_template=Integer(unit_symbol="Hz"),
+                                level_direction=LevelDirection.UPPER,
+                                prefill_fixed_levels=DefaultValue(value=(51, 55)),
+                            )
+                        ),
+                    }
+                )
+            ),
+            "output_current": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Output current (upper threshold)"),
+                    help_text=Help("Set the levels for the maximum output current."),
+                    form_spec_template=Float(unit_symbol="A"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(10.0, 12.0)),
+                )
+            ),
+            "ups_efficiency": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Efficiency (lower threshold)"),
+                    help_text=Help("Set the levels for the minimum efficiency."),
+                    form_spec_template=Float(unit_symbol="%"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(90.0, 85.0)),
+                )
+            ),
+            "voltage_imbalance": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Voltage imbalance between phases (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the largest deviation of a phase voltage from the "
+                        "average of all phases of a three-phase UPS, in percent of the average. "
+                        "The levels apply to the input and the output voltages."
+                    ),
+                    form_spec_template=Float(unit_symbol="%"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(2.0, 5.0)),
+                )
+            ),
+            "current_imbalance": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Current and load imbalance between phases (upper threshold)"),
+                    help_text=Help(
+                        "Set the levels for the largest deviation of a phase current or load from "
+                        "the average of all phases of a three-phase UPS, in percent of the average."
+                    ),
+                    form_spec_template=Float(unit_symbol="%"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(20.0, 40.0)),
+                )
+            ),
+            "stale_grace": DictElement(
+                parameter_form=Integer(
+                    title=Title("Grace period for unreachable UPSes"),
+                    help_text=Help(
+                        "While the agent reports a UPS as unreachable, for example because its "
+                        "upsd server does not answer, the last good data is shown as stale for "
+                        "this long. Afterwards the service goes UNKNOWN."
+                    ),
+                    unit_symbol="sec",
+                    prefill=DefaultValue(600),
+                )
+            ),
+            "stale_state": DictElement(
+                parameter_form=ServiceState(
+                    title=Title("State during the grace period"),
+                    help_text=Help("State of the service while it shows stale data."),
+                    prefill=DefaultValue(ServiceState.OK),
+                )
+            ),
         }
     )
 
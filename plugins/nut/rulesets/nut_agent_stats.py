@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Description:
+This module defines the rule for the statistics of the queries of the
+upsd servers, reported by the NUT agent plugins and the special agent.
+'''
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue,
+    Dictionary,
+    DictElement,
+    Float,
+    Integer,
+    LevelDirection,
+    ServiceState,
+    SimpleLevels,
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, Help, HostAndItemCondition, Topic
+
+
+def _parameter_form_nut_agent_stats() -> Dictionary:
+    return Dictionary(
+        elements={
+            "connect_time": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Connect time"),
+                    help_text=Help(
+                        "Set the levels for the time to connect to the upsd server. nut.sh "
+                        "reports the time of upsc -l instead."
+                    ),
+                    form_spec_template=Float(unit_symbol="s"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(0.5, 1.0)),
+                )
+            ),
+            "response_time": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Response time"),
+                    help_text=Help(
+                        "Set the levels for the time the query of all UPSes of the upsd server "
+                        "took. Keep them below the timeout per upsd server of the agent plugin."
+                    ),
+                    form_spec_template=Float(unit_symbol="s"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(2.0, 4.0)),
+                )
+            ),
+            "upses": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Number of UPSes (lower threshold)"),
+                    help_text=Help("Set the levels for the number of UPSes the upsd server lists."),
+                    form_spec_template=Integer(),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue(value=(1, 1)),
+                )
+            ),
+            "error_state": DictElement(
+                parameter_form=ServiceState(
+                    title=Title("State if the query failed"),
+                    help_text=Help(
+                        "State if the upsd server could not be queried, or returned an error "
+                        "for one of its UPSes."
+                    ),
+                    prefill=DefaultValue(ServiceState.CRIT),
+                )
+            ),
+        }
+    )
+
+
+rule_spec_nut_agent_stats = CheckParameters(
+    name="nut_agent_stats",
+    title=Title("Network UPS Tools upsd queries"),
+    topic=Topic.APPLICATIONS,
+    condition=HostAndItemCondition(item_title=Title("upsd server (host[:port])")),
+    parameter_form=_parameter_form_nut_agent_stats,
+)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Description:
+This module defines the rules for the NUT redundancy groups: which UPSes
+form a group, and the levels of the group and the host summary services.
+'''
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    DefaultValue,
+    Dictionary,
+    DictElement,
+    Float,
+    Integer,
+    LevelDirection,
+    List,
+    ServiceState,
+    SimpleLevels,
+    String,
+    validators,
+)
+from cmk.rulesets.v1.rule_specs import (
+    CheckParameters,
+    DiscoveryParameters,
+    Help,
+    HostAndItemCondition,
+    HostCondition,
+    Topic,
+)
+
+
+def _parameter_form_nut_groups() -> Dictionary:
+    return Dictionary(
+        elements={
+            "groups": DictElement(
+                parameter_form=List(
+                    title=Title("Redundancy groups"),
+                    help_text=Help(
+                        "UPSes feeding the same equipment, like the A and B feed of a rack. "
+                        "Each group results in one service which checks whether the group "
+                        "can still carry its combined load if one UPS fails."
+                    ),
+                    element_template=Dictionary(
+                        elements={
+                            "name": DictElement(
+                                required=True,
+                                parameter_form=String(
+                                    title=Title("Name of the group"),
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                            ),
+                            "members": DictElement(
+                                required=True,
+                                parameter_form=List(
+                                    title=Title("UPSes"),
+                                    element_template=String(
+                                        help_text=Help(
+                                            "Regular expression matching the beginning of the "
+                                            "UPS name, like <tt>rack12-</tt> or <tt>ups1@pdu-a$</tt>."
+                                        ),
+                                        custom_validate=(validators.LengthInRange(min_value=1),),
+                                    ),
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                            ),
+                        },
+                    ),
+                ),
+            ),
+            "host_summary": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Summary service for all UPSes of the host"),
+                    label=Title("Create the service UPS summary"),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+        }
+    )
+
+
+rule_spec_nut_groups = DiscoveryParameters(
+    name="nut_groups",
+    title=Title("Network UPS Tools redundancy groups"),
+    topic=Topic.APPLICATIONS,
+    parameter_form=_parameter_form_nut_groups,
+)
+
+
+def _common_elements() -> dict:
+    return {
+        "battery_runtime": DictElement(
+            parameter_form=SimpleLevels(
+                title=Title("Worst battery runtime"),
+                help_text=Help("Set the levels for the lowest runtime of all UPSes."),
+                form_spec_template=Integer(unit_symbol="sec"),
+                level_direction=LevelDirection.LOWER,
+                prefill_fixed_levels=DefaultValue(value=(1200, 900)),
+            )
+        ),
+        "battery_charge": DictElement(
+            parameter_form=SimpleLevels(
+                title=Title("Worst battery charge"),
+                help_text=Help("Set the levels for the lowest charge of all UPSes."),
+                form_spec_template=Integer(unit_symbol="%"),
+                level_direction=LevelDirection.LOWER,
+                prefill_fixed_levels=DefaultValue(value=(90, 85)),
+            )
+        ),
+        "on_battery": DictElement(
+            parameter_form=SimpleLevels(
+                title=Title("UPSes on battery"),
+                help_text=Help("Set the levels for the number of UPSes running on battery."),
+                form_spec_template=Integer(),
+                level_direction=LevelDirection.UPPER,
+                prefill_fixed_levels=DefaultValue(value=(1, 2)),
+            )
+        ),
+        "realpower": DictElement(
+            parameter_form=SimpleLevels(
+                title=Title("Combined real power"),
+                help_text=Help("Set the levels for the real power drawn from all UPSes together."),
+                form_spec_template=Integer(unit_symbol="W"),
+                level_direction=LevelDirection.UPPER,
+                prefill_fixed_levels=DefaultValue(value=(2000, 2500)),
+            )
+        ),
+    }
+
+
+def _parameter_form_nut_group() -> Dictionary:
+    return Dictionary(
+        elements={
+            **_common_elements(),
+            "n1_load": DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Load if one UPS fails"),
+                    help_text=Help(
+                        "Set the levels for the load of the remaining UPSes if the biggest UPS "
+                        "of the group fails, in percent of their capacity. Without the real power "
+                        "of the UPSes, they are assumed to be of equal size."
+                    ),
+                    form_spec_template=Float(unit_symbol="%"),
+                    level_direction=LevelDirection.UPPER,
+                    prefill_fixed_levels=DefaultValue(value=(80.0, 100.0)),
+                )
+            ),
+            "n1_state": DictElement(
+                parameter_form=ServiceState(
+                    title=Title("State if N-1 redundancy is lost"),
+                    prefill=DefaultValue(ServiceState.CRIT),
+                )
+            ),
+        }
+    )
+
+
+rule_spec_nut_group = CheckParameters(
+    name="nut_group",
+    title=Title("Network UPS Tools redundancy group"),
+    topic=Topic.APPLICATIONS,
+    condition=HostAndItemCondition(item_title=Title("Group name")),
+    parameter_form=_parameter_form_nut_group,
+)
+
+
+def _parameter_form_nut_summary() -> Dictionary:
+    return Dictionary(elements=_common_elements())
+
+
+rule_spec_nut_summary = CheckParameters(
+    name="nut_summary",
+    title=Title("Network UPS Tools summary"),
+    topic=Topic.APPLICATIONS,
+    condition=HostCondition(),
+    parameter_form=_parameter_form_nut_summary,
+)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Description:
+This module defines the discovery rule enabling the NUT check for UPSes
+monitored via SNMP and the UPS-MIB.
+'''
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    DefaultValue,
+    Dictionary,
+    DictElement,
+)
+from cmk.rulesets.v1.rule_specs import DiscoveryParameters, Help, Topic
+
+
+def _parameter_form_nut_ups_mib() -> Dictionary:
+    return Dictionary(
+        help_text=Help(
+            "Checkmk monitors UPSes implementing the UPS-MIB (RFC 1628) with its own "
+            "checks already. Enable this rule for hosts whose UPS should be checked "
+            "like a UPS of the NUT agent plugin instead, with the rules and graphs "
+            "of Network UPS Tools."
+        ),
+        elements={
+            "enabled": DictElement(
+                required=True,
+                parameter_form=BooleanChoice(
+                    title=Title("Discovery of the UPS"),
+                    label=Title("Discover a NUT service for the UPS-MIB of the host"),
+                    prefill=DefaultValue(True),
+                ),
+            ),
+        },
+    )
+
+
+rule_spec_nut_ups_mib = DiscoveryParameters(
+    name="nut_ups_mib",
+    title=Title("Network UPS Tools via SNMP (UPS-MIB)"),
+    topic=Topic.APPLICATIONS,
+    parameter_form=_parameter_form_nut_ups_mib,
+)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Description:
+This module defines the rule for the NUT special agent, which polls
+upsd servers from the Checkmk site.
+'''
+
+from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    DefaultValue,
+    Dictionary,
+    DictElement,
+    Float,
+    Integer,
+    List,
+    Password,
+    String,
+    migrate_to_password,
+    validators,
+)
+from cmk.rulesets.v1.rule_specs import Help, SpecialAgent, Topic
+
+
+def _parameter_form_special_agent() -> Dictionary:
+    return Dictionary(
+        elements={
+            "endpoints": DictElement(
+                required=True,
+                parameter_form=List(
+                    title=Title("upsd servers"),
+                    help_text=Help(
+                        "All UPSes of these servers are monitored on the host \
+                        the rule applies to."
+                    ),
+                    element_template=Dictionary(
+                        elements={
+                            "host": DictElement(
+                                required=True,
+                                parameter_form=String(
+                                    title=Title("Host name or IP address"),
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                            ),
+                            "port": DictElement(
+                                parameter_form=Integer(
+                                    title=Title("TCP port"),
+                                    prefill=DefaultValue(3493),
+                                    custom_validate=(validators.NetworkPort(),),
+                                ),
+                            ),
+                            "timeout": DictElement(
+                                parameter_form=Float(
+                                    title=Title("Timeout for this server"),
+                                    unit_symbol="s",
+                                    prefill=DefaultValue(5.0),
+                                ),
+                            ),
+                        },
+                    ),
+                    custom_validate=(validators.LengthInRange(min_value=1),),
+                ),
+            ),
+            "username": DictElement(
+                parameter_form=String(
+                    title=Title("Username"),
+                    help_text=Help(
+                        "Only needed if the upsd servers do not allow anonymous \
+                        access."
+                    ),
+                ),
+            ),
+            "password": DictElement(
+                parameter_form=Password(
+                    title=Title("Password"),
+                    migrate=migrate_to_password,
+                ),
+            ),
+            "timeout": DictElement(
+                parameter_form=Float(
+                    title=Title("Timeout per upsd server"),
+                    help_text=Help(
+                        "Time a single upsd server may take to accept the \
+                        connection and answer all requests."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(5.0),
+                ),
+            ),
+            "budget": DictElement(
+                parameter_form=Float(
+                    title=Title("Overall time budget"),
+                    help_text=Help(
+                        "Time after which the special agent stops waiting for \
+                        upsd servers and reports the remaining ones as failed. \
+                        Keep it below the timeout of the datasource program."
+                    ),
+                    unit_symbol="s",
+                    prefill=DefaultValue(45.0),
+                ),
+            ),
+            "max_connections": DictElement(
+                parameter_form=Integer(
+                    title=Title("Maximum number of concurrent connections"),
+                    help_text=Help(
+                        "Number of upsd servers polled at the same time. Slow \
+                        servers only block their own connection until their \
+                        timeout expires."
+                    ),
+                    prefill=DefaultValue(50),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
+            "piggyback": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Piggyback hosts"),
+                    label=Title("Send every UPS as piggyback data of its own host"),
+                    help_text=Help(
+                        "The piggyback host of a UPS is named after the UPS, like \
+                        ups_nas_3494 for ups@nas:3494. Create hosts with these names \
+                        to check every UPS on its own host."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+        }
+    )
+
+
+rule_spec_special_agent_nut = SpecialAgent(
+    name="nut",
+    title=Title("Network UPS Tools via upsd"),
+    topic=Topic.APPLICATIONS,
+    parameter_form=_parameter_form_special_agent,
+)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''Command line of the NUT special agent'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+from typing import Any, Iterator, Mapping
+
+from cmk.server_side_calls.v1 import (
+    HostConfig,
+    SpecialAgentCommand,
+    SpecialAgentConfig,
+    noop_parser,
+)
+
+DEFAULT_PORT = 3493
+
+
+def _endpoint(endpoint: Mapping[str, Any]) -> str:
+    host = endpoint["host"]
+    if ":" in host:
+        host = f"[{host}]"
+    return f"{host}:{endpoint.get('port', DEFAULT_PORT)}"
+
+
+def commands_function(
+    params: Mapping[str, Any],
+    host_config: HostConfig,  # pylint: disable=unused-argument
+) -> Iterator[SpecialAgentCommand]:
+    '''Build the command line of the special agent from the rule'''
+    args = []
+    for key in ("timeout", "budget", "max_connections"):
+        if key in params:
+            args += [f"--{key.replace('_', '-')}", str(params[key])]
+    for endpoint in params["endpoints"]:
+        if "timeout" in endpoint:
+            args += ["--timeout-for", f"{_endpoint(endpoint)}={endpoint['timeout']}"]
+    if "username" in params:
+        args += ["--username", params["username"]]
+    if "password" in params:
+        args += ["--password-id", params["password"]]
+    if params.get("piggyback"):
+        args.append("--piggyback")
+    args += [_endpoint(e) for e in params["endpoints"]]
+    yield SpecialAgentCommand(command_arguments=args)
+
+
+special_agent_nut = SpecialAgentConfig(
+    name="nut",
+    parameter_parser=noop_parser,
+    commands_function=commands_function,
+)
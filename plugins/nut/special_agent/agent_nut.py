@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+'''
+Special agent for Network UPS Tools.
+
+Polls a list of upsd servers from the Checkmk site over the NUT network
+protocol and prints the same nut, nut_errors and nut_agent_stats sections as
+the agent plugin, so nut_parse and check_nut work unchanged. The protocol
+client and the rendering of the sections live in lib/upsd.py, the agent
+plugin nut.py carries a generated copy of them.
+
+The servers are queried by a bounded pool of connections, each one with its
+own deadline, so a few slow servers do not hold up the others.
+
+The UPS names of every server are kept in a state file of the site, so the
+UPSes of a server which fails are reported with collector.error instead of
+vanishing from the output.
+
+With --piggyback, every UPS is sent as piggyback data of its own host, like
+the agent plugin does with piggyback set in nut.cfg.
+'''
+
+# This is free software;  you can redistribute it and/or modify it
+# under the  terms of the  GNU General Public License  as published by
+# the Free Software Foundation in version 2.  This file is distributed
+# in the hope that it will be useful, but WITHOUT ANY WARRANTY;  with-
+# out even the implied warranty of  MERCHANTABILITY  or  FITNESS FOR A
+# PARTICULAR PURPOSE. See the  GNU General Public License for more de-
+# ails.  You should have  received  a copy of the  GNU  General Public
+# License along with GNU Make; see the file  COPYING.  If  not,  write
+# to the Free Software Foundation, Inc., 51 Franklin St,  Fifth Floor,
+# Boston, MA 02110-1301 USA.
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+from ..lib import upsd
+
+
+def lookup_password(password_id: str) -> str:
+    '''Read a password from the password store, given as "<id>:<file>".'''
+    from cmk.utils import password_store  # pylint: disable=import-outside-toplevel
+    ident, pw_file = password_id.rsplit(":", 1)
+    return password_store.lookup(Path(pw_file), ident)
+
+
+def parse_arguments(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "endpoints", nargs="+", metavar="HOST[:PORT]",
+        help="upsd servers to poll",
+    )
+    parser.add_argument("--timeout", type=float, default=5.0, help="deadline per upsd server")
+    parser.add_argument(
+        "--timeout-for", action="append", default=[], metavar="HOST[:PORT]=SECONDS",
+        help="deadline for a single upsd server, overriding --timeout",
+    )
+    parser.add_argument("--budget", type=float, default=45.0, help="deadline of the whole run")
+    parser.add_argument(
+        "--max-connections", type=int, default=50,
+        help="maximum number of upsd servers polled at the same time",
+    )
+    parser.add_argument("--username", help="user to authenticate as")
+    parser.add_argument("--password-id", help="password store reference of the password")
+    parser.add_argument(
+        "--piggyback", action="store_true",
+        help="send the data of every UPS as piggyback data of its own host",
+    )
+    parser.add_argument(
+        "--state-dir", type=Path,
+        help="directory for the UPS names of the servers, defaults to the tmp directory of the site",
+    )
+    return parser.parse_args(argv)
+
+
+def state_file(state_dir: Optional[Path], targets: Sequence[Tuple[str, int]]) -> Optional[Path]:
+    '''
+    The state file with the UPS names of the polled servers.
+
+    The name is derived from the servers, so hosts polling the same servers
+    share it and a changed list of servers starts over.
+
+    Args:
+        state_dir (Path): Directory of the state files, None for the site default.
+        targets (Sequence[Tuple[str, int]]): The polled servers.
+
+    Returns:
+        Path: The state file, None outside a site without --state-dir.
+    '''
+    if state_dir is None:
+        if "OMD_ROOT" not in os.environ:
+            return None
+        state_dir = Path(os.environ["OMD_ROOT"]) / "tmp" / "check_mk" / "agent_nut"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256(repr(sorted(targets)).encode("utf-8")).hexdigest()[:16]
+    return state_dir / f"{digest}.json"
+
+
+def endpoint_timeouts(specs: Sequence[str]) -> Dict[Tuple[str, int], float]:
+    '''Parse the --timeout-for arguments.'''
+    timeouts = {}
+    for spec in specs:
+        target, _, seconds = spec.rpartition("=")
+        timeouts[upsd.parse_target(target)] = float(seconds)
+    return timeouts
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    '''Entry point of the special agent.'''
+    args = parse_arguments(argv)
+    password = lookup_password(args.password_id) if args.password_id else None
+    timeouts = endpoint_timeouts(args.timeout_for)
+    # The same server may be listed twice, poll it only once
+    targets = sorted({upsd.parse_target(e) for e in args.endpoints})
+
+    def poll(host, port, timeout):
+        return upsd.poll_target(
+            host, port, timeouts.get((host, port), timeout), args.username, password
+        )
+
+    collected = int(time.time())
+    stats = {}
+    results = upsd.poll_all(
+        targets, args.timeout, args.budget, poll=poll, workers=args.max_connections, stats=stats
+    )
+    path = state_file(args.state_dir, targets)
+    known = upsd.remember_upses(str(path), results) if path is not None else None
+    lines = list(upsd.render_output(results, collected, None, known))
+    lines += upsd.agent_stats_lines(results, stats)
+    if args.piggyback:
+        lines = upsd.piggyback_lines(lines)
+    for line in lines:
+        sys.stdout.write(line + "\n")
+    return 0
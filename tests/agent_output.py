@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+'''Synthetic agent output of the NUT plugin for benchmarks and the fake upsd.'''
+
+from typing import Dict, List
+
+# upsc output of a usbhid-ups driven UPS, see the example in agent_based/nut.py
+_UPS_VARIABLES = [
+    ("battery.charge", "100"),
+    ("battery.charge.low", "10"),
+    ("battery.charge.warning", "50"),
+    ("battery.mfr.date", "2021/03/14"),
+    ("battery.packs", "2"),
+    ("battery.runtime", "788"),
+    ("battery.runtime.low", "120"),
+    ("battery.type", "PbAc"),
+    ("battery.voltage", "13.6"),
+    ("battery.voltage.nominal", "12.0"),
+    ("device.mfr", "American Power Conversion"),
+    ("device.model", "Back-UPS XS 1400U"),
+    ("device.serial", "3B2103X12345"),
+    ("device.type", "ups"),
+    ("driver.name", "usbhid-ups"),
+    ("driver.parameter.pollfreq", "30"),
+    ("driver.parameter.pollinterval", "2"),
+    ("driver.parameter.port", "auto"),
+    ("driver.parameter.productid", "0002"),
+    ("driver.parameter.synchronous", "auto"),
+    ("driver.parameter.vendorid", "051D"),
+    ("driver.version", "2.8.0"),
+    ("driver.version.data", "APC HID 0.98"),
+    ("driver.version.internal", "0.47"),
+    ("input.frequency", "50.0"),
+    ("input.sensitivity", "medium"),
+    ("input.transfer.high", "295"),
+    ("input.transfer.low", "155"),
+    ("input.voltage", "238.0"),
+    ("input.voltage.fault", "0.0"),
+    ("input.voltage.nominal", "230"),
+    ("output.voltage", "229.9"),
+    ("ups.beeper.status", "enabled"),
+    ("ups.delay.shutdown", "20"),
+    ("ups.firmware", "926.T2 .I"),
+    ("ups.firmware.aux", "T2"),
+    ("ups.load", "39"),
+    ("ups.mfr", "American Power Conversion"),
+    ("ups.mfr.date", "2021/03/14"),
+    ("ups.model", "Back-UPS XS 1400U"),
+    ("ups.productid", "0002"),
+    ("ups.realpower.nominal", "700"),
+    ("ups.serial", "3B2103X12345"),
+    ("ups.status", "OL CHRG"),
+    ("ups.temperature", "27.8"),
+    ("ups.test.result", "No test initiated"),
+    ("ups.timer.reboot", "0"),
+    ("ups.timer.shutdown", "-1"),
+    ("ups.vendorid", "051d"),
+]
+
+
+def ups_name(idx: int) -> str:
+    '''Name of the idx-th synthetic UPS.'''
+    return f"ups{idx:05d}@upsd{idx // 50:03d}.example.com"
+
+
+def generate_string_table(num_ups: int) -> List[List[str]]:
+    '''
+    Build the string table Checkmk hands to nut_parse for num_ups UPSes.
+
+    Args:
+        num_ups (int): Number of UPSes in the output.
+
+    Returns:
+        List[List[str]]: The whitespace split agent output lines.
+    '''
+    body = [[f"{key}:", *value.split()] for key, value in _UPS_VARIABLES]
+    on_battery = [
+        ["ups.status:", "OB", "DISCHRG"] if key == "ups.status" else line
+        for (key, _), line in zip(_UPS_VARIABLES, body)
+    ]
+    string_table = []
+    for idx in range(num_ups):
+        string_table.append(["==>", ups_name(idx), "<=="])
+        # Every tenth UPS is on battery to exercise more of the check
+        string_table.extend(list(line) for line in (on_battery if idx % 10 == 9 else body))
+    return string_table
+
+
+def generate_upses(num_ups: int) -> Dict[str, Dict[str, str]]:
+    '''
+    Build the variables of num_ups UPSes as served by tests.fake_upsd.
+
+    Args:
+        num_ups (int): Number of UPSes.
+
+    Returns:
+        Dict[str, Dict[str, str]]: UPS names mapped to their variables.
+    '''
+    upses = {}
+    for idx in range(num_ups):
+        variables = dict(_UPS_VARIABLES)
+        if idx % 10 == 9:
+            variables["ups.status"] = "OB DISCHRG"
+        upses[f"ups{idx:05d}"] = variables
+    return upses
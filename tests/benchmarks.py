@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+'''
+Benchmark suite for parsing, discovery and checking of the NUT plugin.
+
+Run it from the repository root to store the results as JSON:
+
+    python3 -m tests.benchmarks --output bench.json
+
+and compare a change against stored baseline results:
+
+    python3 -m tests.benchmarks --compare bench.json
+
+The comparison exits with 1 if a step got slower or needs more memory than
+the baseline by more than the tolerance.
+
+Every run also measures the lines of agent output nut_parse handles per
+second on the synthetic output of PARSE_TARGET_UPSES UPSes and exits with 1
+if it stays below PARSE_TARGET_LINES_PER_SECOND, so parsing stays cheap for
+central sites with large fleets.
+'''
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from plugins.nut.agent_based.nut import (
+    check_nut,
+    check_plugin_nut,
+    discover_nut,
+    nut_parse,
+)
+from tests.agent_output import generate_string_table
+
+FLEET_SIZES = (1, 100, 1_000, 10_000)
+REPEAT = 3
+TOLERANCE = 0.25
+PARSE_TARGET_LINES_PER_SECOND = 2_000_000
+PARSE_TARGET_UPSES = 10_000
+
+
+def _check_all(section) -> None:
+    params = check_plugin_nut.check_default_parameters
+    for service in discover_nut(section):
+        for _ in check_nut(service.item, params, section):
+            pass
+
+
+_STEPS: Dict[str, Callable[[Any, Any], Any]] = {
+    'parse': lambda string_table, section: nut_parse(string_table),
+    'discover': lambda string_table, section: list(discover_nut(section)),
+    'check': lambda string_table, section: _check_all(section),
+}
+
+
+def _measure(step: Callable[[], Any]) -> Dict[str, float]:
+    '''Best time of REPEAT runs and peak memory of a separate traced run.'''
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        step()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        step()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def run_benchmarks(sizes: Sequence[int] = FLEET_SIZES) -> Dict[str, Any]:
+    '''
+    Time all steps for all fleet sizes.
+
+    Args:
+        sizes (Sequence[int]): Numbers of UPSes in the synthetic agent output.
+
+    Returns:
+        Dict[str, Any]: The results, keyed by step and fleet size.
+    '''
+    results: Dict[str, Dict[str, Dict[str, float]]] = {step: {} for step in _STEPS}
+    for size in sizes:
+        string_table = generate_string_table(size)
+        section = nut_parse(string_table)
+        for name, step in _STEPS.items():
+            results[name][str(size)] = _measure(lambda: step(string_table, section))
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def parse_rate(size: int = PARSE_TARGET_UPSES) -> float:
+    '''Lines of agent output per second nut_parse handles, best of REPEAT runs.'''
+    string_table = generate_string_table(size)
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        nut_parse(string_table)
+        best = min(best, time.perf_counter() - started)
+    return len(string_table) / best
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE) -> List[str]:
+    '''
+    Find regressions of current results against baseline results.
+
+    Args:
+        current (Dict[str, Any]): Results of run_benchmarks.
+        baseline (Dict[str, Any]): Stored results of an earlier run.
+        tolerance (float): Accepted relative slow down or memory growth.
+
+    Returns:
+        List[str]: One message per regression.
+    '''
+    regressions = []
+    for step, sizes in current['results'].items():
+        for size, values in sizes.items():
+            base = baseline['results'].get(step, {}).get(size)
+            if base is None:
+                continue
+            for key, value in values.items():
+                if base[key] and value > base[key] * (1 + tolerance):
+                    regressions.append(
+                        f"{step} ({size} UPS): {key} {base[key]:.6g} -> {value:.6g} "
+                        f"(+{(value / base[key] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def _format(results: Dict[str, Any]) -> str:
+    lines = [f"{'step':<10}{'UPSes':>8}{'seconds':>14}{'peak bytes':>14}"]
+    for step, sizes in results['results'].items():
+        for size, values in sizes.items():
+            lines.append(f"{step:<10}{size:>8}{values['seconds']:>14.6f}{values['peak_bytes']:>14}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the NUT check plugin")
+    parser.add_argument("--output", help="store the results as JSON in this file")
+    parser.add_argument("--compare", help="compare against results stored in this file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="accepted relative regression (default: %(default)s)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=FLEET_SIZES,
+                        help="fleet sizes to benchmark (default: %(default)s)")
+    parser.add_argument("--parse-target", type=float, default=PARSE_TARGET_LINES_PER_SECOND,
+                        help="minimum lines per second of nut_parse, 0 to skip (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes)
+    print(_format(current))
+
+    failed = False
+    if args.parse_target:
+        rate = parse_rate()
+        print(f"nut_parse: {rate:,.0f} lines/s on {PARSE_TARGET_UPSES:,} UPSes")
+        if rate < args.parse_target:
+            print(f"BELOW TARGET: nut_parse handled {rate:,.0f} lines/s, "
+                  f"target is {args.parse_target:,.0f} lines/s")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(current, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as stored:
+            regressions = compare(current, json.load(stored), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+'''
+Fake upsd speaking the NUT network protocol.
+
+It serves LIST UPS, LIST VAR, GET VAR, USERNAME, PASSWORD and LOGOUT and
+answers everything else with the ERR replies of upsd. Latency, dropped
+connections and slow UPSes can be simulated, which makes it usable for
+regression tests of the agent plugin as well as for load tests of nut.sh,
+nut.py or the special agent on a box without any UPS:
+
+    python3 -m tests.fake_upsd --upses 5000 --latency 0.01 --drop-rate 0.001
+
+The served UPSes are named ups00000, ups00001, ... and carry the variables
+of tests.agent_output.
+'''
+
+import argparse
+import random
+import socketserver
+import threading
+import time
+from typing import Dict, Optional
+
+from tests.agent_output import generate_upses
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class _UpsdHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def handle(self):
+        fake = self.server.fake
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            words = line.split()
+            reply = fake.reply(words)
+            delay = fake.delay + fake.slow_upses.get(words[2] if len(words) > 2 else "", 0.0)
+            if delay:
+                time.sleep(delay)
+            if reply is None or fake.drop():
+                return
+            self.wfile.write("".join(f"{r}\n" for r in reply).encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class FakeUpsd:
+    '''
+    Serve a fixed set of UPSes.
+
+    Args:
+        upses (Dict[str, Dict[str, str]]): UPS names mapped to their variables.
+        delay (float): Seconds to wait before answering each request.
+        users (Dict[str, str]): Accepted user names and passwords.
+        drop_rate (float): Probability to close the connection instead of
+            answering a request.
+        slow_upses (Dict[str, float]): UPS names mapped to additional seconds
+            to wait before answering requests about them.
+        seed (int): Seed for the drops, for reproducible runs.
+        address (str): Address to listen on.
+        port (int): Port to listen on, 0 picks a free one.
+    '''
+
+    def __init__(
+        self,
+        upses: Dict[str, Dict[str, str]],
+        delay: float = 0.0,
+        users: Optional[Dict[str, str]] = None,
+        drop_rate: float = 0.0,
+        slow_upses: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None,
+        address: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.upses = upses
+        self.delay = delay
+        self.users = users or {}
+        self.drop_rate = drop_rate
+        self.slow_upses = slow_upses or {}
+        self.requests = []
+        self.connections = 0
+        self.drops = 0
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = _Server((address, port), _UpsdHandler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        '''Serve in the calling thread until interrupted.'''
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def drop(self) -> bool:
+        '''Decide whether the connection is dropped instead of answering.'''
+        if not self.drop_rate:
+            return False
+        with self.lock:
+            dropped = self._random.random() < self.drop_rate
+            self.drops += dropped
+        return dropped
+
+    def reply(self, words):
+        '''Return the reply lines for one request, or None to close the connection.'''
+        with self.lock:
+            self.requests.append(" ".join(words))
+        command = [w.upper() for w in words[:2]]
+
+        if command == ["LIST", "UPS"]:
+            return (
+                ["BEGIN LIST UPS"]
+                + [f"UPS {name} {_quote('fake')}" for name in self.upses]
+                + ["END LIST UPS"]
+            )
+        if command == ["LIST", "VAR"]:
+            if len(words) != 3:
+                return ["ERR INVALID-ARGUMENT"]
+            ups = words[2]
+            if ups not in self.upses:
+                return ["ERR UNKNOWN-UPS"]
+            return (
+                [f"BEGIN LIST VAR {ups}"]
+                + [f"VAR {ups} {k} {_quote(v)}" for k, v in self.upses[ups].items()]
+                + [f"END LIST VAR {ups}"]
+            )
+        if command == ["GET", "VAR"]:
+            if len(words) != 4:
+                return ["ERR INVALID-ARGUMENT"]
+            ups, var = words[2:]
+            if ups not in self.upses:
+                return ["ERR UNKNOWN-UPS"]
+            if var not in self.upses[ups]:
+                return ["ERR VAR-NOT-SUPPORTED"]
+            return [f"VAR {ups} {var} {_quote(self.upses[ups][var])}"]
+        if command[:1] == ["USERNAME"] and len(words) == 2:
+            return ["OK"]
+        if command[:1] == ["PASSWORD"] and len(words) == 2:
+            return ["OK"] if words[1].strip('"') in self.users.values() else ["ERR ACCESS-DENIED"]
+        if command[:1] == ["LOGOUT"]:
+            return None
+        return ["ERR UNKNOWN-COMMAND"]
+
+
+def main(argv=None):
+    '''Run a fake upsd in the foreground.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--address", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=3493, help="port to listen on")
+    parser.add_argument("--upses", type=int, default=100, help="number of simulated UPSes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0,
+        help="probability to drop the connection instead of answering",
+    )
+    parser.add_argument("--slow", type=int, default=0, help="number of UPSes answering slowly")
+    parser.add_argument(
+        "--slow-delay", type=float, default=2.0, help="additional seconds for slow UPSes",
+    )
+    parser.add_argument("--seed", type=int, help="seed for reproducible drops")
+    args = parser.parse_args(argv)
+
+    upses = generate_upses(args.upses)
+    fake = FakeUpsd(
+        upses,
+        delay=args.latency,
+        drop_rate=args.drop_rate,
+        slow_upses={name: args.slow_delay for name in list(upses)[:args.slow]},
+        seed=args.seed,
+        address=args.address,
+        port=args.port,
+    )
+    print(f"Serving {len(upses)} UPSes on {args.address}:{fake.port}", flush=True)
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
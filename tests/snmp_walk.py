@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+'''
+Simulate SNMP fetches from recorded walks.
+
+The walks are in the format of the stored walks of Checkmk (cmk --snmpwalk),
+one "OID value" per line. fetch answers an SNMPTree like Checkmk does for a
+host in simulation mode: every column is walked below the base OID and the
+columns are joined into rows by the remaining OID suffix.
+'''
+
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+WALKS = Path(__file__).parent / "snmpwalks"
+
+
+def load_walk(name: str) -> Dict[str, str]:
+    '''Read a recorded walk, OIDs without leading dot mapped to their values.'''
+    walk = {}
+    for line in (WALKS / name).read_text(encoding="utf-8").splitlines():
+        oid, _, value = line.partition(" ")
+        value = value.strip()
+        if value.startswith('"') and value.endswith('"'):
+            value = value[1:-1]
+        walk[oid.lstrip(".")] = value
+    return walk
+
+
+def _index_key(index: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in index.split(".") if part)
+
+
+def fetch_tree(walk: Dict[str, str], base: str, oids: Sequence[str]) -> List[List[str]]:
+    '''The rows of one SNMPTree, missing cells are empty strings.'''
+    columns = []
+    for oid in oids:
+        prefix = f"{base.lstrip('.')}.{oid}"
+        columns.append({
+            key[len(prefix):].lstrip("."): value
+            for key, value in walk.items()
+            if key == prefix or key.startswith(prefix + ".")
+        })
+    indices = sorted({index for column in columns for index in column}, key=_index_key)
+    return [[column.get(index, "") for column in columns] for index in indices]
+
+
+def fetch(walk: Dict[str, str], trees) -> List[List[List[str]]]:
+    '''The string table of an SNMP section fetching the given trees.'''
+    return [fetch_tree(walk, tree.base, tree.oids) for tree in trees]
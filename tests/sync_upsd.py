@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+'''
+Copy the upsd client of plugins/nut/lib/upsd.py into the agent plugin nut.py.
+
+The agent plugin has to stay a single file for the monitored hosts, so it
+carries the code of lib/upsd.py below its marker comment in a generated
+block. Change the client in lib/upsd.py only and run from the repository
+root:
+
+    python3 -m tests.sync_upsd
+
+With --check the agent plugin is not written, the run exits with 1 if it is
+outdated.
+'''
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).parent.parent
+LIBRARY = ROOT / "plugins/nut/lib/upsd.py"
+AGENT_PLUGIN = ROOT / "local/share/check_mk/agents/plugins/nut.py"
+
+# The code of the library below this line is copied
+LIBRARY_MARKER = "# written by python -m tests.sync_upsd\n"
+BEGIN = (
+    "# BEGIN upsd client, generated from plugins/nut/lib/upsd.py. Do not edit\n"
+    "# here, change lib/upsd.py and run python3 -m tests.sync_upsd.\n"
+)
+END = "# END upsd client\n"
+
+
+def synced(plugin: str, library: str) -> str:
+    '''
+    The agent plugin with the generated block replaced by the library code.
+
+    Args:
+        plugin (str): Source of the agent plugin.
+        library (str): Source of lib/upsd.py.
+
+    Returns:
+        str: The new source of the agent plugin.
+    '''
+    code = library.split(LIBRARY_MARKER, 1)[1].strip("\n")
+    head, rest = plugin.split(BEGIN, 1)
+    tail = rest.split(END, 1)[1]
+    return f"{head}{BEGIN}\n{code}\n\n\n{END}{tail}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true",
+                        help="only check that the agent plugin is up to date")
+    args = parser.parse_args(argv)
+
+    plugin = AGENT_PLUGIN.read_text(encoding="utf-8")
+    updated = synced(plugin, LIBRARY.read_text(encoding="utf-8"))
+    if updated == plugin:
+        return 0
+    if args.check:
+        print(f"OUTDATED: {AGENT_PLUGIN.relative_to(ROOT)}, run python3 -m tests.sync_upsd")
+        return 1
+    AGENT_PLUGIN.write_text(updated, encoding="utf-8")
+    print(f"updated {AGENT_PLUGIN.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
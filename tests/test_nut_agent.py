@@ -1,8 +1,28 @@
 #!/usr/bin/env python3
 '''Agent tests for the NUT plugin in Checkmk.'''
 
-from cmk.agent_based.v2 import Result, State
-from plugins.nut.agent_based.nut import nut_parse, check_nut
+import time
+
+from cmk.agent_based.v2 import Metric, Result, State
+from plugins.nut.agent_based.nut import (
+    UpsData,
+    check_battery_trend,
+    check_energy,
+    check_nut,
+    UpsStatus,
+    check_nut_samples,
+    check_nut_sections,
+    check_stale,
+    check_status_transitions,
+    discover_nut,
+    merge_static,
+    nut_parse,
+    parse_nut_samples,
+    phase_imbalance,
+    status_flags,
+    _PARSED_VARIABLES,
+)
+from plugins.nut.lib.metrics import CONSUMED_VARIABLES
 
 
 def test_nut_parse_basic():
@@ -21,6 +41,113 @@ def test_nut_parse_basic():
     assert parsed["demo_ups"]["ups_status"] == "OL"
 
 
+def test_nut_parse_ignores_unknown_variables():
+    string_table = [
+        ["ups.status:", "ignored", "before", "header"],
+        ["==>", "demo", "ups", "<=="],
+        ["driver.parameter.port:", "auto"],
+        ["ups.status:", "OL", "CHRG"],
+        ["ups.load:"],
+    ]
+    parsed = nut_parse(string_table)
+    assert parsed == {"demo ups": {"ups_status": "OL CHRG"}}
+
+
+def test_nut_parse_derived_metrics():
+    string_table = [
+        ["==>", "demo_ups", "<=="],
+        ["battery.packs:", "2"],
+        ["battery.voltage:", "13.5"],
+        ["ups.load:", "40"],
+        ["ups.power.nominal:", "1000"],
+        ["ups.realpower.nominal:", "600"],
+        ["ups.status:", "OL"],
+        ["==>", "measured_ups", "<=="],
+        ["ups.load:", "40"],
+        ["ups.realpower:", "250"],
+        ["ups.realpower.nominal:", "600"],
+    ]
+    parsed = nut_parse(string_table)
+    assert parsed["demo_ups"]["battery_voltage"] == 13.5
+    assert parsed["demo_ups"]["battery_voltage_total"] == 27.0
+    assert parsed["demo_ups"]["ups_realpower"] == 240.0
+    assert parsed["demo_ups"]["ups_power"] == 400.0
+    assert parsed["demo_ups"]["ups_realpower_headroom"] == 360.0
+    assert parsed["measured_ups"]["ups_realpower"] == 250.0
+    assert parsed["measured_ups"]["ups_realpower_headroom"] == 350.0
+    assert "ups_power" not in parsed["measured_ups"]
+
+
+def test_check_nut_does_not_modify_section():
+    section = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.packs:", "2"],
+        ["battery.voltage:", "13.5"],
+        ["ups.beeper.status:", "enabled"],
+        ["ups.status:", "OL"],
+    ])
+    params = {"ups_beeper_status": "enabled", "battery_voltage": ("fixed", (20, 10))}
+    first = list(check_nut("demo_ups", params, section))
+    second = list(check_nut("demo_ups", params, section))
+    assert first == second
+    assert section["demo_ups"]["battery_voltage"] == 13.5
+    voltage = [m for m in first if isinstance(m, Metric) and m.name == "nut_battery_voltage"]
+    assert voltage[0].value == 27.0
+
+
+def test_check_nut_merges_static_section():
+    section_nut = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.voltage:", "13.5"],
+        ["ups.beeper.status:", "enabled"],
+        ["ups.load:", "50"],
+        ["ups.status:", "OL"],
+    ])
+    section_nut_static = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.packs:", "2"],
+        ["ups.realpower.nominal:", "600"],
+        ["==>", "removed_ups", "<=="],
+        ["battery.packs:", "2"],
+    ])
+    params = {"ups_beeper_status": "enabled"}
+    metrics = {
+        m.name: m.value
+        for m in check_nut_sections("demo_ups", params, section_nut, section_nut_static, None)
+        if isinstance(m, Metric)
+    }
+    assert metrics["nut_battery_voltage"] == 27.0
+    assert metrics["nut_ups_realpower"] == 300.0
+    assert "battery_packs" not in section_nut["demo_ups"]
+
+    results = list(check_nut_sections("removed_ups", params, section_nut, section_nut_static, None))
+    assert results[0].state == State.UNKNOWN
+
+
+def test_consumed_variables():
+    assert "ups.status" in CONSUMED_VARIABLES
+    assert "ups.realpower.nominal" in CONSUMED_VARIABLES
+    assert "collector.time" not in CONSUMED_VARIABLES
+    assert "driver.version" not in CONSUMED_VARIABLES
+    # The allow-list must not drop anything the parser reads
+    assert {
+        variable for variable in _PARSED_VARIABLES if not variable.startswith("collector.")
+    } <= CONSUMED_VARIABLES
+
+
+def test_ups_data_mapping_api():
+    ups_data = UpsData(ups_status="OL", battery_charge=100.0, custom_value=1)
+    assert not hasattr(ups_data, "__dict__")
+    assert ups_data["ups_status"] == "OL"
+    assert ups_data.get("ups_load") is None
+    assert "battery_charge" in ups_data
+    assert "ups_load" not in ups_data
+    assert ups_data["custom_value"] == 1
+    assert list(ups_data) == ["battery_charge", "ups_status", "custom_value"]
+    assert len(ups_data) == 3
+    assert ups_data == {"ups_status": "OL", "battery_charge": 100.0, "custom_value": 1}
+
+
 def test_check_nut_status_ok():
     section = {
         "demo_ups": {
@@ -92,3 +219,392 @@ def test_check_nut_beeper_status_critical():
     summaries = [r.summary for r in results if isinstance(r, Result)]
     assert State.CRIT in states
     assert any("Beeper: disabled" in s for s in summaries)
+
+
+def test_nut_parse_collector_time():
+    string_table = [
+        ["==>", "demo_ups", "<=="],
+        ["ups.status:", "OL"],
+        ["collector.time:", "1700000000"],
+        ["collector.interval:", "300"],
+    ]
+    parsed = nut_parse(string_table)
+    assert parsed["demo_ups"]["collector_time"] == 1700000000.0
+    assert parsed["demo_ups"]["collector_interval"] == 300.0
+
+
+def test_check_nut_outdated_snapshot():
+    section = {
+        "demo_ups": {
+            "ups_status": "OL",
+            "ups_beeper_status": "enabled",
+            "collector_time": time.time() - 1000,
+            "collector_interval": 300.0,
+        }
+    }
+    results = list(check_nut("demo_ups", {"ups_beeper_status": "enabled"}, section))
+    age = [r for r in results if isinstance(r, Result) and "Data age" in r.summary]
+    assert len(age) == 1
+    assert age[0].state == State.WARN
+
+
+def test_check_nut_fresh_snapshot():
+    section = {
+        "demo_ups": {
+            "ups_status": "OL",
+            "ups_beeper_status": "enabled",
+            "collector_time": time.time(),
+        }
+    }
+    params = {"ups_beeper_status": "enabled", "data_age": ("fixed", (600, 1200))}
+    results = list(check_nut("demo_ups", params, section))
+    assert all(r.state == State.OK for r in results if isinstance(r, Result))
+
+
+def _trend(value_store, now, charge, status, params=None):
+    ups_data = UpsData(battery_charge=charge, ups_status=status)
+    return {
+        m.name: m.value
+        for m in check_battery_trend(params or {}, ups_data, value_store, now)
+        if isinstance(m, Metric)
+    }
+
+
+def test_battery_discharge_and_time_to_empty():
+    value_store = {}
+    assert _trend(value_store, 1000, 100.0, "OB DISCHRG") == {}
+    metrics = _trend(value_store, 1060, 99.0, "OB DISCHRG")
+    assert metrics["nut_battery_discharge_rate"] == 1.0
+    assert metrics["nut_battery_time_to_empty"] == 99 * 60
+
+    # The same snapshot again does not change the estimate
+    assert _trend(value_store, 1060, 99.0, "OB DISCHRG") == metrics
+
+    # A flat sample only pulls the smoothed rate down partly
+    metrics = _trend(value_store, 1120, 99.0, "OB DISCHRG")
+    assert 0.5 < metrics["nut_battery_discharge_rate"] < 1.0
+
+
+def test_battery_time_to_empty_levels():
+    value_store = {}
+    params = {"battery_time_to_empty": ("fixed", (900, 600))}
+    _trend(value_store, 1000, 20.0, "OB", params)
+    results = list(check_battery_trend(
+        params, UpsData(battery_charge=10.0, ups_status="OB"), value_store, 1060
+    ))
+    assert results[2] == Result(
+        state=State.CRIT, summary="Time to empty: 60 s (warn/crit below 900 s/600 s)"
+    )
+
+
+def test_battery_recharge_after_power_returns():
+    value_store = {}
+    _trend(value_store, 1000, 50.0, "OB DISCHRG")
+    _trend(value_store, 1060, 49.0, "OB DISCHRG")
+    # Power returns, the discharge is over
+    assert _trend(value_store, 1120, 49.0, "OL CHRG") == {}
+    assert _trend(value_store, 1180, 49.5, "OL CHRG") == {"nut_battery_recharge_rate": 0.5}
+    # Full again
+    assert _trend(value_store, 1240, 100.0, "OL") == {}
+
+
+def test_battery_trend_restarts_after_gap():
+    value_store = {}
+    _trend(value_store, 1000, 100.0, "OB")
+    assert _trend(value_store, 1000 + 3600, 50.0, "OB") == {}
+
+
+def test_nut_samples():
+    section = parse_nut_samples([
+        ["==>", "demo_ups", "<=="],
+        ["samples:", "12", "55"],
+        ["input.voltage:", "180", "231", "225.50"],
+        ["ups.status.transitions:", "2"],
+        ["ups.status.on_battery:", "5"],
+    ])
+    assert section["demo_ups"] == {
+        "samples": 12,
+        "span": 55,
+        "input_voltage": (180.0, 231.0, 225.5),
+        "transitions": 2,
+        "on_battery": 5,
+    }
+
+    params = {
+        "input_voltage": {"lower": ("fixed", (200, 190)), "upper": ("fixed", (245, 250))},
+        "status_transitions": ("fixed", (1, 4)),
+    }
+    results = list(check_nut_samples(params, section["demo_ups"]))
+    metrics = {m.name: m.value for m in results if isinstance(m, Metric)}
+    assert metrics == {
+        "nut_input_voltage_min": 180.0,
+        "nut_input_voltage_max": 231.0,
+        "nut_status_transitions": 2,
+        "nut_on_battery_time": 5,
+    }
+    states = [r.state for r in results if isinstance(r, Result)]
+    assert states == [State.OK, State.CRIT, State.OK, State.WARN, State.OK]
+
+
+def test_ups_status_flags():
+    assert UpsStatus.parse("OL CHRG") == UpsStatus.OL | UpsStatus.CHRG
+    assert UpsStatus.parse("OB LB FSD INVALID") == UpsStatus.OB | UpsStatus.LB | UpsStatus.FSD
+    assert UpsStatus.split("OB INVALID LB") == (UpsStatus.OB | UpsStatus.LB, ("INVALID",))
+
+
+def test_ups_status_parsed_once():
+    parsed = nut_parse([["==>", "a", "<=="], ["ups.status:", "OB", "LB", "INVALID"],
+                        ["==>", "b", "<=="], ["ups.status:", "OB", "LB", "INVALID"]])
+    assert parsed["a"].split_status() is parsed["b"].split_status()
+    assert "INVALID" not in list(parsed["a"])
+
+    results = [r for r in check_nut("a", {}, parsed) if isinstance(r, Result)]
+    assert results[:3] == [
+        Result(state=State.WARN, summary="Status: On battery (OB)"),
+        Result(state=State.CRIT, summary="Status: Low battery (LB)"),
+        Result(state=State.UNKNOWN, summary="Unknown status: INVALID"),
+    ]
+
+    merged = merge_static(parsed["a"], UpsData(ups_status="OL"))
+    assert status_flags(merged) == UpsStatus.OB | UpsStatus.LB
+
+
+def test_check_nut_alarm_and_forced_shutdown():
+    section = {"demo_ups": UpsData(ups_status="OB FSD ALARM", ups_alarm="Replace battery!")}
+    results = [r for r in check_nut("demo_ups", {}, section) if isinstance(r, Result)]
+    assert results[1:3] == [
+        Result(state=State.CRIT, summary="Status: Forced shutdown (FSD)"),
+        Result(state=State.CRIT, summary="Status: Alarm (Replace battery!)"),
+    ]
+
+
+def _transitions(value_store, now, status, params=None):
+    return {
+        m.name: m.value
+        for m in check_status_transitions(
+            params or {"flap_window": 600}, UpsData(ups_status=status), value_store, now
+        )
+        if isinstance(m, Metric)
+    }
+
+
+def test_status_transitions_flap_rate():
+    value_store = {}
+    assert _transitions(value_store, 1000, "OL") == {
+        "nut_status_transfers": 0,
+        "nut_flap_rate": 0.0,
+    }
+    _transitions(value_store, 1060, "OB DISCHRG")
+    _transitions(value_store, 1120, "OL CHRG")
+    metrics = _transitions(value_store, 1180, "OL")
+    assert metrics == {
+        "nut_status_transfers": 2,
+        "nut_flap_rate": 12.0,
+        "nut_time_since_transfer": 60,
+    }
+    # The same snapshot again changes nothing
+    assert _transitions(value_store, 1180, "OL") == metrics
+
+    # The transfers leave the window
+    metrics = _transitions(value_store, 1700, "OL")
+    assert metrics["nut_status_transfers"] == 1
+    assert _transitions(value_store, 1800, "OL")["nut_status_transfers"] == 0
+    assert _transitions(value_store, 1800, "OL")["nut_time_since_transfer"] == 680
+
+
+def test_status_transitions_levels():
+    value_store = {}
+    params = {"flap_window": 3600, "flap_rate": ("fixed", (2.0, 4.0))}
+    for idx, status in enumerate(["OL", "OB", "OL", "OB"]):
+        results = list(check_status_transitions(
+            params, UpsData(ups_status=status), value_store, 1000 + 60 * idx
+        ))
+    assert Result(
+        state=State.WARN, summary="Flap rate: 3.0/h (warn/crit at 2.0/h/4.0/h)"
+    ) in results
+
+
+def test_status_transitions_invalid_window():
+    for window in (0, -600):
+        value_store = {}
+        _transitions(value_store, 1000, "OL", {"flap_window": window})
+        metrics = _transitions(value_store, 1060, "OB", {"flap_window": window})
+        assert metrics["nut_status_transfers"] == 1
+        assert metrics["nut_flap_rate"] == 3600.0
+
+
+def test_nut_parse_three_phase():
+    string_table = [
+        ["==>", "big_ups", "<=="],
+        ["input.L1-N.voltage:", "231.0"],
+        ["input.L2-N.voltage:", "229.0"],
+        ["input.L3-N.voltage:", "230.0"],
+        ["input.L2-L3.voltage:", "398.5"],
+        ["output.L3.current:", "12.5"],
+        ["input.L1.realpower:", "2100"],
+        ["ups.status:", "OL"],
+    ]
+    ups_data = nut_parse(string_table)["big_ups"]
+    phases = ups_data["phases"]
+    assert phases["input_phase_voltage"] == [231.0, 229.0, 230.0]
+    assert phases["input_line_voltage"] == [None, 398.5, None]
+    assert phases["output_phase_current"] == [None, None, 12.5]
+    assert phases["input_phase_realpower"] == [2100.0, None, None]
+    assert "input.L1.voltage" in CONSUMED_VARIABLES
+    assert "output.L3.power.percent" in CONSUMED_VARIABLES
+
+
+def test_phase_imbalance():
+    assert phase_imbalance([230.0, 230.0, 230.0]) == 0.0
+    assert round(phase_imbalance([10.0, 20.0, None]), 1) == 33.3
+    assert phase_imbalance([10.0, None, None]) is None
+    assert phase_imbalance([0.0, 0.0, 0.0]) is None
+
+
+def test_check_nut_three_phase_levels_and_imbalance():
+    section = nut_parse([
+        ["==>", "big_ups", "<=="],
+        ["input.L1.voltage:", "230"],
+        ["input.L2.voltage:", "252"],
+        ["input.L3.voltage:", "208"],
+        ["output.L1.current:", "10"],
+        ["output.L2.current:", "11"],
+        ["ups.status:", "OL"],
+    ])
+    params = {
+        "input_voltage": {"upper": ("fixed", (245, 250))},
+        "voltage_imbalance": ("fixed", (2.0, 5.0)),
+    }
+    results = list(check_nut("big_ups", params, section))
+    metrics = {r.name: r.value for r in results if isinstance(r, Metric)}
+    assert metrics["nut_input_phase_voltage_l2"] == 252.0
+    assert round(metrics["nut_input_phase_voltage_imbalance"], 2) == 9.57
+    assert "nut_output_phase_current_l3" not in metrics
+    assert "nut_output_phase_current_imbalance" in metrics
+    summaries = {r.summary: r.state for r in results if isinstance(r, Result)}
+    assert summaries["Input voltage L2: 252.0 V (warn/crit at 245.0 V/250.0 V)"] == State.CRIT
+    assert State.CRIT in (
+        state for summary, state in summaries.items() if summary.startswith("Input voltage imbalance")
+    )
+
+
+def test_stale_data_within_grace_period():
+    params = {"stale_grace": 600, "stale_state": 1}
+    value_store = {}
+    good = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.charge:", "100"],
+        ["ups.status:", "OL"],
+        ["collector.time:", "1000"],
+    ])["demo_ups"]
+    assert check_stale(params, good, value_store, 1000) == (good, [])
+
+    failed = nut_parse([["==>", "demo_ups", "<=="], ["collector.error:", "Connection", "refused"]])
+    assert list(discover_nut(failed)) == []
+    ups_data, results = check_stale(params, failed["demo_ups"], value_store, 1300)
+    assert ups_data["battery_charge"] == 100.0
+    (result,) = results
+    assert result.state == State.WARN
+    assert result.summary.startswith("Stale data from ")
+    assert result.summary.endswith(" ago (Connection refused)")
+
+    ups_data, results = check_stale(params, failed["demo_ups"], value_store, 1700)
+    assert ups_data is None
+    assert results == [Result(state=State.UNKNOWN, summary="No data: Connection refused")]
+
+
+def _good(charge, status, collected):
+    return nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.charge:", charge],
+        ["ups.status:", status],
+        ["collector.time:", collected],
+    ])["demo_ups"]
+
+
+def test_stale_data_rewritten_on_change_or_age():
+    params = {"stale_grace": 600}
+    value_store = {}
+    check_stale(params, _good("100", "OL", "1000"), value_store, 1000)
+    assert value_store["last_good"] == (1000.0, {"battery_charge": 100.0, "ups_status": "OL"})
+
+    # Same status and a young copy: only the time of the last contact moves on
+    check_stale(params, _good("99", "OL", "1060"), value_store, 1060)
+    assert value_store["last_good"][0] == 1000.0
+    assert value_store["last_seen"] == 1060.0
+    check_stale(params, _good("98", "OL CHRG", "1120"), value_store, 1120)
+    assert value_store["last_good"] == (1120.0, {"battery_charge": 98.0, "ups_status": "OL CHRG"})
+    check_stale(params, _good("98", "OL CHRG", "1420"), value_store, 1420)
+    assert value_store["last_good"][0] == 1420.0
+
+    # The grace period starts with the last contact, the age is that of the copy
+    failed = nut_parse([["==>", "demo_ups", "<=="], ["collector.error:", "timed", "out"]])
+    check_stale(params, _good("98", "OL CHRG", "1480"), value_store, 1480)
+    ups_data, _results = check_stale(params, failed["demo_ups"], value_store, 2000)
+    assert ups_data["battery_charge"] == 98.0
+    assert "collector_time" not in ups_data
+
+    assert check_stale({"stale_grace": 0}, _good("100", "OL", "1000"), {}, 1000)[1] == []
+
+
+def test_stale_data_without_metrics():
+    section = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["battery.charge:", "100"],
+        ["ups.status:", "OL"],
+        ["collector.time:", str(time.time() - 60)],
+    ])
+    params = {"stale_grace": 600}
+    assert any(
+        isinstance(r, Metric) for r in check_nut_sections("demo_ups", params, section, None, None)
+    )
+    failed = nut_parse([["==>", "demo_ups", "<=="], ["collector.error:", "DATA-STALE"]])
+    results = list(check_nut_sections("demo_ups", params, failed, None, None))
+    assert results[0].state == State.OK
+    assert results[0].summary.startswith("Stale data from")
+    assert Result(state=State.OK, summary="Status: On line (OL)") in results
+    assert not any(isinstance(r, Metric) for r in results)
+    # The age of the stale data is not checked again against the data age levels
+    assert not any(r.summary.startswith("Data age") for r in results if isinstance(r, Result))
+
+
+def _energy(value_store, now, realpower):
+    return {
+        m.name: m.value
+        for m in check_energy(UpsData(ups_realpower=realpower), value_store, now)
+        if isinstance(m, Metric)
+    }
+
+
+def test_energy_trapezoidal():
+    value_store = {}
+    assert _energy(value_store, 1000, 400.0) == {"nut_energy": 0.0}
+    # 400 W to 800 W over half an hour is 300 Wh
+    assert _energy(value_store, 2800, 800.0) == {"nut_energy": 300.0, "nut_average_power": 600.0}
+    # The same snapshot again adds nothing
+    assert _energy(value_store, 2800, 800.0) == {"nut_energy": 300.0}
+    assert _energy(value_store, 3700, 800.0) == {"nut_energy": 500.0, "nut_average_power": 800.0}
+
+
+def test_energy_survives_gaps_and_restarts():
+    value_store = {}
+    _energy(value_store, 1000, 600.0)
+    _energy(value_store, 1600, 600.0)
+    # The agent was down for hours, the gap is not bridged
+    assert _energy(value_store, 20000, 300.0) == {"nut_energy": 100.0}
+    # The clock of the agent went backwards
+    assert _energy(value_store, 19000, 300.0) == {"nut_energy": 100.0}
+    assert _energy(value_store, 19600, 300.0) == {"nut_energy": 150.0, "nut_average_power": 300.0}
+    assert len(value_store["energy"]) == 3
+
+
+def test_energy_from_load():
+    section = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["ups.load:", "50"],
+        ["ups.realpower.nominal:", "900"],
+        ["ups.status:", "OL"],
+    ])
+    value_store = {}
+    list(check_energy(section["demo_ups"], value_store, 1000))
+    assert value_store["energy"] == (1000, 450.0, 0.0)
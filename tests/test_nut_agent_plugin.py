@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+'''Tests for the Python NUT agent plugin against a fake upsd.'''
+
+import importlib.util
+import os
+import socket
+import time
+from pathlib import Path
+
+from tests.fake_upsd import FakeUpsd
+
+_PLUGIN = Path(__file__).parent.parent / "local/share/check_mk/agents/plugins/nut.py"
+_spec = importlib.util.spec_from_file_location("nut_agent_plugin", _PLUGIN)
+nut_plugin = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(nut_plugin)
+
+UPSES = {
+    "demo_ups": {
+        "battery.charge": "100",
+        "device.model": 'Smart "UPS" 1500',
+        "ups.status": "OL CHRG",
+    },
+    "other_ups": {
+        "ups.status": "OB",
+    },
+}
+
+
+def test_split_reply():
+    line = r'VAR demo ups.model "Smart \"UPS\" 1500 \\ x"'
+    assert nut_plugin.split_reply(line) == ["VAR", "demo", "ups.model", 'Smart "UPS" 1500 \\ x']
+    assert nut_plugin.split_reply('VAR demo ups.id ""') == ["VAR", "demo", "ups.id", ""]
+
+
+def test_parse_target():
+    assert nut_plugin.parse_target("nas") == ("nas", 3493)
+    assert nut_plugin.parse_target("nas:3494") == ("nas", 3494)
+    assert nut_plugin.parse_target("[::1]:3494") == ("::1", 3494)
+    assert nut_plugin.format_target("nas", 3493) == "nas"
+    assert nut_plugin.format_target("::1", 3494) == "[::1]:3494"
+
+
+def test_read_monitor_targets(tmp_path):
+    conf = tmp_path / "upsmon.conf"
+    conf.write_text(
+        "MONITOR ups1@nas 1 monuser secret primary\n"
+        "MONITOR ups2@nas 1 monuser secret primary\n"
+        "# MONITOR ups3@commented 1 monuser secret primary\n"
+        "MONITOR ups4@10.0.0.5:3494 1 monuser secret secondary\n"
+    )
+    assert nut_plugin.read_monitor_targets(str(conf)) == [
+        ("10.0.0.5", 3494),
+        ("localhost", 3493),
+        ("nas", 3493),
+    ]
+    assert nut_plugin.read_monitor_targets(str(tmp_path / "missing")) == [("localhost", 3493)]
+
+
+def test_poll_target_single_connection():
+    with FakeUpsd(UPSES) as upsd:
+        upses = nut_plugin.poll_target("127.0.0.1", upsd.port, timeout=5)
+    assert upsd.connections == 1
+    assert upses["demo_ups"] == [
+        ("battery.charge", "100"),
+        ("device.model", 'Smart "UPS" 1500'),
+        ("ups.status", "OL CHRG"),
+    ]
+    assert upses["other_ups"] == [("ups.status", "OB")]
+
+
+def test_section_lines_match_upsc_format():
+    with FakeUpsd(UPSES) as upsd:
+        upses = nut_plugin.poll_target("127.0.0.1", upsd.port, timeout=5)
+        lines = list(nut_plugin.section_lines("127.0.0.1", upsd.port, upses))
+    assert lines == [
+        f"==> demo_ups@127.0.0.1:{upsd.port} <==",
+        "battery.charge: 100",
+        'device.model: Smart "UPS" 1500',
+        "ups.status: OL CHRG",
+        f"==> other_ups@127.0.0.1:{upsd.port} <==",
+        "ups.status: OB",
+    ]
+
+
+def test_section_lines_collector_time():
+    upses = {"demo_ups": [("ups.status", "OL")], "broken": nut_plugin.UpsdErrorReply("DATA-STALE")}
+    assert list(nut_plugin.section_lines("localhost", 3493, upses, 1700000000, 300.0)) == [
+        "==> demo_ups <==",
+        "ups.status: OL",
+        "collector.time: 1700000000",
+        "collector.interval: 300",
+        "==> broken <==",
+        "collector.error: DATA-STALE",
+    ]
+
+
+def test_list_vars_unknown_ups():
+    with FakeUpsd(UPSES) as upsd:
+        with nut_plugin.UpsdClient("127.0.0.1", upsd.port, timeout=5) as client:
+            result = client.list_vars(["missing", "other_ups"])
+    assert isinstance(result["missing"], nut_plugin.UpsdErrorReply)
+    assert result["other_ups"] == [("ups.status", "OB")]
+
+
+def test_poll_all_isolates_slow_and_dead_hosts():
+    with FakeUpsd(UPSES) as fast, FakeUpsd(UPSES, delay=2) as slow:
+        # Bind and close a socket to get a port nobody listens on
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            dead_port = sock.getsockname()[1]
+
+        started = time.monotonic()
+        results = nut_plugin.poll_all(
+            [("127.0.0.1", fast.port), ("127.0.0.1", slow.port), ("127.0.0.1", dead_port)],
+            timeout=0.5,
+            budget=5,
+        )
+        elapsed = time.monotonic() - started
+
+    assert elapsed < 1.5
+    assert [(h, p) for h, p, _ in results] == [
+        ("127.0.0.1", fast.port), ("127.0.0.1", slow.port), ("127.0.0.1", dead_port)
+    ]
+    assert results[0][2]["other_ups"] == [("ups.status", "OB")]
+    assert nut_plugin.describe_error(results[1][2]) == "timed out"
+    assert isinstance(results[2][2], OSError)
+
+
+def test_poll_all_budget():
+    def hang(host, port, timeout):
+        time.sleep(5)
+
+    started = time.monotonic()
+    results = nut_plugin.poll_all([("a", 1), ("b", 2)], timeout=10, budget=0.2, poll=hang)
+    assert time.monotonic() - started < 1
+    assert [nut_plugin.describe_error(r) for _, _, r in results] == ["budget exceeded"] * 2
+
+
+def test_load_config(tmp_path):
+    assert nut_plugin.load_config(str(tmp_path)) == nut_plugin.DEFAULT_CONFIG
+    (tmp_path / "nut.cfg").write_text("# Created by Check_MK Agent Bakery.\n[nut]\ntimeout = 2.5\n")
+    config = nut_plugin.load_config(str(tmp_path))
+    assert config["timeout"] == 2.5
+    assert config["budget"] == nut_plugin.DEFAULT_CONFIG["budget"]
+
+
+def test_collector_keeps_session_and_writes_snapshot(tmp_path, monkeypatch):
+    snapshot = tmp_path / "nut.snapshot"
+    with FakeUpsd(UPSES) as upsd:
+        monkeypatch.setattr(nut_plugin, "read_monitor_targets", lambda: [("127.0.0.1", upsd.port)])
+        collector = nut_plugin.Collector(nut_plugin.DEFAULT_CONFIG, str(snapshot))
+        collector.refresh()
+        collector.refresh()
+        assert upsd.connections == 1
+        assert upsd.requests.count("LIST UPS") == 2
+
+    lines = snapshot.read_text().splitlines()
+    assert lines[0] == "<<<nut>>>"
+    assert f"==> demo_ups@127.0.0.1:{upsd.port} <==" in lines
+    assert "ups.status: OL CHRG" in lines
+    assert not list(tmp_path.glob("*.tmp.*"))
+
+
+def test_collector_reconnects_after_failure(tmp_path, monkeypatch):
+    snapshot = tmp_path / "nut.snapshot"
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(nut_plugin, "read_monitor_targets", lambda: [("127.0.0.1", port)])
+    collector = nut_plugin.Collector(nut_plugin.DEFAULT_CONFIG, str(snapshot))
+    collector.refresh()
+    lines = snapshot.read_text().splitlines()
+    assert lines[:2] == ["<<<nut>>>", "<<<nut_errors>>>"]
+    assert lines[2].startswith(f"127.0.0.1:{port} ")
+
+
+def test_read_snapshot(tmp_path):
+    snapshot = tmp_path / "nut.snapshot"
+    assert nut_plugin.read_snapshot(str(snapshot)) is None
+    nut_plugin.write_atomically(str(snapshot), ["<<<nut>>>", "==> demo_ups <=="])
+    assert nut_plugin.read_snapshot(str(snapshot)) == "<<<nut>>>\n==> demo_ups <==\n"
+    outdated = time.time() - nut_plugin.SNAPSHOT_MAX_AGE - 1
+    os.utime(snapshot, (outdated, outdated))
+    assert nut_plugin.read_snapshot(str(snapshot)) is None
+
+
+def _static(state, refresh=3600):
+    return nut_plugin.PersistedSection("nut_static", nut_plugin.is_static, state, refresh)
+
+
+def test_static_variables_sent_on_change_only(tmp_path):
+    state = str(tmp_path / "nut.static.json")
+    results = [("localhost", 3493, {
+        "demo_ups": [
+            ("battery.charge", "100"),
+            ("driver.version", "2.8.0"),
+            ("ups.realpower.nominal", "600"),
+            ("ups.status", "OL"),
+        ],
+    })]
+
+    dynamic, lines = _static(state).split(results, 1000)
+    assert dynamic == [("localhost", 3493, {
+        "demo_ups": [("battery.charge", "100"), ("ups.status", "OL")],
+    })]
+    assert lines == [
+        "<<<nut_static:persist(8200)>>>",
+        "==> demo_ups <==",
+        "driver.version: 2.8.0",
+        "ups.realpower.nominal: 600",
+    ]
+
+    # Unchanged, a new instance reads the state file
+    _, lines = _static(state).split(results, 1060)
+    assert lines == []
+
+    # Refresh is due
+    _, lines = _static(state).split(results, 4600)
+    assert lines[0] == "<<<nut_static:persist(11800)>>>"
+
+    # Changed
+    results[0][2]["demo_ups"][1] = ("driver.version", "2.8.1")
+    _, lines = _static(state).split(results, 4660)
+    assert "driver.version: 2.8.1" in lines
+
+
+def test_static_variables_keep_failed_hosts(tmp_path):
+    state = str(tmp_path / "nut.static.json")
+    ok = ("nas", 3493, {"demo_ups": [("device.model", "Back-UPS")]})
+    failed = ("nas", 3493, OSError("timed out"))
+    other = ("localhost", 3493, {"local_ups": [("device.model", "Smart-UPS")]})
+
+    _static(state).split([ok, other], 1000)
+    dynamic, lines = _static(state).split([failed, other], 5000)
+    assert dynamic[0] == failed
+    assert "==> demo_ups@nas <==" in lines
+    assert "device.model: Back-UPS" in lines
+
+    # Gone for more than two refresh periods
+    _, lines = _static(state).split([failed, other], 9000)
+    assert "==> demo_ups@nas <==" not in lines
+
+
+def test_is_static():
+    assert nut_plugin.is_static("driver.parameter.port")
+    assert nut_plugin.is_static("input.voltage.nominal")
+    assert nut_plugin.is_static("battery.charge.low")
+    assert not nut_plugin.is_static("battery.charge")
+    assert not nut_plugin.is_static("ups.status")
+    assert not nut_plugin.is_static("ups.load")
+
+
+def test_filter_variables():
+    allowed = nut_plugin.variable_filter(["battery.charge", "input.*", "ups.status"])
+    results = [
+        ("localhost", 3493, {
+            "demo_ups": [
+                ("battery.charge", "100"),
+                ("battery.charge.low", "10"),
+                ("driver.parameter.port", "auto"),
+                ("input.voltage", "230"),
+                ("input.frequency", "50"),
+                ("ups.status", "OL"),
+            ],
+            "broken": nut_plugin.UpsdErrorReply("DATA-STALE"),
+        }),
+        ("nas", 3493, OSError("timed out")),
+    ]
+    filtered = nut_plugin.filter_variables(results, allowed)
+    assert filtered[0][2]["demo_ups"] == [
+        ("battery.charge", "100"),
+        ("input.voltage", "230"),
+        ("input.frequency", "50"),
+        ("ups.status", "OL"),
+    ]
+    assert filtered[0][2]["broken"] is results[0][2]["broken"]
+    assert filtered[1] == results[1]
+
+
+def test_load_config_variables(tmp_path):
+    (tmp_path / "nut.cfg").write_text("[nut]\nvariables = battery.charge ups.status\n")
+    assert nut_plugin.load_config(str(tmp_path))["variables"] == ["battery.charge", "ups.status"]
+
+
+def test_inventory_section(tmp_path, monkeypatch):
+    monkeypatch.setattr(nut_plugin, "default_vardir", lambda: str(tmp_path))
+    config = dict(nut_plugin.DEFAULT_CONFIG, inventory_interval=14400)
+    results = [("localhost", 3493, {
+        "demo_ups": [("device.model", "Back-UPS"), ("ups.serial", "AS123"), ("ups.status", "OL")],
+    })]
+
+    remaining, lines = nut_plugin.inventory_section(config).split(results, 1000)
+    assert remaining[0][2]["demo_ups"] == [("ups.status", "OL")]
+    assert lines == [
+        "<<<nut_inventory:persist(29800)>>>",
+        "==> demo_ups <==",
+        "device.model: Back-UPS",
+        "ups.serial: AS123",
+    ]
+    _, lines = nut_plugin.inventory_section(config).split(results, 1060)
+    assert lines == []
+
+
+def test_collector_inventory_section(tmp_path, monkeypatch):
+    monkeypatch.setattr(nut_plugin, "default_vardir", lambda: str(tmp_path))
+    snapshot = tmp_path / "nut.snapshot"
+    state = tmp_path / nut_plugin.INVENTORY_STATE_FILE
+    clock = [1000.0]
+    monkeypatch.setattr(nut_plugin.time, "time", lambda: clock[0])
+    with FakeUpsd({"demo_ups": {"device.model": "Back-UPS", "ups.status": "OL"}}) as upsd:
+        monkeypatch.setattr(nut_plugin, "read_monitor_targets", lambda: [("127.0.0.1", upsd.port)])
+        config = dict(nut_plugin.DEFAULT_CONFIG, inventory_interval=14400)
+        collector = nut_plugin.Collector(config, str(snapshot))
+        collector.refresh()
+        assert "<<<nut_inventory:persist(29800)>>>" in snapshot.read_text().splitlines()
+        written = state.stat().st_mtime_ns
+
+        # Unchanged: kept in the snapshots the agent may read, the state is not rewritten
+        clock[0] += 60
+        collector.refresh()
+        assert "<<<nut_inventory:persist(29800)>>>" in snapshot.read_text().splitlines()
+        assert state.stat().st_mtime_ns == written
+
+        clock[0] += nut_plugin.SNAPSHOT_MAX_AGE
+        collector.refresh()
+        assert "nut_inventory" not in snapshot.read_text()
+
+
+def test_poll_all_bounded_workers():
+    running = []
+    peak = []
+
+    def poll(host, port, timeout):
+        running.append(port)
+        peak.append(len(running))
+        time.sleep(0.05)
+        running.remove(port)
+        return {}
+
+    results = nut_plugin.poll_all(
+        [("h", p) for p in range(10)], timeout=1, budget=5, poll=poll, workers=3
+    )
+    assert max(peak) <= 3
+    assert [r for _, _, r in results] == [{}] * 10
+
+
+def test_get_vars():
+    with FakeUpsd(UPSES) as upsd:
+        with nut_plugin.UpsdClient("127.0.0.1", upsd.port, timeout=5) as client:
+            result = client.get_vars(["demo_ups", "other_ups"], ("ups.status", "battery.charge"))
+    assert result == {
+        "demo_ups": [("ups.status", "OL CHRG"), ("battery.charge", "100")],
+        "other_ups": [("ups.status", "OB")],
+    }
+
+
+def test_sample_buffer_summary():
+    buffer = nut_plugin.SampleBuffer(interval=5, window=20)
+    for now, voltage, status in [
+        (1000, "230", "OL"),
+        (1005, "228", "OL"),
+        (1010, "180", "OB"),
+        (1015, "229", "OL"),
+        (1020, "231", "OL"),
+    ]:
+        buffer.add([("localhost", 3493, {
+            "demo_ups": [("input.voltage", voltage), ("ups.load", "40"), ("ups.status", status)],
+        })], now)
+    # The ring buffer keeps the last four samples only
+    assert list(buffer.summary_lines()) == [
+        "<<<nut_samples>>>",
+        "==> demo_ups <==",
+        "samples: 4 15",
+        "input.voltage: 180 231 217.00",
+        "ups.load: 40 40 40.00",
+        "ups.status.transitions: 2",
+        "ups.status.on_battery: 5",
+    ]
+
+    # The time on battery follows the timestamps, a refresh adds samples in between
+    for now, status in [(1022, "OB"), (1023.5, "OB"), (1025, "OL")]:
+        buffer.add([("localhost", 3493, {"demo_ups": [("ups.status", status)]})], now)
+    assert list(buffer.summary_lines())[-1] == "ups.status.on_battery: 3"
+
+    # Gone UPSes are forgotten after the window
+    buffer.add([("localhost", 3493, {})], 1100)
+    assert list(buffer.summary_lines()) == ["<<<nut_samples>>>"]
+
+
+def test_collector_samples(tmp_path, monkeypatch):
+    snapshot = tmp_path / "nut.snapshot"
+    config = dict(nut_plugin.DEFAULT_CONFIG, sample_interval=5.0)
+    with FakeUpsd(UPSES) as upsd:
+        monkeypatch.setattr(nut_plugin, "read_monitor_targets", lambda: [("127.0.0.1", upsd.port)])
+        collector = nut_plugin.Collector(config, str(snapshot))
+        collector.refresh()
+        upsd.upses["other_ups"]["ups.status"] = "OL"
+        collector.sample()
+        collector.refresh()
+        assert upsd.connections == 1
+        assert "GET VAR other_ups ups.status" in upsd.requests
+
+    lines = snapshot.read_text().splitlines()
+    section = lines[lines.index("<<<nut_samples>>>"):]
+    other = section.index(f"==> other_ups@127.0.0.1:{upsd.port} <==")
+    assert section[other + 1].startswith("samples: 3 ")
+    # On battery from the first refresh up to the sample right after it
+    assert section[other + 2:other + 4] == [
+        "ups.status.transitions: 1",
+        "ups.status.on_battery: 0",
+    ]
+    assert collector._upses == {("127.0.0.1", upsd.port): list(UPSES)}
+
+
+def test_read_targets(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        nut_plugin, "read_monitor_targets",
+        lambda include_localhost=True: ([("localhost", 3493)] if include_localhost else []) + [("nas", 3493)],
+    )
+    # Without targets file the servers are discovered
+    assert nut_plugin.read_targets(str(tmp_path)) == ([("localhost", 3493), ("nas", 3493)], {})
+
+    (tmp_path / "nut_targets.cfg").write_text(
+        "# Created by Check_MK Agent Bakery.\n"
+        "ups1.example.com\n"
+        "10.0.0.5:3494 2.5\n"
+        "\n"
+        "@upsmon\n"
+    )
+    targets, timeouts = nut_plugin.read_targets(str(tmp_path))
+    assert targets == [("10.0.0.5", 3494), ("nas", 3493), ("ups1.example.com", 3493)]
+    assert timeouts == {("10.0.0.5", 3494): 2.5}
+
+
+def test_main_uses_targets_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(nut_plugin, "read_monitor_targets", lambda **_: [("localhost", 1)])
+    polled = []
+
+    def poll(host, port, timeout=None):
+        polled.append((host, port, timeout))
+        return {}
+
+    monkeypatch.setattr(nut_plugin, "poll_target", poll)
+    monkeypatch.setenv("MK_CONFDIR", str(tmp_path))
+    monkeypatch.setenv("MK_VARDIR", str(tmp_path))
+    (tmp_path / "nut_targets.cfg").write_text("nas 1.5\nbackup:3494\n")
+    assert nut_plugin.main(["--snapshot", str(tmp_path / "nut.snapshot")]) == 0
+    assert sorted(polled) == [("backup", 3494, 5.0), ("nas", 3493, 1.5)]
+    assert capsys.readouterr().out.startswith("<<<nut>>>")
+
+
+def test_failed_server_lists_known_upses(tmp_path):
+    state = str(tmp_path / "nut.upses.json")
+    results = [("localhost", 3493, {"demo_ups": [("ups.status", "OL")]}), ("nas", 3494, {})]
+    assert nut_plugin.remember_upses(state, results) == {"localhost": ["demo_ups"], "nas:3494": []}
+
+    # nas is no longer polled, localhost fails and keeps its UPSes
+    results = [("localhost", 3493, socket.timeout("timed out"))]
+    known = nut_plugin.remember_upses(state, results)
+    assert known == {"localhost": ["demo_ups"]}
+    assert list(nut_plugin.render_output(results, 1700000000, None, known)) == [
+        "<<<nut>>>",
+        "==> demo_ups <==",
+        "collector.error: timed out",
+        "<<<nut_errors>>>",
+        "localhost timed out",
+    ]
+
+
+def test_piggyback_lines():
+    lines = [
+        "<<<nut>>>",
+        "==> demo_ups <==",
+        "ups.status: OL",
+        "==> other_ups@nas:3494 <==",
+        "ups.status: OB",
+        "<<<nut_errors>>>",
+        "backup timed out",
+        "<<<nut_static:persist(1700000600)>>>",
+        "==> demo_ups <==",
+        "battery.packs: 2",
+    ]
+    assert nut_plugin.piggyback_lines(lines) == [
+        "<<<nut_errors>>>",
+        "backup timed out",
+        "<<<<demo_ups>>>>",
+        "<<<nut>>>",
+        "==> demo_ups <==",
+        "ups.status: OL",
+        "<<<nut_static:persist(1700000600)>>>",
+        "==> demo_ups <==",
+        "battery.packs: 2",
+        "<<<<>>>>",
+        "<<<<other_ups_nas_3494>>>>",
+        "<<<nut>>>",
+        "==> other_ups@nas:3494 <==",
+        "ups.status: OB",
+        "<<<<>>>>",
+    ]
+
+
+def test_load_config_piggyback(tmp_path):
+    assert nut_plugin.load_config(str(tmp_path))["piggyback"] is False
+    (tmp_path / "nut.cfg").write_text("[nut]\npiggyback = yes\n")
+    assert nut_plugin.load_config(str(tmp_path))["piggyback"] is True
+
+
+def test_agent_stats():
+    with FakeUpsd(UPSES) as upsd:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            dead_port = sock.getsockname()[1]
+        stats = {}
+        results = nut_plugin.poll_all(
+            [("127.0.0.1", upsd.port), ("127.0.0.1", dead_port)], timeout=1, budget=5, stats=stats
+        )
+    good = stats[("127.0.0.1", upsd.port)]
+    assert 0 <= good["connect_time"] <= good["response_time"]
+    assert good["bytes"] > 0
+
+    lines = list(nut_plugin.agent_stats_lines(results, stats))
+    assert lines[0] == "<<<nut_agent_stats>>>"
+    fields = lines[1].split()
+    assert fields[0] == "127.0.0.1:%d" % upsd.port
+    assert fields[3:] == ["2", "4", str(good["bytes"])]
+    fields = lines[2].split(None, 6)
+    assert fields[1] == "-"
+    assert fields[3:6] == ["-", "-", "0"]
+    assert "refused" in fields[6].lower()
+
+
+def test_agent_stats_ups_errors():
+    results = [("localhost", 3493, {"demo_ups": [], "broken": nut_plugin.UpsdErrorReply("DATA-STALE")})]
+    assert list(nut_plugin.agent_stats_lines(results, {})) == [
+        "<<<nut_agent_stats>>>",
+        "localhost - - 2 0 0 broken: DATA-STALE",
+    ]
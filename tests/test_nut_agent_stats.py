@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+'''Tests for the statistics of the queries of the upsd servers.'''
+
+from cmk.agent_based.v2 import Metric, Result, Service, State
+from plugins.nut.agent_based.nut_agent_stats import (
+    TargetStats,
+    check_nut_agent_stats,
+    check_plugin_nut_agent_stats,
+    discover_nut_agent_stats,
+    parse_nut_agent_stats,
+    parse_nut_errors,
+)
+from plugins.nut.graphing import nut as graphing
+from plugins.nut.rulesets.nut_agent_stats import rule_spec_nut_agent_stats
+
+SECTION = parse_nut_agent_stats([
+    ["localhost", "0.0012", "0.0410", "2", "84", "5120"],
+    ["nas:3494", "-", "5.0021", "-", "-", "0", "timed", "out"],
+    ["backup", "0.0300", "2.5000", "3", "90", "6000", "ups2:", "DATA-STALE"],
+])
+
+
+def test_parse():
+    assert SECTION["localhost"] == TargetStats(0.0012, 0.041, 2, 84, 5120, None)
+    assert SECTION["nas:3494"] == TargetStats(None, 5.0021, None, None, 0, "timed out")
+    assert SECTION["backup"].error == "ups2: DATA-STALE"
+    assert list(discover_nut_agent_stats(SECTION, None)) == [
+        Service(item="localhost"), Service(item="nas:3494"), Service(item="backup")
+    ]
+
+
+def test_check_healthy_server():
+    params = check_plugin_nut_agent_stats.check_default_parameters
+    results = list(check_nut_agent_stats("localhost", params, SECTION, None))
+    metrics = {r.name: r.value for r in results if isinstance(r, Metric)}
+    assert metrics == {
+        "nut_agent_connect_time": 0.0012,
+        "nut_agent_response_time": 0.041,
+        "nut_agent_upses": 2,
+        "nut_agent_variables": 84,
+        "nut_agent_bytes": 5120,
+    }
+    assert all(r.state == State.OK for r in results if isinstance(r, Result))
+    for name in metrics:
+        assert getattr(graphing, f"metric_{name}").name == name
+
+
+def test_check_failed_and_slow_servers():
+    params = {**check_plugin_nut_agent_stats.check_default_parameters, "error_state": 1}
+    results = list(check_nut_agent_stats("nas:3494", params, SECTION, None))
+    assert results[0] == Result(state=State.WARN, summary="Error: timed out")
+    assert any(r.state == State.CRIT for r in results if isinstance(r, Result))
+
+    results = list(check_nut_agent_stats("backup", {"upses": ("fixed", (4, 2))}, SECTION, None))
+    states = [r.state for r in results if isinstance(r, Result)]
+    assert states[0] == State.CRIT
+    assert State.WARN in states
+
+    results = list(check_nut_agent_stats("gone", params, SECTION, None))
+    assert results == [Result(state=State.UNKNOWN, summary="Could not find data in output")]
+
+
+def test_rule():
+    elements = rule_spec_nut_agent_stats.parameter_form().elements
+    assert elements["response_time"].parameter_form.prefill_fixed_levels.value == (2.0, 4.0)
+    assert set(elements) == {"connect_time", "response_time", "upses", "error_state"}
+
+
+def test_nut_errors_without_stats():
+    errors = parse_nut_errors([["nas:3494", "timed", "out"], ["backup", "Connection", "refused"]])
+    assert errors == {"nas:3494": "timed out", "backup": "Connection refused"}
+    assert sorted(s.item for s in discover_nut_agent_stats(None, errors)) == ["backup", "nas:3494"]
+
+    params = check_plugin_nut_agent_stats.check_default_parameters
+    assert list(check_nut_agent_stats("nas:3494", params, None, errors)) == [
+        Result(state=State.CRIT, summary="Error: timed out")
+    ]
+    # The error of nut_agent_stats is not reported twice
+    results = list(check_nut_agent_stats("nas:3494", params, SECTION, errors))
+    assert [r for r in results if isinstance(r, Result) and r.summary.startswith("Error")] == [
+        Result(state=State.CRIT, summary="Error: timed out")
+    ]
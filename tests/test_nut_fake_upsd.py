@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+'''Load and failure tests of the agent plugin against the fake upsd.'''
+
+import socket
+
+from tests.agent_output import generate_upses
+from tests.fake_upsd import FakeUpsd
+from tests.test_nut_agent_plugin import nut_plugin
+
+
+def _ask(port, *requests):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall("".join(r + "\n" for r in requests).encode("utf-8"))
+        reader = sock.makefile("r")
+        return [reader.readline().rstrip("\n") for _ in requests]
+
+
+def test_get_var_and_errors():
+    with FakeUpsd(generate_upses(2)) as upsd:
+        assert _ask(
+            upsd.port,
+            "GET VAR ups00001 ups.status",
+            "GET VAR ups00001 ups.nothing",
+            "GET VAR missing ups.status",
+            "LIST VAR",
+            "FOO",
+        ) == [
+            'VAR ups00001 ups.status "OL CHRG"',
+            "ERR VAR-NOT-SUPPORTED",
+            "ERR UNKNOWN-UPS",
+            "ERR INVALID-ARGUMENT",
+            "ERR UNKNOWN-COMMAND",
+        ]
+
+
+def test_thousands_of_upses():
+    upses = generate_upses(2000)
+    with FakeUpsd(upses) as upsd:
+        result = nut_plugin.poll_target("127.0.0.1", upsd.port, timeout=30)
+    assert upsd.connections == 1
+    assert len(result) == 2000
+    assert dict(result["ups00009"])["ups.status"] == "OB DISCHRG"
+    assert all(len(v) == len(upses["ups00000"]) for v in result.values())
+
+
+def test_dropped_connections_are_reported():
+    with FakeUpsd(generate_upses(5), drop_rate=1.0) as upsd:
+        results = nut_plugin.poll_all([("127.0.0.1", upsd.port)], timeout=5, budget=10)
+    assert upsd.drops == 1
+    assert nut_plugin.describe_error(results[0][2]) == "connection closed by upsd"
+
+
+def test_slow_ups_times_out_alone():
+    slow = {"ups00001": 2.0}
+    with FakeUpsd(generate_upses(3), slow_upses=slow) as slow_upsd, \
+            FakeUpsd(generate_upses(3)) as fast_upsd:
+        results = nut_plugin.poll_all(
+            [("127.0.0.1", slow_upsd.port), ("127.0.0.1", fast_upsd.port)],
+            timeout=0.5,
+            budget=5,
+        )
+    assert nut_plugin.describe_error(results[0][2]) == "timed out"
+    assert len(results[1][2]) == 3
@@ -49,3 +49,46 @@ def test_perfometer_nut_definition():
     assert isinstance(fr, FocusRange)
     assert fr.lower.value == 0
     assert fr.upper.value == 100
+
+
+def test_power_metrics_and_graph():
+    assert nut.metric_nut_ups_realpower.unit.notation.symbol == "W"
+    assert nut.metric_nut_ups_power.unit.notation.symbol == "VA"
+    assert nut.metric_nut_ups_realpower_headroom.unit.notation.symbol == "W"
+    graph = nut.graph_nut_ups_power
+    assert list(graph.compound_lines) == ["nut_ups_realpower", "nut_ups_realpower_headroom"]
+    assert list(graph.simple_lines) == ["nut_ups_power"]
+
+
+def test_battery_trend_metrics_and_graphs():
+    assert nut.metric_nut_battery_discharge_rate.unit.notation.symbol == "%/min"
+    assert nut.metric_nut_battery_recharge_rate.unit.notation.symbol == "%/min"
+    assert list(nut.graph_nut_battery_time.simple_lines) == [
+        "nut_battery_runtime", "nut_battery_time_to_empty"
+    ]
+
+
+def test_three_phase_metrics_and_graphs():
+    assert nut.metric_nut_input_phase_voltage_l1.title == Title("Input voltage L1")
+    assert nut.metric_nut_input_line_voltage_l2_l3.title == Title("Input voltage L2-L3")
+    assert nut.metric_nut_output_phase_current_imbalance.unit.notation.symbol == "%"
+    graph = nut.graph_nut_output_phase_current
+    assert list(graph.simple_lines) == [
+        "nut_output_phase_current_l1", "nut_output_phase_current_l2", "nut_output_phase_current_l3"
+    ]
+    assert list(graph.optional) == ["nut_output_phase_current_l2", "nut_output_phase_current_l3"]
+
+
+def test_energy_metrics_and_graphs():
+    assert nut.metric_nut_energy.unit.notation.symbol == "Wh"
+    assert nut.metric_nut_average_power.unit.notation.symbol == "W"
+    assert list(nut.graph_nut_energy.simple_lines) == ["nut_energy"]
+    assert list(nut.graph_nut_average_power.simple_lines) == [
+        "nut_average_power", "nut_ups_realpower"
+    ]
+
+
+def test_existing_metric_units():
+    assert nut.metric_nut_input_frequency.unit.notation.symbol == "1/s"
+    assert nut.metric_nut_input_frequency_min.unit.notation.symbol == "1/s"
+    assert nut.metric_nut_ups_temperature.unit.notation.symbol == "C"
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''Tests for the NUT redundancy group and summary checks.'''
+
+from cmk.agent_based.v2 import Metric, Result, Service, State
+from plugins.nut.agent_based.nut import UpsData
+from plugins.nut.agent_based.nut_groups import (
+    aggregate,
+    check_nut_group,
+    check_nut_summary,
+    discover_nut_group,
+    discover_nut_summary,
+    n1_load,
+)
+from plugins.nut.rulesets.nut_groups import rule_spec_nut_groups
+
+SECTION = {
+    "rack1-a": UpsData(
+        ups_status="OL", ups_load=40.0, ups_realpower=400.0, ups_realpower_nominal=1000.0,
+        battery_runtime=1800.0, battery_charge=100.0,
+    ),
+    "rack1-b": UpsData(
+        ups_status="OB DISCHRG", ups_load=45.0, ups_realpower=450.0,
+        ups_realpower_nominal=1000.0, battery_runtime=900.0, battery_charge=80.0,
+    ),
+    "rack2-a": UpsData(ups_status="OL", ups_load=70.0),
+    "rack2-b": UpsData(ups_status="OL", ups_load=60.0),
+}
+RULES = [{
+    "groups": [
+        {"name": "rack1", "members": ["rack1-"]},
+        {"name": "rack2", "members": ["rack2-"]},
+        {"name": "rack3", "members": ["rack3-"]},
+    ],
+    "host_summary": True,
+}]
+
+
+def _metrics(results):
+    return {r.name: r.value for r in results if isinstance(r, Metric)}
+
+
+def test_discovery():
+    assert list(discover_nut_group(RULES, SECTION, None)) == [
+        Service(item="rack1", parameters={"members": ["rack1-"]}),
+        Service(item="rack2", parameters={"members": ["rack2-"]}),
+    ]
+    assert list(discover_nut_summary(RULES, SECTION, None)) == [Service()]
+    assert not list(discover_nut_summary([{}], SECTION, None))
+
+
+def test_aggregate_and_n1_load():
+    summary = aggregate(sorted(SECTION.items()))
+    assert summary["on_battery"] == ["rack1-b"]
+    assert summary["runtime"] == (900.0, "rack1-b")
+    assert summary["realpower"] is None
+    assert summary["load"] == 215.0
+
+    # 850 W on the 1000 W left if one UPS fails
+    rack1 = aggregate((n, d) for n, d in SECTION.items() if n.startswith("rack1"))
+    assert n1_load(rack1) == 85.0
+    # Without watts the UPSes are taken as equal: 130% of one UPS
+    rack2 = aggregate((n, d) for n, d in SECTION.items() if n.startswith("rack2"))
+    assert n1_load(rack2) == 130.0
+    assert n1_load(aggregate([("rack1-a", SECTION["rack1-a"])])) is None
+
+
+def test_check_group():
+    params = {"members": ["rack1-"], "n1_load": ("fixed", (80.0, 100.0)), "n1_state": 2}
+    results = list(check_nut_group("rack1", params, SECTION, None))
+    assert _metrics(results) == {
+        "nut_fleet_on_battery": 1,
+        "nut_fleet_runtime_min": 900.0,
+        "nut_fleet_charge_min": 80.0,
+        "nut_fleet_realpower": 850.0,
+        "nut_fleet_n1_load": 85.0,
+    }
+    assert results[-1] == Result(state=State.OK, summary="N-1 redundancy holds")
+
+    results = list(check_nut_group("rack2", dict(params, members=["rack2-"]), SECTION, None))
+    assert results[-1] == Result(state=State.CRIT, summary="N-1 redundancy lost")
+
+    results = list(check_nut_group("gone", dict(params, members=["gone-"]), SECTION, None))
+    assert results[0].state == State.UNKNOWN
+
+
+def test_check_group_members_without_data():
+    params = {"members": ["rack2-"], "n1_state": 2}
+    section = dict(
+        SECTION,
+        **{"rack2-c": UpsData(ups_status="OL", ups_load=20.0)},
+        **{"rack2-b": UpsData(collector_error="Driver not connected")},
+    )
+    results = list(check_nut_group("rack2", params, section, None))
+    assert Result(state=State.OK, summary="UPSes: 2") in results
+    assert Result(
+        state=State.WARN, summary="1 of 3 members without data: rack2-b"
+    ) in results
+    # Evaluated over the UPSes with data: 90% of one of the remaining UPSes
+    assert _metrics(results)["nut_fleet_n1_load"] == 90.0
+    assert results[-1] == Result(state=State.OK, summary="N-1 redundancy holds")
+
+    # With one UPS left, only the missing data is reported
+    section = dict(SECTION, **{"rack2-b": UpsData(collector_error="timed out")})
+    results = list(check_nut_group("rack2", params, section, None))
+    assert {r.state for r in results if isinstance(r, Result)} == {State.OK, State.WARN}
+
+    results = list(check_nut_summary({}, section, None))
+    assert _metrics(results)["nut_fleet_ups_count"] == 3
+    assert Result(state=State.WARN, summary="1 of 4 members without data: rack2-b") in results
+
+
+def test_check_summary():
+    results = list(check_nut_summary({}, SECTION, None))
+    assert _metrics(results)["nut_fleet_ups_count"] == 4
+    assert _metrics(results)["nut_fleet_load"] == 215.0
+
+    low = dict(SECTION, ups9=UpsData(ups_status="OB LB"))
+    results = list(check_nut_summary({}, low, None))
+    assert Result(state=State.CRIT, summary="Low battery: ups9") in results
+
+
+def test_groups_rule():
+    form = rule_spec_nut_groups.parameter_form()
+    assert set(form.elements) == {"groups", "host_summary"}
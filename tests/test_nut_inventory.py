@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''Tests for the NUT HW/SW inventory plugin.'''
+
+from cmk.agent_based.v2 import TableRow
+from plugins.nut.agent_based.inventory_nut import inventory_nut, parse_nut_inventory
+
+STRING_TABLE = [
+    ["==>", "demo_ups", "<=="],
+    ["battery.date:", "2023/05/12"],
+    ["device.mfr:", "APC"],
+    ["device.model:", "Back-UPS", "XS", "700U"],
+    ["driver.name:", "usbhid-ups"],
+    ["driver.version:", "2.8.0"],
+    ["ups.mfr:", "American", "Power", "Conversion"],
+    ["ups.serial:", "4B1234P56789"],
+    ["==>", "nas_ups@nas", "<=="],
+    ["ups.model:", "Smart-UPS", "1500"],
+]
+
+
+def test_parse_nut_inventory():
+    section = parse_nut_inventory(STRING_TABLE)
+    assert section["demo_ups"]["device.model"] == "Back-UPS XS 700U"
+    assert section["nas_ups@nas"] == {"ups.model": "Smart-UPS 1500"}
+
+
+def test_inventory_nut():
+    assert list(inventory_nut(parse_nut_inventory(STRING_TABLE))) == [
+        TableRow(
+            path=["hardware", "ups"],
+            key_columns={"name": "demo_ups"},
+            inventory_columns={
+                "manufacturer": "APC",
+                "model": "Back-UPS XS 700U",
+                "serial": "4B1234P56789",
+                "driver": "usbhid-ups",
+                "driver_version": "2.8.0",
+                "battery_date": "2023/05/12",
+            },
+        ),
+        TableRow(
+            path=["hardware", "ups"],
+            key_columns={"name": "nas_ups@nas"},
+            inventory_columns={"model": "Smart-UPS 1500"},
+        ),
+    ]
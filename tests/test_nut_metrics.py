@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+'''Tests for the metric registry of the NUT plugin in Checkmk.'''
+
+from cmk.agent_based.v2 import Metric, Result, State
+from cmk.rulesets.v1.form_specs import SimpleLevels
+from plugins.nut.agent_based.nut import UpsData, check_nut, check_plugin_nut, nut_parse
+from plugins.nut.graphing import nut as graphing
+from plugins.nut.lib.metrics import (
+    METRICS,
+    METRICS_BY_NAME,
+    METRICS_BY_VARIABLE,
+    PHASE_QUANTITIES,
+    default_levels,
+)
+from plugins.nut.rulesets.nut import _parameter_valuespec_nut
+
+
+def test_registry_lookup_tables():
+    assert len(METRICS_BY_NAME) == len(METRICS)
+    assert METRICS_BY_VARIABLE["input.current"].name == "input_current"
+    assert "ups_realpower_headroom" in METRICS_BY_NAME
+    assert all(metric.variable != "ups.realpower.nominal" for metric in METRICS)
+
+
+def test_every_metric_has_graphing_and_ruleset_entries():
+    elements = _parameter_valuespec_nut().elements
+    for metric in METRICS:
+        graph_metric = getattr(graphing, f"metric_nut_{metric.name}")
+        assert graph_metric.name == f"nut_{metric.name}"
+        if metric.lower and metric.upper:
+            assert set(elements[metric.name].parameter_form.elements) == {"lower", "upper"}
+        else:
+            assert isinstance(elements[metric.name].parameter_form, SimpleLevels)
+    for quantity in PHASE_QUANTITIES:
+        names = [f"nut_{quantity.name}_{p.lower().replace('-', '_')}" for p in quantity.phases]
+        for name in names:
+            assert getattr(graphing, f"metric_{name}").name == name
+        assert list(getattr(graphing, f"graph_nut_{quantity.name}").simple_lines) == names
+        if quantity.imbalance:
+            assert getattr(graphing, f"metric_nut_{quantity.name}_imbalance")
+            assert quantity.imbalance in elements
+
+
+def test_default_levels_match_plugin():
+    defaults = default_levels()
+    assert defaults["battery_voltage"] == ("fixed", (10, 5))
+    assert defaults["input_frequency"]["upper"] == ("fixed", (51, 55))
+    assert "input_current" not in defaults
+    for key, value in defaults.items():
+        assert check_plugin_nut.check_default_parameters[key] == value
+
+
+def test_parse_and_check_additional_variables():
+    parsed = nut_parse([
+        ["==>", "demo_ups", "<=="],
+        ["input.current:", "3.2"],
+        ["output.current:", "2.9"],
+        ["output.frequency:", "50.1"],
+        ["battery.temperature:", "41.5"],
+        ["ups.status:", "OL"],
+    ])
+    assert parsed["demo_ups"]["input_current"] == 3.2
+    assert "input_current" not in UpsData.FIELDS
+
+    params = {"battery_temperature": ("fixed", (35, 40))}
+    results = list(check_nut("demo_ups", params, parsed))
+    metrics = {r.name: r.value for r in results if isinstance(r, Metric)}
+    assert metrics["nut_input_current"] == 3.2
+    assert metrics["nut_output_frequency"] == 50.1
+    assert any(
+        r.state == State.CRIT and "Battery temperature" in r.summary
+        for r in results if isinstance(r, Result)
+    )
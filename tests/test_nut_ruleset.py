@@ -63,3 +63,13 @@ def test_rule_spec_nut():
     ub = param_form.elements.get("ups_beeper_status")
     choices = {e.name for e in ub.parameter_form.elements}
     assert choices == {"enabled", "disabled", "ignore"}
+
+
+def test_existing_element_titles():
+    elements = _parameter_valuespec_nut().elements
+    assert elements["battery_charge"].parameter_form.title == "Battery charge"
+    assert elements["input_voltage_fault"].parameter_form.title == "Input voltage fault"
+    load = elements["ups_load"].parameter_form
+    assert load.title == "UPS load"
+    assert load.elements["upper"].parameter_form.title == "Upper load threshold"
+    assert elements["ups_temperature"].parameter_form.title == "Temperature (upper threshold)"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+'''Tests for the NUT special agent and its command line.'''
+
+from cmk.server_side_calls.v1 import HostConfig, Secret
+from plugins.nut.lib.upsd import UpsdErrorReply, poll_target
+from plugins.nut.rulesets.special_agent import rule_spec_special_agent_nut
+from plugins.nut.server_side_calls.special_agent import special_agent_nut
+from plugins.nut.special_agent.agent_nut import main
+from tests.fake_upsd import FakeUpsd
+
+UPSES = {"demo_ups": {"battery.charge": "100", "ups.status": "OL"}}
+
+
+def test_special_agent_rule():
+    param_form = rule_spec_special_agent_nut.parameter_form()
+    assert param_form.elements["endpoints"].required is True
+    assert param_form.elements["max_connections"].parameter_form.prefill.value == 50
+
+
+def test_commands_function():
+    secret = Secret(1)
+    params = {
+        "endpoints": [
+            {"host": "nas", "port": 3493},
+            {"host": "fe80::1", "port": 3494, "timeout": 2.0},
+        ],
+        "username": "monuser",
+        "password": secret,
+        "max_connections": 20,
+    }
+    (command,) = special_agent_nut(params, HostConfig(name="ups-site"))
+    assert command.command_arguments == [
+        "--max-connections", "20",
+        "--timeout-for", "[fe80::1]:3494=2.0",
+        "--username", "monuser",
+        "--password-id", secret,
+        "nas:3493",
+        "[fe80::1]:3494",
+    ]
+
+
+def test_special_agent_output(capsys):
+    with FakeUpsd(UPSES) as upsd, FakeUpsd(UPSES, delay=2) as slow:
+        assert main(
+            [
+                f"127.0.0.1:{upsd.port}",
+                f"127.0.0.1:{slow.port}",
+                "--timeout-for", f"127.0.0.1:{slow.port}=0.2",
+                "--max-connections", "1",
+            ]
+        ) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "<<<nut>>>"
+    assert f"==> demo_ups@127.0.0.1:{upsd.port} <==" in lines
+    assert "ups.status: OL" in lines
+    errors = lines.index("<<<nut_errors>>>")
+    assert lines[errors + 1] == f"127.0.0.1:{slow.port} timed out"
+    stats = {
+        line.split()[0]: line.split()[1:]
+        for line in lines[lines.index("<<<nut_agent_stats>>>") + 1:]
+    }
+    assert stats[f"127.0.0.1:{upsd.port}"][2:4] == ["1", "2"]
+    assert stats[f"127.0.0.1:{slow.port}"][2:] == ["-", "-", "0", "timed", "out"]
+
+
+def test_special_agent_login(capsys):
+    with FakeUpsd(UPSES, users={"monuser": "secret"}) as upsd:
+        assert poll_target("127.0.0.1", upsd.port, 5, "monuser", "secret")
+        assert upsd.requests[:2] == ['USERNAME "monuser"', 'PASSWORD "secret"']
+        try:
+            poll_target("127.0.0.1", upsd.port, 5, "monuser", "wrong")
+        except UpsdErrorReply as exc:
+            assert str(exc) == "ACCESS-DENIED"
+        else:
+            raise AssertionError("login with wrong password succeeded")
+
+
+def test_special_agent_keeps_upses_of_failed_server(tmp_path, capsys):
+    with FakeUpsd(UPSES) as upsd:
+        args = [f"127.0.0.1:{upsd.port}", "--timeout", "0.5", "--state-dir", str(tmp_path)]
+        assert main(args) == 0
+    capsys.readouterr()
+    assert main(args) == 0
+    lines = capsys.readouterr().out.splitlines()
+    header = lines.index(f"==> demo_ups@127.0.0.1:{upsd.port} <==")
+    assert lines[header + 1].startswith("collector.error: ")
+    assert "<<<nut_errors>>>" in lines
+
+
+def test_special_agent_piggyback(tmp_path, capsys):
+    (command,) = special_agent_nut(
+        {"endpoints": [{"host": "nas"}], "piggyback": True}, HostConfig(name="ups-site")
+    )
+    assert command.command_arguments == ["--piggyback", "nas:3493"]
+
+    with FakeUpsd(UPSES) as upsd:
+        assert main(
+            [f"127.0.0.1:{upsd.port}", "--piggyback", "--state-dir", str(tmp_path)]
+        ) == 0
+    lines = capsys.readouterr().out.splitlines()
+    # The statistics of the servers stay with the host
+    assert lines[0] == "<<<nut_agent_stats>>>"
+    header = lines.index(f"<<<<demo_ups_127.0.0.1_{upsd.port}>>>>")
+    assert lines[header:header + 3] == [
+        f"<<<<demo_ups_127.0.0.1_{upsd.port}>>>>",
+        "<<<nut>>>",
+        f"==> demo_ups@127.0.0.1:{upsd.port} <==",
+    ]
+    assert lines[-1] == "<<<<>>>>"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+'''Tests for the UPS-MIB SNMP section against recorded walks.'''
+
+from cmk.agent_based.v2 import Metric, Result, Service, State
+from plugins.nut.agent_based.nut import check_nut, discover_nut
+from plugins.nut.agent_based.nut_ups_mib import (
+    check_plugin_nut_ups_mib,
+    discover_nut_ups_mib,
+    parse_nut_ups_mib,
+    snmp_section_nut_ups_mib,
+    ups_mib_variables,
+)
+from plugins.nut.rulesets.nut_ups_mib import rule_spec_nut_ups_mib
+from tests.snmp_walk import fetch, load_walk
+
+
+def _string_table(name):
+    return fetch(load_walk(name), snmp_section_nut_ups_mib.fetch)
+
+
+def test_opt_in_discovery():
+    # Not parsed into the nut section, the UPS-MIB has its own checks in Checkmk
+    assert snmp_section_nut_ups_mib.name == "nut_ups_mib"
+    assert getattr(snmp_section_nut_ups_mib, "parsed_section_name", None) is None
+    assert check_plugin_nut_ups_mib.discovery_ruleset_name == rule_spec_nut_ups_mib.name
+    assert check_plugin_nut_ups_mib.discovery_default_parameters == {"enabled": False}
+
+    section = parse_nut_ups_mib(_string_table("ups_mib_single_phase.walk"))
+    assert not list(discover_nut_ups_mib({"enabled": False}, section))
+    assert list(discover_nut_ups_mib({"enabled": True}, section)) == [Service(item="rack12-ups-a")]
+
+
+def test_single_phase_variables():
+    name, variables = ups_mib_variables(_string_table("ups_mib_single_phase.walk"))
+    assert name == "rack12-ups-a"
+    assert variables == {
+        "battery.charge": "100",
+        "battery.runtime": "2520",
+        "battery.temperature": "27",
+        "battery.voltage": "54.6",
+        "input.frequency": "50.0",
+        "input.voltage": "231",
+        "output.current": "2.1",
+        "output.frequency": "50.0",
+        "output.voltage": "230",
+        "ups.beeper.status": "enabled",
+        "ups.load": "31",
+        "ups.power.nominal": "1500",
+        "ups.realpower": "410",
+        "ups.realpower.nominal": "1350",
+        "ups.status": "OL",
+    }
+
+
+def test_single_phase_check():
+    section = parse_nut_ups_mib(_string_table("ups_mib_single_phase.walk"))
+    assert [s.item for s in discover_nut(section)] == ["rack12-ups-a"]
+    ups_data = section["rack12-ups-a"]
+    assert ups_data["battery_voltage_total"] == 54.6
+    assert ups_data["ups_realpower_headroom"] == 940.0
+
+    results = list(check_nut("rack12-ups-a", {"ups_beeper_status": "enabled"}, section))
+    assert Result(state=State.OK, summary="Status: On line (OL)") in results
+    metrics = {r.name: r.value for r in results if isinstance(r, Metric)}
+    assert metrics["nut_battery_runtime"] == 2520.0
+    assert metrics["nut_ups_load"] == 31.0
+    assert metrics["nut_battery_temperature"] == 27.0
+
+
+def test_three_phase_on_battery():
+    name, variables = ups_mib_variables(_string_table("ups_mib_three_phase_on_battery.walk"))
+    # upsIdentName is empty, the model is used instead
+    assert name == "Eaton 93PM 50kW"
+    assert variables["ups.status"] == "OB LB ALARM"
+    assert variables["ups.alarm"] == "Fan failure"
+    assert variables["ups.beeper.status"] == "muted"
+    assert variables["battery.current"] == "-61.2"
+    assert variables["output.L2.current"] == "38.8"
+    assert variables["ups.realpower"] == "27200.0"
+
+    section = parse_nut_ups_mib(_string_table("ups_mib_three_phase_on_battery.walk"))
+    ups_data = section[name]
+    assert ups_data["phases"]["output_phase_voltage"] == [230.0, 229.0, 231.0]
+    assert ups_data["phases"]["output_phase_load"] == [56.0, 52.0, 54.0]
+
+    results = list(check_nut(name, {}, section))
+    states = {r.summary: r.state for r in results if isinstance(r, Result)}
+    assert states["Status: On battery (OB)"] == State.WARN
+    assert states["Status: Low battery (LB)"] == State.CRIT
+    assert states["Status: Alarm (Fan failure)"] == State.CRIT
+
+
+def test_empty_walk():
+    assert parse_nut_ups_mib([[], [], [], []]) is None
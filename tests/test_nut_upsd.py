@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+'''Tests for the upsd client of the special agent.'''
+
+import importlib.util
+from pathlib import Path
+
+from plugins.nut.lib import upsd
+from tests import sync_upsd
+
+_PLUGIN = Path(__file__).parent.parent / "local/share/check_mk/agents/plugins/nut.py"
+_spec = importlib.util.spec_from_file_location("nut_agent_plugin", _PLUGIN)
+nut_plugin = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(nut_plugin)
+
+
+def test_agent_plugin_carries_the_library_code():
+    assert sync_upsd.main(["--check"]) == 0, "run python3 -m tests.sync_upsd"
+
+
+def test_sync_replaces_the_generated_block():
+    plugin = f"head\n{sync_upsd.BEGIN}\nold code\n{sync_upsd.END}\ntail\n"
+    library = f"header\n{sync_upsd.LIBRARY_MARKER}\n\ndef new():\n    pass\n"
+    assert sync_upsd.synced(plugin, library) == (
+        f"head\n{sync_upsd.BEGIN}\ndef new():\n    pass\n\n\n{sync_upsd.END}\ntail\n"
+    )
+
+
+def test_same_constants_as_agent_plugin():
+    assert upsd.DEFAULT_PORT == nut_plugin.DEFAULT_PORT
+    assert upsd.LOCALHOST == nut_plugin.LOCALHOST
+
+
+def test_parse_target():
+    assert upsd.parse_target("nas:3494") == ("nas", 3494)
+    assert upsd.format_target("nas", upsd.DEFAULT_PORT) == "nas"